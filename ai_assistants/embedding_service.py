@@ -0,0 +1,201 @@
+import asyncio
+import hashlib
+import logging
+import sqlite3
+import threading
+from collections import OrderedDict
+from typing import Dict, List, Optional
+
+import numpy as np
+from langchain_core.embeddings import Embeddings
+
+from config_project.config import settings
+
+logger = logging.getLogger(__name__)
+
+
+class EmbeddingDiskStore:
+    """Embeddings persisted in a SQLite file, keyed by a hash of the model name and text."""
+
+    def __init__(self, path: str, model_name: str):
+        self.model_name = model_name
+        self._connection = sqlite3.connect(path, check_same_thread=False)
+        self._connection.execute("CREATE TABLE IF NOT EXISTS embeddings (key TEXT PRIMARY KEY, vector BLOB NOT NULL)")
+        self._connection.commit()
+        self._lock = threading.Lock()
+
+    def key(self, text: str) -> str:
+        return hashlib.sha256(f"{self.model_name}\0{text}".encode("utf-8")).hexdigest()
+
+    def get(self, text: str) -> Optional[List[float]]:
+        with self._lock:
+            row = self._connection.execute("SELECT vector FROM embeddings WHERE key = ?", (self.key(text),)).fetchone()
+        return np.frombuffer(row[0], dtype=np.float32).tolist() if row else None
+
+    def put_many(self, texts: List[str], vectors: List[List[float]]):
+        with self._lock:
+            self._connection.executemany(
+                "INSERT OR REPLACE INTO embeddings (key, vector) VALUES (?, ?)",
+                [(self.key(t), np.asarray(v, dtype=np.float32).tobytes()) for t, v in zip(texts, vectors)],
+            )
+            self._connection.commit()
+
+
+class EmbeddingService(Embeddings):
+    """
+    Query embeddings with memoization and micro-batching.
+
+    Query vectors are memoized in a bounded LRU and, when `disk_path` is set, in an
+    on-disk store that survives restarts. Concurrent `aembed_query` calls that miss
+    the caches are collected for up to `batch_wait` seconds (or until `batch_size`
+    texts are waiting) and embedded in one `embed_documents` forward pass. The model
+    is built without query-specific encode kwargs, so query and document encodings
+    are the same.
+    """
+
+    def __init__(
+        self,
+        base: Embeddings,
+        model_name: str,
+        cache_size: int = settings.EMBEDDING_CACHE_SIZE,
+        disk_path: str = settings.EMBEDDING_CACHE_PATH,
+        batch_size: int = settings.EMBEDDING_BATCH_SIZE,
+        batch_wait: float = settings.EMBEDDING_BATCH_WAIT_MS / 1000,
+    ):
+        self.base = base
+        self.model_name = model_name
+        self.cache_size = cache_size
+        self.batch_size = batch_size
+        self.batch_wait = batch_wait
+        self.disk_store = EmbeddingDiskStore(disk_path, model_name) if disk_path else None
+        self._cache: "OrderedDict[str, List[float]]" = OrderedDict()
+        self._lock = threading.Lock()
+        # texts waiting for the next batch, and futures for every text queued or being embedded
+        self._pending: List[str] = []
+        self._futures: Dict[str, asyncio.Future] = {}
+        self._flush_handle: Optional[asyncio.TimerHandle] = None
+        self.requests = 0
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.computed = 0
+        self.batches = 0
+        self.max_batch = 0
+
+    def _remember(self, text: str, vector: List[float]):
+        with self._lock:
+            self._cache[text] = vector
+            self._cache.move_to_end(text)
+            while len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+
+    def _memory_cached(self, text: str) -> Optional[List[float]]:
+        with self._lock:
+            self.requests += 1
+            vector = self._cache.get(text)
+            if vector is not None:
+                self._cache.move_to_end(text)
+                self.memory_hits += 1
+            return vector
+
+    def _disk_cached(self, text: str) -> Optional[List[float]]:
+        if self.disk_store is None:
+            return None
+        vector = self.disk_store.get(text)
+        if vector is not None:
+            with self._lock:
+                self.disk_hits += 1
+            self._remember(text, vector)
+        return vector
+
+    def _cached(self, text: str) -> Optional[List[float]]:
+        vector = self._memory_cached(text)
+        return vector if vector is not None else self._disk_cached(text)
+
+    def _computed(self, texts: List[str], vectors: List[List[float]]):
+        """Memoize freshly computed vectors in memory; the disk store is written separately."""
+        for text, vector in zip(texts, vectors):
+            self._remember(text, vector)
+        with self._lock:
+            self.computed += len(texts)
+            self.batches += 1
+            self.max_batch = max(self.max_batch, len(texts))
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        return self.base.embed_documents(texts)
+
+    def embed_query(self, text: str) -> List[float]:
+        vector = self._cached(text)
+        if vector is None:
+            vector = self.base.embed_query(text)
+            self._computed([text], [vector])
+            if self.disk_store is not None:
+                self.disk_store.put_many([text], [vector])
+        return vector
+
+    async def aembed_query(self, text: str) -> List[float]:
+        vector = self._memory_cached(text)
+        if vector is None and self.disk_store is not None:
+            # SQLite reads block, so they run off the event loop
+            vector = await asyncio.to_thread(self._disk_cached, text)
+        if vector is not None:
+            return vector
+        future = self._futures.get(text)
+        if future is None:
+            loop = asyncio.get_running_loop()
+            future = loop.create_future()
+            self._futures[text] = future
+            self._pending.append(text)
+            if len(self._pending) >= self.batch_size:
+                self._flush()
+            elif self._flush_handle is None:
+                self._flush_handle = loop.call_later(self.batch_wait, self._flush)
+        return await asyncio.shield(future)
+
+    def _flush(self):
+        if self._flush_handle is not None:
+            self._flush_handle.cancel()
+            self._flush_handle = None
+        texts, self._pending = self._pending, []
+        if texts:
+            asyncio.get_running_loop().create_task(self._embed_batch(texts))
+
+    async def _embed_batch(self, texts: List[str]):
+        futures = [self._futures[text] for text in texts]
+        try:
+            vectors = await asyncio.to_thread(self.base.embed_documents, texts)
+            self._computed(texts, vectors)
+        except Exception as exc:
+            for text in texts:
+                self._futures.pop(text, None)
+            logger.error(f"Error embedding batch of {len(texts)} queries: {str(exc)}", exc_info=True)
+            for future in futures:
+                if not future.done():
+                    future.set_exception(exc)
+            return
+        for text, future, vector in zip(texts, futures, vectors):
+            self._futures.pop(text, None)
+            if not future.done():
+                future.set_result(vector)
+        if self.disk_store is not None:
+            # Written after the callers are released, on a thread so the commit does not block the loop
+            try:
+                await asyncio.to_thread(self.disk_store.put_many, texts, vectors)
+            except Exception as exc:
+                logger.error(f"Error saving {len(texts)} query embeddings to disk: {str(exc)}", exc_info=True)
+
+    def stats(self) -> Dict:
+        with self._lock:
+            return {
+                "model": self.model_name,
+                "cache_size": len(self._cache),
+                "max_cache_size": self.cache_size,
+                "disk_store": self.disk_store is not None,
+                "requests": self.requests,
+                "memory_hits": self.memory_hits,
+                "disk_hits": self.disk_hits,
+                "hit_rate": (self.memory_hits + self.disk_hits) / self.requests if self.requests else 0.0,
+                "computed": self.computed,
+                "batches": self.batches,
+                "avg_batch_size": self.computed / self.batches if self.batches else 0.0,
+                "max_batch_size": self.max_batch,
+            }
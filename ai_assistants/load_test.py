@@ -0,0 +1,134 @@
+"""
+Concurrency load test for the async chat path.
+
+Runs the real RestaurantAssistant agent loop against a local fake chat model and a
+local vector store, so no OpenAI or Pinecone calls are made.
+
+Usage:
+    python -m ai_assistants.load_test --concurrency 1 10 50 100 200 --latency 0.2 --retrieval-latency 0.1
+"""
+import argparse
+import asyncio
+import contextlib
+import io
+import time
+from typing import Any, List, Optional
+
+from langchain_core.embeddings import DeterministicFakeEmbedding
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessage, BaseMessage, ToolMessage
+from langchain_core.outputs import ChatGeneration, ChatResult
+
+from ai_assistants.restaurant_reviews import AssistantSession, RestaurantAssistant
+from ai_assistants.metrics import chat_metrics
+from ai_assistants.router import QueryRouter
+from ai_assistants.vectorstores import LocalVectorStore
+
+
+class FakeAgentChatModel(BaseChatModel):
+    """Chat model that looks up own and nearby reviews in one step (two parallel tool calls), then answers."""
+
+    latency: float = 0.2
+
+    @property
+    def _llm_type(self) -> str:
+        return "fake-agent-chat-model"
+
+    def _respond(self, messages: List[BaseMessage]) -> ChatResult:
+        if isinstance(messages[-1], ToolMessage):
+            found = sum(len(message.content) for message in messages if isinstance(message, ToolMessage))
+            message = AIMessage(content=f"Answer based on {found} characters of reviews.")
+        else:
+            query = str(messages[-1].content)[-50:]
+            message = AIMessage(
+                content="",
+                tool_calls=[
+                    {"name": "restaurant_database", "args": {"query": query, "scope": scope}, "id": f"call_{scope}"}
+                    for scope in ("restaurant", "comparison")
+                ],
+            )
+        return ChatResult(generations=[ChatGeneration(message=message)])
+
+    def _generate(self, messages: List[BaseMessage], stop: Optional[List[str]] = None, run_manager=None, **kwargs: Any) -> ChatResult:
+        time.sleep(self.latency)
+        return self._respond(messages)
+
+    async def _agenerate(self, messages: List[BaseMessage], stop: Optional[List[str]] = None, run_manager=None, **kwargs: Any) -> ChatResult:
+        await asyncio.sleep(self.latency)
+        return self._respond(messages)
+
+
+class FakeEmbeddings(DeterministicFakeEmbedding):
+    """Fake embeddings whose async query embedding takes `latency` seconds, standing in for the embedding call."""
+
+    latency: float = 0.0
+
+    async def aembed_query(self, text: str) -> List[float]:
+        await asyncio.sleep(self.latency)
+        return self.embed_query(text)
+
+
+class FakeAssistantResources:
+    """Drop-in replacement for AssistantResources backed by local fakes."""
+
+    def __init__(self, latency: float, documents: int = 200, retrieval_latency: float = 0.0):
+        self.pc = None
+        self.chat_model = FakeAgentChatModel(latency=latency)
+        self.vectorstore = LocalVectorStore(FakeEmbeddings(size=64, latency=retrieval_latency))
+        self.vectorstore.add_texts(
+            [f"Review {i}: the food was {'great' if i % 2 else 'average'}." for i in range(documents)],
+            metadatas=[
+                {"restaurant_name": "Load Test Kitchen" if i % 4 == 0 else f"Rival {i % 4}", "neighbourhood": "Soho"}
+                for i in range(documents)
+            ],
+        )
+        self.retriever = self.vectorstore.as_retriever(search_kwargs={"k": 10})
+
+
+async def run_level(assistant: RestaurantAssistant, concurrency: int) -> dict:
+    sessions = [AssistantSession(assistant) for _ in range(concurrency)]
+    start_time = time.time()
+    results = await asyncio.gather(*(session.get_response(f"question {i}") for i, session in enumerate(sessions)))
+    elapsed_time = time.time() - start_time
+    errors = sum(1 for result in results if result["agent_used"] == "error")
+    return {
+        "concurrency": concurrency,
+        "elapsed_time": elapsed_time,
+        "throughput": concurrency / elapsed_time,
+        "avg_latency": sum(result["elapsed_time"] for result in results) / concurrency,
+        "errors": errors,
+    }
+
+
+async def main(concurrency_levels: List[int], latency: float, retrieval_latency: float = 0.0):
+    assistant = RestaurantAssistant(
+        restaurant_id="load-test-restaurant",
+        resources=FakeAssistantResources(latency=latency, retrieval_latency=retrieval_latency),
+        restaurant_context="Restaurant Name: Load Test Kitchen",
+        restaurant_scope={"restaurant_name": "Load Test Kitchen", "neighbourhood": "Soho"},
+    )
+    assistant.agent.verbose = False
+    # Every message takes the agent route, so the numbers measure the full loop
+    assistant.router = QueryRouter(enabled=False)
+    print(
+        f"Fake LLM latency: {latency:.3f}s per call (two calls per message), "
+        f"retrieval latency: {retrieval_latency:.3f}s per lookup (two lookups per message)"
+    )
+    print(f"{'concurrency':>12} {'wall time':>10} {'req/s':>10} {'avg latency':>12} {'overlapped':>11} {'errors':>7}")
+    for concurrency in concurrency_levels:
+        with contextlib.redirect_stdout(io.StringIO()):
+            stats = await run_level(assistant, concurrency)
+        overlap = chat_metrics.stats()["overlap"].get("agent", {})
+        print(
+            f"{stats['concurrency']:>12} {stats['elapsed_time']:>9.2f}s {stats['throughput']:>10.1f} "
+            f"{stats['avg_latency']:>11.2f}s {overlap.get('avg_overlapped_time', 0.0):>10.2f}s {stats['errors']:>7}"
+        )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Load test the async chat path against local fakes.")
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 10, 50, 100, 200])
+    parser.add_argument("--latency", type=float, default=0.2, help="Fake LLM latency per call in seconds.")
+    parser.add_argument("--retrieval-latency", type=float, default=0.1, help="Fake embedding latency per lookup in seconds.")
+    args = parser.parse_args()
+    asyncio.run(main(args.concurrency, args.latency, args.retrieval_latency))
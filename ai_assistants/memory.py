@@ -0,0 +1,238 @@
+import asyncio
+import logging
+import threading
+from collections import OrderedDict
+from functools import lru_cache
+from typing import Dict, List, Tuple
+
+import tiktoken
+from langchain_core.language_models import BaseChatModel
+from langchain_core.messages import AIMessage, BaseMessage, HumanMessage, SystemMessage
+
+from chats.store import ChatHistoryStore, chat_history_store
+from config_project.config import settings
+
+logger = logging.getLogger(__name__)
+
+SUMMARY_PROMPT = """Progressively summarize the conversation between a restaurant owner and an assistant, \
+adding onto the previous summary and returning a new summary. Keep names, dishes, numbers and open questions; \
+drop pleasantries. Keep the summary under {max_words} words.
+
+Current summary:
+{summary}
+
+New lines of conversation:
+{lines}
+
+New summary:"""
+
+
+@lru_cache(maxsize=1)
+def _encoding():
+    try:
+        return tiktoken.get_encoding("o200k_base")
+    except Exception as exc:
+        logger.warning(f"Tokenizer unavailable, estimating tokens from length: {str(exc)}")
+        return None
+
+
+@lru_cache(maxsize=4096)
+def count_tokens(text: str) -> int:
+    encoding = _encoding()
+    if encoding is None:
+        return len(text) // 4 + 1
+    return len(encoding.encode(text))
+
+
+def to_messages(history: List[Dict]) -> List[BaseMessage]:
+    return [
+        HumanMessage(content=m["content"]) if m["author"] == "user" else AIMessage(content=m["content"])
+        for m in history
+    ]
+
+
+class BufferSessionMemory:
+    """Replays the last `messages` turns verbatim."""
+
+    def __init__(self, store: ChatHistoryStore, messages: int = settings.CHAT_CONTEXT_MESSAGES):
+        self.store = store
+        self.messages = messages
+
+    async def load(self, user_id, session_id: str) -> List[BaseMessage]:
+        return to_messages(await self.store.get(user_id, session_id, limit=self.messages))
+
+    def after_exchange(self, user_id, session_id: str, chat_model: BaseChatModel):
+        pass
+
+    def usage(self, user_id, session_id: str) -> Dict:
+        return {}
+
+    def stats(self) -> Dict:
+        return {"mode": "buffer", "messages": self.messages}
+
+
+class TokenBudgetSessionMemory:
+    """
+    Keeps the replayed history under a hard token budget.
+
+    The newest turns that fit are replayed verbatim and everything older is folded
+    into a running summary. Summaries are derived data, so they live in a bounded
+    in-process LRU and are rebuilt from the stored history after a restart. The
+    summary is refreshed by a background task after each exchange, never on the
+    request path; until it catches up, turns that no longer fit are simply dropped.
+    The summary and usage of a session are forgotten when the store clears,
+    expires or evicts it.
+    """
+
+    def __init__(
+        self,
+        store: ChatHistoryStore,
+        budget: int = settings.CHAT_MEMORY_TOKEN_BUDGET,
+        fetch_messages: int = settings.CHAT_HISTORY_WINDOW,
+        summary_words: int = settings.CHAT_MEMORY_SUMMARY_WORDS,
+        max_sessions: int = settings.CHAT_HISTORY_MAX_SESSIONS,
+    ):
+        self.store = store
+        self.budget = budget
+        self.fetch_messages = fetch_messages
+        self.summary_words = summary_words
+        self.max_sessions = max_sessions
+        # (user_id, session_id) -> (summary, id of the last message folded into it)
+        self._summaries: "OrderedDict[Tuple[str, str], Tuple[str, int]]" = OrderedDict()
+        # (user_id, session_id) -> token accounting
+        self._usage: "OrderedDict[Tuple[str, str], Dict]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._compacting = set()
+        # Sessions removed while a compaction was running; its summary must not be saved
+        self._forgotten_while_compacting = set()
+        self._tasks = set()
+        self.summarizations = 0
+        self.summarization_errors = 0
+        store.on_session_removed(self.forget)
+
+    def forget(self, key: Tuple[str, str]):
+        with self._lock:
+            self._summaries.pop(key, None)
+            self._usage.pop(key, None)
+            if key in self._compacting:
+                self._forgotten_while_compacting.add(key)
+
+    def _remember(self, cache: OrderedDict, key, value):
+        with self._lock:
+            cache[key] = value
+            cache.move_to_end(key)
+            while len(cache) > self.max_sessions:
+                cache.popitem(last=False)
+
+    def _summary(self, key) -> Tuple[str, int]:
+        with self._lock:
+            return self._summaries.get(key, ("", 0))
+
+    def _split(self, messages: List[Dict], summary: str) -> int:
+        """Index of the first message of the longest suffix that fits next to the summary."""
+        remaining = self.budget - (count_tokens(summary) if summary else 0)
+        split = len(messages)
+        while split > 0:
+            tokens = count_tokens(messages[split - 1]["content"])
+            if tokens > remaining:
+                break
+            remaining -= tokens
+            split -= 1
+        return split
+
+    async def load(self, user_id, session_id: str) -> List[BaseMessage]:
+        key = (str(user_id), session_id)
+        messages = await self.store.get(user_id, session_id, limit=self.fetch_messages)
+        summary, _ = self._summary(key)
+        recent = messages[self._split(messages, summary):]
+
+        full_tokens = sum(count_tokens(m["content"]) for m in messages)
+        sent_tokens = sum(count_tokens(m["content"]) for m in recent) + (count_tokens(summary) if summary else 0)
+        usage = dict(self.usage(user_id, session_id))
+        usage["turns"] = usage.get("turns", 0) + 1
+        usage["full_history_tokens"] = usage.get("full_history_tokens", 0) + full_tokens
+        usage["history_tokens_sent"] = usage.get("history_tokens_sent", 0) + sent_tokens
+        usage["tokens_saved"] = usage["full_history_tokens"] - usage["history_tokens_sent"]
+        usage["last_history_tokens_sent"] = sent_tokens
+        usage["summary_tokens"] = count_tokens(summary) if summary else 0
+        self._remember(self._usage, key, usage)
+
+        history = to_messages(recent)
+        if summary:
+            history.insert(0, SystemMessage(content=f"Summary of the earlier conversation:\n{summary}"))
+        return history
+
+    async def compact(self, user_id, session_id: str, chat_model: BaseChatModel):
+        """Fold turns that no longer fit the budget into the session summary."""
+        key = (str(user_id), session_id)
+        messages = await self.store.get(user_id, session_id, limit=self.fetch_messages)
+        summary, summarized_through = self._summary(key)
+        older = [m for m in messages[:self._split(messages, summary)] if m["id"] > summarized_through]
+        if not older:
+            return
+
+        lines = "\n".join(f"{'Owner' if m['author'] == 'user' else 'Assistant'}: {m['content']}" for m in older)
+        prompt = SUMMARY_PROMPT.format(max_words=self.summary_words, summary=summary or "(none)", lines=lines)
+        new_summary = (await chat_model.ainvoke(prompt)).content
+        with self._lock:
+            if key in self._forgotten_while_compacting:
+                return
+        self._remember(self._summaries, key, (new_summary, older[-1]["id"]))
+
+        usage = dict(self.usage(user_id, session_id))
+        usage["summarization_tokens"] = (
+            usage.get("summarization_tokens", 0) + count_tokens(prompt) + count_tokens(new_summary)
+        )
+        self._remember(self._usage, key, usage)
+        self.summarizations += 1
+
+    def after_exchange(self, user_id, session_id: str, chat_model: BaseChatModel):
+        """Schedule a background compaction, at most one in flight per session."""
+        key = (str(user_id), session_id)
+        with self._lock:
+            if key in self._compacting:
+                return
+            self._compacting.add(key)
+
+        async def run():
+            try:
+                await self.compact(user_id, session_id, chat_model)
+            except Exception as exc:
+                self.summarization_errors += 1
+                logger.error(f"Error compacting chat history: {str(exc)}", exc_info=True)
+            finally:
+                with self._lock:
+                    self._compacting.discard(key)
+                    self._forgotten_while_compacting.discard(key)
+
+        task = asyncio.create_task(run())
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    def usage(self, user_id, session_id: str) -> Dict:
+        with self._lock:
+            return self._usage.get((str(user_id), session_id), {})
+
+    def stats(self) -> Dict:
+        with self._lock:
+            return {
+                "mode": "token_budget",
+                "budget": self.budget,
+                "sessions": len(self._usage),
+                "summaries": len(self._summaries),
+                "summarizations": self.summarizations,
+                "summarization_errors": self.summarization_errors,
+                "tokens_saved": sum(u.get("tokens_saved", 0) for u in self._usage.values()),
+                "summarization_tokens": sum(u.get("summarization_tokens", 0) for u in self._usage.values()),
+            }
+
+
+def create_session_memory(store: ChatHistoryStore, mode: str = settings.CHAT_MEMORY_MODE):
+    if mode == "buffer":
+        return BufferSessionMemory(store)
+    if mode == "token_budget":
+        return TokenBudgetSessionMemory(store)
+    raise ValueError(f"Unknown chat memory mode: {mode}")
+
+
+session_memory = create_session_memory(chat_history_store)
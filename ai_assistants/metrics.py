@@ -0,0 +1,99 @@
+import threading
+from collections import defaultdict
+from typing import Dict
+
+
+class ChatMetrics:
+    """Process-wide counters for the chat pipeline, grouped by a label (route, retrieval scope, ...)."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._turns = defaultdict(lambda: {"count": 0, "elapsed_time": 0.0, "tool_calls": 0})
+        self._retrievals = defaultdict(lambda: {"count": 0, "elapsed_time": 0.0, "documents": 0})
+        self._prompts = defaultdict(lambda: {"count": 0, "prompt_tokens": 0, "eligible_tokens": 0, "cached_tokens": 0, "completion_tokens": 0})
+        self._overlaps = defaultdict(lambda: {"count": 0, "busy_time": 0.0, "overlapped_time": 0.0})
+        self._speculation = {"hits": 0, "misses": 0}
+
+    def record_turn(self, label: str, elapsed_time: float, tool_calls: int = 0):
+        with self._lock:
+            turn = self._turns[label]
+            turn["count"] += 1
+            turn["elapsed_time"] += elapsed_time
+            turn["tool_calls"] += tool_calls
+
+    def record_retrieval(self, scope: str, elapsed_time: float, documents: int):
+        with self._lock:
+            retrieval = self._retrievals[scope]
+            retrieval["count"] += 1
+            retrieval["elapsed_time"] += elapsed_time
+            retrieval["documents"] += documents
+
+    def record_prompt(self, label: str, prompt_tokens: int, eligible_tokens: int, cached_tokens: int, completion_tokens: int = 0):
+        with self._lock:
+            prompt = self._prompts[label]
+            prompt["count"] += 1
+            prompt["prompt_tokens"] += prompt_tokens
+            prompt["eligible_tokens"] += eligible_tokens
+            prompt["cached_tokens"] += cached_tokens
+            prompt["completion_tokens"] += completion_tokens
+
+    def record_overlap(self, label: str, busy_time: float, overlapped_time: float):
+        with self._lock:
+            overlap = self._overlaps[label]
+            overlap["count"] += 1
+            overlap["busy_time"] += busy_time
+            overlap["overlapped_time"] += overlapped_time
+
+    def record_speculation(self, hit: bool):
+        with self._lock:
+            self._speculation["hits" if hit else "misses"] += 1
+
+    def stats(self) -> Dict:
+        with self._lock:
+            speculated = self._speculation["hits"] + self._speculation["misses"]
+            return {
+                "turns": {
+                    label: {
+                        "count": t["count"],
+                        "avg_latency": t["elapsed_time"] / t["count"],
+                        "avg_tool_calls": t["tool_calls"] / t["count"],
+                    }
+                    for label, t in self._turns.items()
+                },
+                "retrievals": {
+                    scope: {
+                        "count": r["count"],
+                        "avg_latency": r["elapsed_time"] / r["count"],
+                        "avg_documents": r["documents"] / r["count"],
+                    }
+                    for scope, r in self._retrievals.items()
+                },
+                "prompts": {
+                    label: {
+                        "count": p["count"],
+                        "avg_prompt_tokens": p["prompt_tokens"] / p["count"],
+                        "avg_eligible_tokens": p["eligible_tokens"] / p["count"],
+                        "avg_cached_tokens": p["cached_tokens"] / p["count"],
+                        "avg_completion_tokens": p["completion_tokens"] / p["count"],
+                        "cached_share_of_eligible": p["cached_tokens"] / p["eligible_tokens"] if p["eligible_tokens"] else 0.0,
+                    }
+                    for label, p in self._prompts.items()
+                },
+                # Model calls, tool calls and speculative lookups of a turn that ran at the same time
+                "overlap": {
+                    label: {
+                        "count": o["count"],
+                        "avg_busy_time": o["busy_time"] / o["count"],
+                        "avg_overlapped_time": o["overlapped_time"] / o["count"],
+                        "overlapped_share": o["overlapped_time"] / o["busy_time"] if o["busy_time"] else 0.0,
+                    }
+                    for label, o in self._overlaps.items()
+                },
+                "speculative_retrieval": {
+                    **self._speculation,
+                    "hit_rate": self._speculation["hits"] / speculated if speculated else 0.0,
+                },
+            }
+
+
+chat_metrics = ChatMetrics()
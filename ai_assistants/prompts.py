@@ -0,0 +1,180 @@
+"""
+Agent prompt and tool schemas, built once per process.
+
+The prompt puts everything that is the same across turns first: the system prompt
+and the tool schemas (identical for every restaurant), then the restaurant
+context (identical for every turn with that restaurant), then the chat history.
+Only the new question and the agent scratchpad change between calls, so the
+provider's prompt cache can reuse the prefix.
+"""
+import copy
+import json
+import logging
+from typing import Any, Dict, List, Optional, Sequence
+
+from langchain.agents.format_scratchpad.openai_tools import format_to_openai_tool_messages
+from langchain.agents.output_parsers.openai_tools import OpenAIToolsAgentOutputParser
+from langchain_core.callbacks import BaseCallbackHandler
+from langchain_core.language_models import BaseChatModel
+from langchain_core.messages import SystemMessage
+from langchain_core.outputs import LLMResult
+from langchain_core.prompts import (
+    ChatPromptTemplate,
+    HumanMessagePromptTemplate,
+    MessagesPlaceholder,
+    SystemMessagePromptTemplate,
+)
+from langchain_core.runnables import Runnable, RunnableLambda, RunnablePassthrough
+from langchain_core.tools import BaseTool
+from langchain_core.utils.function_calling import convert_to_openai_tool
+
+from ai_assistants.memory import count_tokens
+from ai_assistants.metrics import chat_metrics
+
+logger = logging.getLogger(__name__)
+
+# OpenAI caches prompts of at least this many tokens, in blocks of PROMPT_CACHE_BLOCK
+PROMPT_CACHE_MIN_TOKENS = 1024
+PROMPT_CACHE_BLOCK = 128
+
+GUIDELINES = """Guidelines:
+            - Only provide information about UK restaurants(never include restaurants outside the UK)
+            - Find the most relevant information about [restaurant name] in [city, UK] regarding [specific query].
+            - If the user asks about comparison, automatically fetch nearby restaurants with the restaurant ranking and rank them by overall rating
+            - Respond ONLY to the question asked (DO NOT include extra restaurant details if they are not relevant)
+            - Never mention ambiance, decor, or service unless explicitly asked
+            - If information is unclear or unavailable, acknowledge it
+            - If asked about a specific restaurant, first check its available menu, popular dishes, or customer preferences.
+            - Only provide reviews about [restaurant name] if they are specifically relevant to the query
+            - KEEP RESPONSES UNDER 500 WORDS WHILE MAINTAINING QUALITY AND DETAIL, IF YOU DONT I WILL KILL YOU !!
+
+            Formatting guidelines:
+            - Use natural paragraph formatting with proper spacing for clarity.
+            - Make sure that the headings are always on a new line for readability
+            - Use bullet points for key information
+            - Avoid Markdown symbols like #, **, and unnecessary \n
+            - Give me response as markdown format
+
+            Important Note:
+            NEVER mention which tool or source provided the information."""
+
+SYSTEM_PROMPT = """You are a UK restaurant information specialist with access to two tools:
+            1. A verified restaurant database (primary source)
+            2. A restaurant ranking of ratings and review counts
+
+            Follow these steps strictly for EVERY query:
+
+            1. Always check the verified restaurant database first for information.
+            2. Use your own general knowledge only if the database lacks sufficient details.
+            3. Combine both sources seamlessly (without mentioning them).
+            4. Stick strictly to the user's query (do not add extra details).
+            5. Summarize key points from multiple reviews where possible
+
+
+            """ + GUIDELINES
+
+# Single-call answers from reviews retrieved up front, without the agent loop
+ANSWER_SYSTEM_PROMPT = """You are a UK restaurant information specialist. Answer from the verified restaurant
+            reviews given with the question, adding your own general knowledge only where they lack details.
+            Summarize key points from multiple reviews where possible and stick strictly to the user's query.
+
+
+            """ + GUIDELINES
+
+RESTAURANT_CONTEXT_PROMPT = "The following questions are about this restaurant:\n{restaurant_context}"
+
+AGENT_PROMPT = ChatPromptTemplate.from_messages([
+    SystemMessage(content=SYSTEM_PROMPT),
+    SystemMessagePromptTemplate.from_template(RESTAURANT_CONTEXT_PROMPT),
+    MessagesPlaceholder(variable_name="chat_history"),
+    HumanMessagePromptTemplate.from_template("{input}"),
+    MessagesPlaceholder(variable_name="agent_scratchpad"),
+])
+
+ANSWER_PROMPT = ChatPromptTemplate.from_messages([
+    SystemMessage(content=ANSWER_SYSTEM_PROMPT),
+    SystemMessagePromptTemplate.from_template(RESTAURANT_CONTEXT_PROMPT),
+    MessagesPlaceholder(variable_name="chat_history"),
+    HumanMessagePromptTemplate.from_template("Reviews:\n{reviews}\n\nQuestion:\n{input}"),
+])
+
+_tool_schemas: Dict[tuple, tuple] = {}
+
+
+def tool_schemas(tools: Sequence[BaseTool]) -> List[dict]:
+    """
+    OpenAI tool schemas for `tools`, converted once per tool set.
+
+    The schemas only depend on each tool's name, description and argument model,
+    not the instance it is bound to, so the conversion is shared by every
+    assistant. Each call gets its own copy: a caller that modifies it cannot
+    change the prompt prefix the other assistants send.
+    """
+    key = tuple((tool.name, tool.description, tool.args_schema) for tool in tools)
+    schemas = _tool_schemas.get(key)
+    if schemas is None:
+        schemas = tuple(dict(convert_to_openai_tool(tool)) for tool in tools)
+        _tool_schemas[key] = schemas
+    return copy.deepcopy(list(schemas))
+
+
+def _scratchpad(inputs: Dict) -> List:
+    return format_to_openai_tool_messages(inputs["intermediate_steps"])
+
+
+async def _ascratchpad(inputs: Dict) -> List:
+    # Formatting is cheap; without an async version every step would hop to a thread
+    return _scratchpad(inputs)
+
+
+def tools_agent(llm: BaseChatModel, prompt: ChatPromptTemplate, schemas: List[dict]) -> Runnable:
+    """
+    Tool-calling agent over precomputed schemas.
+
+    The model may request several tool calls in one step; AgentExecutor runs
+    them concurrently on the async path.
+    """
+    return (
+        RunnablePassthrough.assign(agent_scratchpad=RunnableLambda(_scratchpad, afunc=_ascratchpad))
+        | prompt
+        | llm.bind(tools=schemas)
+        | OpenAIToolsAgentOutputParser()
+    )
+
+
+def cacheable_prefix_tokens(restaurant_context: str, schemas: Optional[List[dict]] = None) -> int:
+    """Tokens in the part of the agent prompt (or, without tool schemas, the answer prompt) that repeats across turns."""
+    system_tokens = count_tokens(SYSTEM_PROMPT) + count_tokens(json.dumps(schemas)) if schemas else count_tokens(ANSWER_SYSTEM_PROMPT)
+    return system_tokens + count_tokens(RESTAURANT_CONTEXT_PROMPT.format(restaurant_context=restaurant_context))
+
+
+class PromptCacheCallback(BaseCallbackHandler):
+    """
+    Records prompt, cache-eligible, cached and completion tokens for each model call, under `label`.
+
+    A call is cache-eligible for the stable prefix rounded down to whole cache
+    blocks, and only once the whole prompt reaches the provider's minimum. Cached
+    tokens are what the provider reports it served from its cache.
+    """
+
+    run_inline = True
+
+    def __init__(self, prefix_tokens: int, label: str = "agent"):
+        self.prefix_tokens = prefix_tokens
+        self.label = label
+
+    def on_llm_end(self, response: LLMResult, **kwargs: Any) -> None:
+        for generations in response.generations:
+            for generation in generations:
+                usage = getattr(getattr(generation, "message", None), "usage_metadata", None)
+                if not usage:
+                    continue
+                prompt_tokens = usage.get("input_tokens", 0)
+                cached_tokens = (usage.get("input_token_details") or {}).get("cache_read", 0)
+                eligible_tokens = 0
+                if prompt_tokens >= PROMPT_CACHE_MIN_TOKENS:
+                    eligible_tokens = min(self.prefix_tokens, prompt_tokens) // PROMPT_CACHE_BLOCK * PROMPT_CACHE_BLOCK
+                chat_metrics.record_prompt(self.label, prompt_tokens, eligible_tokens, cached_tokens, usage.get("output_tokens", 0))
+                logger.debug(
+                    f"LLM call ({self.label}): {prompt_tokens} prompt tokens, {eligible_tokens} cache-eligible, {cached_tokens} cached"
+                )
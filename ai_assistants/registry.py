@@ -0,0 +1,123 @@
+import logging
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, List, Optional
+
+from langchain_core.messages import BaseMessage
+
+from ai_assistants.restaurant_reviews import AssistantResources, AssistantSession, RestaurantAssistant
+from config_project.config import settings
+from restaurants import services
+from restaurants.events import on_restaurant_updated
+
+logger = logging.getLogger(__name__)
+
+
+class AssistantRegistry:
+    """
+    Process-wide registry of warm restaurant assistants.
+
+    The shared resources (Pinecone client, vector store, retriever and chat model)
+    are built once, and a bounded LRU keeps one ready agent per restaurant.
+    """
+
+    def __init__(self, max_size: int = settings.ASSISTANT_CACHE_SIZE):
+        self.max_size = max_size
+        self._resources: Optional[AssistantResources] = None
+        self._assistants: "OrderedDict[str, RestaurantAssistant]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.builds = 0
+        self.build_time_total = 0.0
+        self.last_build_time = 0.0
+        self.resources_build_time = 0.0
+
+    @property
+    def resources(self) -> AssistantResources:
+        if self._resources is None:
+            with self._lock:
+                if self._resources is None:
+                    start_time = time.time()
+                    self._resources = AssistantResources()
+                    self.resources_build_time = time.time() - start_time
+                    logger.info(f"Assistant resources built in {self.resources_build_time:.2f} seconds")
+        return self._resources
+
+    def startup(self):
+        """Build the shared resources eagerly so the first chat does not pay for them."""
+        return self.resources
+
+    def _lookup(self, key: str) -> Optional[RestaurantAssistant]:
+        with self._lock:
+            assistant = self._assistants.get(key)
+            if assistant is not None:
+                self._assistants.move_to_end(key)
+                self.hits += 1
+                return assistant
+            self.misses += 1
+            return None
+
+    def _store(self, key: str, assistant: RestaurantAssistant, elapsed_time: float) -> RestaurantAssistant:
+        with self._lock:
+            self.builds += 1
+            self.build_time_total += elapsed_time
+            self.last_build_time = elapsed_time
+            existing = self._assistants.get(key)
+            if existing is not None:
+                self._assistants.move_to_end(key)
+                return existing
+            self._assistants[key] = assistant
+            while len(self._assistants) > self.max_size:
+                self._assistants.popitem(last=False)
+                self.evictions += 1
+        return assistant
+
+    async def aget_assistant(self, restaurant_id) -> RestaurantAssistant:
+        key = str(restaurant_id)
+        assistant = self._lookup(key)
+        if assistant is not None:
+            return assistant
+
+        start_time = time.time()
+        restaurant_context, restaurant_scope = await services.afetch_restaurant_profile(restaurant_id)
+        assistant = RestaurantAssistant(
+            restaurant_id=restaurant_id,
+            resources=self.resources,
+            restaurant_context=restaurant_context,
+            restaurant_scope=restaurant_scope,
+        )
+        return self._store(key, assistant, time.time() - start_time)
+
+    async def asession(self, restaurant_id, history: Optional[List[BaseMessage]] = None) -> AssistantSession:
+        return AssistantSession(await self.aget_assistant(restaurant_id), history=history)
+
+    def invalidate(self, restaurant_id=None):
+        """Drop the warm assistant for a restaurant, or all of them when no id is given."""
+        with self._lock:
+            if restaurant_id is None:
+                self._assistants.clear()
+            else:
+                self._assistants.pop(str(restaurant_id), None)
+
+    def stats(self) -> Dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "size": len(self._assistants),
+                "max_size": self.max_size,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "evictions": self.evictions,
+                "builds": self.builds,
+                "avg_build_time": self.build_time_total / self.builds if self.builds else 0.0,
+                "last_build_time": self.last_build_time,
+                "resources_build_time": self.resources_build_time,
+            }
+
+
+assistant_registry = AssistantRegistry()
+on_restaurant_updated(assistant_registry.invalidate)
@@ -0,0 +1,168 @@
+import re
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, List, NamedTuple, Optional, Tuple
+
+import numpy as np
+from langchain_core.embeddings import Embeddings
+
+from config_project.config import settings
+
+
+class CachedResponse(NamedTuple):
+    vector: np.ndarray
+    response: str
+    expires_at: float
+
+
+class CacheLookup(NamedTuple):
+    response: Optional[str]
+    vector: Optional[np.ndarray]
+    similarity: float = 0.0
+    generation: tuple = (0, 0)
+
+
+def normalize_question(question: str) -> str:
+    return " ".join(re.sub(r"[^\w\s]", " ", question.lower()).split())
+
+
+class SemanticResponseCache:
+    """
+    Answers keyed by restaurant and question embedding.
+
+    A question hits when its embedding is at least `threshold` cosine-similar to a
+    cached question for the same restaurant. Entries expire after `ttl` seconds, the
+    whole cache is capped at `max_size` entries (LRU) and a restaurant's entries are
+    dropped when its data changes. A lookup carries the restaurant's generation,
+    which invalidation bumps, so an answer generated across an update is not stored.
+    Answers depend only on the question, so callers only use the cache for
+    questions asked without chat history.
+    """
+
+    def __init__(
+        self,
+        embeddings: Embeddings,
+        threshold: float = settings.RESPONSE_CACHE_SIMILARITY,
+        ttl: float = settings.RESPONSE_CACHE_TTL_SECONDS,
+        max_size: int = settings.RESPONSE_CACHE_SIZE,
+    ):
+        self.embeddings = embeddings
+        self.threshold = threshold
+        self.ttl = ttl
+        self.max_size = max_size
+        self._entries: "OrderedDict[Tuple[str, str], CachedResponse]" = OrderedDict()
+        # restaurant id -> normalized questions cached for it
+        self._by_restaurant: Dict[str, Dict[str, None]] = {}
+        self._generations: Dict[str, int] = {}
+        self._epoch = 0
+        self._lock = threading.Lock()
+        self.lookups = 0
+        self.exact_hits = 0
+        self.semantic_hits = 0
+        self.stores = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.invalidations = 0
+
+    def _drop(self, key: Tuple[str, str]):
+        self._entries.pop(key, None)
+        questions = self._by_restaurant.get(key[0])
+        if questions is not None:
+            questions.pop(key[1], None)
+            if not questions:
+                del self._by_restaurant[key[0]]
+
+    def _live_entries(self, restaurant_id: str, now: float) -> List[Tuple[Tuple[str, str], CachedResponse]]:
+        entries = []
+        for question in list(self._by_restaurant.get(restaurant_id, ())):
+            key = (restaurant_id, question)
+            entry = self._entries[key]
+            if entry.expires_at <= now:
+                self._drop(key)
+                self.expirations += 1
+            else:
+                entries.append((key, entry))
+        return entries
+
+    def _generation(self, restaurant_id: str) -> tuple:
+        return self._epoch, self._generations.get(restaurant_id, 0)
+
+    async def lookup(self, restaurant_id, question: str) -> CacheLookup:
+        restaurant_id = str(restaurant_id)
+        normalized = normalize_question(question)
+        now = time.time()
+        with self._lock:
+            generation = self._generation(restaurant_id)
+            self.lookups += 1
+            entry = self._entries.get((restaurant_id, normalized))
+            if entry is not None and entry.expires_at > now:
+                self._entries.move_to_end((restaurant_id, normalized))
+                self.exact_hits += 1
+                return CacheLookup(entry.response, entry.vector, 1.0, generation)
+            has_candidates = restaurant_id in self._by_restaurant
+
+        vector = np.asarray(await self.embeddings.aembed_query(normalized), dtype=np.float32)
+        vector /= np.linalg.norm(vector) or 1.0
+        if not has_candidates:
+            return CacheLookup(None, vector, generation=generation)
+
+        with self._lock:
+            entries = self._live_entries(restaurant_id, now)
+            if not entries:
+                return CacheLookup(None, vector, generation=generation)
+            similarities = np.stack([entry.vector for _, entry in entries]) @ vector
+            best = int(np.argmax(similarities))
+            if similarities[best] < self.threshold:
+                return CacheLookup(None, vector, float(similarities[best]), generation)
+            key, entry = entries[best]
+            self._entries.move_to_end(key)
+            self.semantic_hits += 1
+            return CacheLookup(entry.response, vector, float(similarities[best]), generation)
+
+    def store(self, restaurant_id, question: str, response: str, lookup: CacheLookup):
+        """Cache `response` unless the restaurant was invalidated since `lookup` was made."""
+        key = (str(restaurant_id), normalize_question(question))
+        vector = lookup.vector
+        with self._lock:
+            if lookup.generation != self._generation(key[0]):
+                return
+            self._entries[key] = CachedResponse(vector, response, time.time() + self.ttl)
+            self._entries.move_to_end(key)
+            self._by_restaurant.setdefault(key[0], {})[key[1]] = None
+            self.stores += 1
+            while len(self._entries) > self.max_size:
+                self._drop(next(iter(self._entries)))
+                self.evictions += 1
+
+    def invalidate(self, restaurant_id=None):
+        with self._lock:
+            if restaurant_id is None:
+                self._entries.clear()
+                self._by_restaurant.clear()
+                self._generations.clear()
+                self._epoch += 1
+                self.invalidations += 1
+                return
+            restaurant_id = str(restaurant_id)
+            for question in list(self._by_restaurant.get(restaurant_id, ())):
+                self._drop((restaurant_id, question))
+            self._generations[restaurant_id] = self._generations.get(restaurant_id, 0) + 1
+            self.invalidations += 1
+
+    def stats(self) -> Dict:
+        with self._lock:
+            hits = self.exact_hits + self.semantic_hits
+            return {
+                "size": len(self._entries),
+                "max_size": self.max_size,
+                "lookups": self.lookups,
+                "hits": hits,
+                "exact_hits": self.exact_hits,
+                "semantic_hits": self.semantic_hits,
+                "hit_rate": hits / self.lookups if self.lookups else 0.0,
+                "stores": self.stores,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+                "invalidations": self.invalidations,
+            }
@@ -1,39 +1,65 @@
+import contextlib
+import logging
 import os
 import time
-from typing import Dict
+from typing import Any, AsyncIterator, Dict, Generator, List, NamedTuple, Optional, Tuple
 from pinecone import Pinecone
 from langchain_pinecone import PineconeVectorStore
 from langchain_openai import ChatOpenAI
-from langchain.agents import Tool, AgentExecutor, OpenAIFunctionsAgent
+from langchain.agents import AgentExecutor
+from langchain_core.documents import Document
+from langchain_core.tools import StructuredTool
+from pydantic import BaseModel, Field
 from langchain.memory import ConversationBufferMemory
-from langchain_core.prompts import MessagesPlaceholder
-from langchain_core.messages import SystemMessage
+from langchain_core.messages import BaseMessage
 from langchain_huggingface import HuggingFaceEmbeddings
 from dotenv import load_dotenv
 from fastapi import HTTPException
 
+from ai_assistants.embedding_service import EmbeddingService
+from ai_assistants.metrics import chat_metrics
+from ai_assistants.prompts import (
+    AGENT_PROMPT,
+    ANSWER_PROMPT,
+    PromptCacheCallback,
+    cacheable_prefix_tokens,
+    tool_schemas,
+    tools_agent,
+)
+from ai_assistants.response_cache import SemanticResponseCache
+from ai_assistants.router import AGENT, PROFILE, RETRIEVAL, COMPARISON_PATTERN, QueryRouter, query_router
+from ai_assistants.retrieval import asearch_with_scores, reranker, search_with_scores
+from ai_assistants.speculation import SpeculativeRetrieval, TurnTimeline, current_speculation
+from ai_assistants.vectorstores import LocalVectorStore
+from config_project.config import settings
+from database import AsyncSessionLocal
+from restaurants import repository as restaurant_repository
 from restaurants import services
+from restaurants.events import on_restaurant_updated
 
 load_dotenv()
 
+logger = logging.getLogger(__name__)
+
 PINECONE_API_KEY = os.environ.get("PINECONE_API_KEY")
 PINECONE_INDEX = os.environ.get("PINECONE_INDEX")
 EMBEDDING_MODEL = os.environ.get("EMBEDDING_MODEL")
 huggingface_token = os.environ.get("HUGGINGFACEHUB_API_TOKEN")
-embeddings = HuggingFaceEmbeddings(model_name=EMBEDDING_MODEL)
+embeddings = EmbeddingService(HuggingFaceEmbeddings(model_name=EMBEDDING_MODEL), model_name=EMBEDDING_MODEL)
+response_cache = SemanticResponseCache(embeddings) if settings.RESPONSE_CACHE_ENABLED else None
+if response_cache is not None:
+    on_restaurant_updated(response_cache.invalidate)
 
 
-class RestaurantAssistant:
-    def __init__(self, restaurant_id: str):
-        self.pc = Pinecone(api_key=PINECONE_API_KEY)
+class AssistantResources:
+    """Stateless parts of the assistant shared by every restaurant and session."""
+
+    def __init__(self, backend: str = settings.VECTOR_STORE_BACKEND):
+        self.backend = backend
+        self.pc = Pinecone(api_key=PINECONE_API_KEY) if backend == "pinecone" else None
         self.chat_model = self.setup_chat_model()
         self.vectorstore = self.setup_vectorstore()
         self.retriever = self.setup_retriever()
-        self.memory = ConversationBufferMemory(memory_key="chat_history", return_messages=True)
-        self.agent = None
-        self.restaurant_context = services.fetch_restaurant_context(restaurant_id)
-        self.initialize_agent()
-    
 
     @staticmethod
     def setup_chat_model():
@@ -42,115 +68,373 @@ class RestaurantAssistant:
             streaming=True,
             temperature=0.3,
             top_p=0.4,
-            max_tokens=1000
+            max_tokens=1000,
+            # Token usage (including cached prompt tokens) on streamed responses
+            stream_usage=True,
         )
 
     def setup_vectorstore(self):
-        return PineconeVectorStore(
-            index=self.pc.Index(PINECONE_INDEX),
-            embedding=embeddings,
-            text_key="text"
-        )
+        if self.backend == "local":
+            return LocalVectorStore.load(settings.LOCAL_VECTOR_STORE_PATH, embeddings)
+        if self.backend == "pinecone":
+            return PineconeVectorStore(
+                index=self.pc.Index(PINECONE_INDEX),
+                embedding=embeddings,
+                text_key="text"
+            )
+        raise ValueError(f"Unknown vector store backend: {self.backend}")
 
     def setup_retriever(self):
-        return self.vectorstore.as_retriever(search_kwargs={"k": 10})
+        return self.vectorstore.as_retriever(search_kwargs={"k": settings.RETRIEVAL_K})
+
 
-    def query_vectorstore(self, query: str) -> str:
+class RestaurantDatabaseInput(BaseModel):
+    query: str = Field(..., description="What to look up in the restaurant reviews.")
+    scope: str = Field(
+        "auto",
+        description="'restaurant' for the user's own restaurant, 'comparison' to include other restaurants "
+                    "in the same neighbourhood, or 'auto' to decide from the query.",
+    )
+
+
+class RestaurantSearchInput(BaseModel):
+    neighbourhood: Optional[str] = Field(
+        None, description="Neighbourhood to search; defaults to the user's own. Use 'any' for all neighbourhoods."
+    )
+    cuisine: Optional[str] = Field(None, description="Cuisine to filter by, e.g. 'Italian'.")
+    min_rating: Optional[float] = Field(None, description="Minimum overall rating from 0 to 5.")
+    order_by: str = Field("rating", description="'rating', 'reviews' or 'name'.")
+    limit: int = Field(10, description="Number of restaurants to return, at most 25.")
+
+
+class ChatTurn(NamedTuple):
+    """
+    A question after the cache and the router have seen it.
+
+    `response` is set when the turn is already answered (a cache hit or a profile
+    answer), `messages` when one model call over prefetched reviews answers it,
+    and neither when the agent has to run.
+    """
+    route: str
+    start_time: float
+    chat_history: List[BaseMessage]
+    cached: Optional[Any]
+    response: Optional[str] = None
+    messages: Optional[List[BaseMessage]] = None
+
+
+class RestaurantAssistant:
+    def __init__(
+        self,
+        restaurant_id: str,
+        resources: Optional[AssistantResources] = None,
+        restaurant_context: Optional[str] = None,
+        restaurant_scope: Optional[Dict] = None,
+    ):
+        self.resources = resources or AssistantResources()
+        self.pc = self.resources.pc
+        self.chat_model = self.resources.chat_model
+        self.vectorstore = self.resources.vectorstore
+        self.retriever = self.resources.retriever
+        self.memory = ConversationBufferMemory(memory_key="chat_history", return_messages=True)
+        self.agent = None
+        self.restaurant_id = restaurant_id
+        if restaurant_context is None:
+            restaurant_context = services.fetch_restaurant_context(restaurant_id)
+        self.restaurant_context = restaurant_context
+        if restaurant_scope is None:
+            restaurant_scope = services.fetch_restaurant_scope(restaurant_id)
+        self.restaurant_scope = restaurant_scope
+        self.router: QueryRouter = query_router
+        self.initialize_agent()
+
+    def _scope(self, query: str, scope: str) -> str:
+        if scope == "auto":
+            return "comparison" if COMPARISON_PATTERN.search(query) else "restaurant"
+        return scope
+
+    def retrieval_plan(self, query: str, scope: str = "auto") -> List[Tuple[str, Optional[Dict], int]]:
+        """
+        Ordered (scope, metadata filter, k) searches for a query.
+
+        Plain questions search the user's own restaurant and only fall back to
+        restaurants of the same cuisine (nearby when the neighbourhood is known), then
+        the whole index, when it has too few reviews; comparison questions add reviews
+        of same-cuisine restaurants and of the neighbourhood.
+        """
+        k = settings.RETRIEVAL_K
+        restaurant_name = self.restaurant_scope.get("restaurant_name")
+        if settings.RETRIEVAL_SCOPE_MODE == "global" or not restaurant_name:
+            return [("all", None, k)]
+        neighbourhood = self.restaurant_scope.get("neighbourhood")
+        cuisine = self.restaurant_scope.get("cuisine")
+        same_cuisine = None
+        if cuisine:
+            cuisine_filter = {"cuisine": {"$in": [cuisine]}}
+            if neighbourhood:
+                cuisine_filter["neighbourhood"] = neighbourhood
+            same_cuisine = ("cuisine", cuisine_filter, k)
+        own = ("restaurant", {"restaurant_name": restaurant_name}, k)
+        if self._scope(query, scope) != "comparison":
+            return [own] + ([same_cuisine] if same_cuisine else []) + [("all", None, k)]
+        wider = ("neighbourhood", {"neighbourhood": neighbourhood}, k) if neighbourhood else ("all", None, k)
+        plan = [("restaurant", own[1], k // 2)]
+        if same_cuisine:
+            plan.append(("cuisine", same_cuisine[1], k // 2))
+        return plan + [wider]
+
+    def _merge_stage(self, docs: List[Tuple[str, Document]], stage: str, query: str, found: List[Tuple[Document, float]], k: int):
+        seen = {doc.page_content for _, doc in docs}
+        fresh = [(doc, score) for doc, score in found if doc.page_content not in seen]
+        docs.extend((stage, doc) for doc in reranker.rerank(query, fresh, k))
+
+    def _stage_done(self, query: str, scope: str, docs: List) -> bool:
+        # Widening is only a fallback for plain questions, once enough reviews were found
+        return self._scope(query, scope) != "comparison" and len(docs) >= settings.RETRIEVAL_MIN_SCOPED_RESULTS
+
+    def format_documents(self, docs: List[Tuple[str, Document]]) -> str:
+        if not any(stage in ("cuisine", "neighbourhood") for stage, _ in docs):
+            return "\n\n".join(doc.page_content for _, doc in docs)
+        neighbourhood = self.restaurant_scope.get("neighbourhood")
+        nearby = f" in {neighbourhood}" if neighbourhood else ""
+        headings = {
+            "restaurant": "Reviews of this restaurant",
+            "cuisine": f"Reviews of other {self.restaurant_scope.get('cuisine')} restaurants{nearby}",
+            "neighbourhood": f"Reviews of other restaurants{nearby}",
+            "all": "Reviews of other restaurants",
+        }
+        sections = []
+        for stage, heading in headings.items():
+            reviews = [
+                doc.page_content if stage == "restaurant"
+                else f"{doc.metadata.get('restaurant_name', 'Another restaurant')}: {doc.page_content}"
+                for doc_stage, doc in docs if doc_stage == stage
+            ]
+            if reviews:
+                sections.append(f"{heading}:\n" + "\n\n".join(reviews))
+        return "\n\n".join(sections)
+
+    def _retrieval(self, query: str, scope: str, start_time: float) -> Generator[Dict, List[Tuple[Document, float]], str]:
+        """
+        The staged search for `query`, shared by the sync and async lookups.
+
+        Yields the keyword arguments of each vector search and is sent back its
+        results; returns the formatted reviews once enough were found.
+        """
+        docs: List[Tuple[str, Document]] = []
+        for stage, metadata_filter, k in self.retrieval_plan(query, scope):
+            stage_start = time.time()
+            fetch_k = k * settings.RETRIEVAL_CANDIDATE_FACTOR
+            found = yield {"k": fetch_k, "filter": metadata_filter} if metadata_filter else {"k": fetch_k}
+            chat_metrics.record_retrieval(stage, time.time() - stage_start, len(found))
+            self._merge_stage(docs, stage, query, found, k)
+            if self._stage_done(query, scope, docs):
+                break
+        response = self.format_documents(reranker.trim(docs))
+        logger.info(f"Vector store query time: {time.time() - start_time:.2f} seconds")
+        return response
+
+    def query_vectorstore(self, query: str, scope: str = "auto") -> str:
+        start_time = time.time()
+        vector = self.vectorstore.embeddings.embed_query(query)
+        retrieval = self._retrieval(query, scope, start_time)
+        try:
+            search_kwargs = next(retrieval)
+            while True:
+                search_kwargs = retrieval.send(search_with_scores(self.vectorstore, vector, **search_kwargs))
+        except StopIteration as done:
+            return done.value
+
+    async def aquery_vectorstore(self, query: str, scope: str = "auto") -> str:
         start_time = time.time()
-        docs = self.retriever.get_relevant_documents(query)
-        response = "\n\n".join(doc.page_content for doc in docs)
-        elapsed_time = time.time() - start_time
-        print(f"Vector store query time: {elapsed_time:.2f} seconds")
+        vector = await self.vectorstore.embeddings.aembed_query(query)
+        retrieval = self._retrieval(query, scope, start_time)
+        try:
+            search_kwargs = next(retrieval)
+            while True:
+                search_kwargs = retrieval.send(await asearch_with_scores(self.vectorstore, vector, **search_kwargs))
+        except StopIteration as done:
+            return done.value
+
+    async def arestaurant_database(self, query: str, scope: str = "auto") -> str:
+        """restaurant_database tool: reuses this turn's speculative lookup when the query and retrieval plan match."""
+        speculation = current_speculation.get()
+        lookup = speculation.claim(query, self.retrieval_plan(query, scope)) if speculation else None
+        if lookup is not None:
+            try:
+                return await lookup
+            except Exception as exc:
+                logger.warning(f"Speculative retrieval failed, searching again: {str(exc)}")
+        return await self.aquery_vectorstore(query, scope)
+
+    @contextlib.asynccontextmanager
+    async def _agent_turn(self, query: str):
+        """
+        Run an agent turn with the scoped lookup for `query` already started.
+
+        Yields the turn's TurnTimeline, which must be passed as a callback to the
+        agent; the overlap it measured is recorded when the turn ends.
+        """
+        timeline = TurnTimeline()
+        speculation = None
+        if settings.CHAT_SPECULATIVE_RETRIEVAL:
+            speculation = SpeculativeRetrieval(query, self.retrieval_plan(query), self.aquery_vectorstore(query), timeline)
+        token = current_speculation.set(speculation)
+        try:
+            yield timeline
+        finally:
+            current_speculation.reset(token)
+            if speculation:
+                speculation.finish()
+            timeline.record(AGENT)
+
+    def _search_filters(self, neighbourhood, cuisine, min_rating, order_by, limit) -> Dict:
+        if neighbourhood is None:
+            neighbourhood = self.restaurant_scope.get("neighbourhood")
+        elif neighbourhood.lower() == "any":
+            neighbourhood = None
+        return {
+            "neighbourhood": neighbourhood,
+            "cuisine": cuisine,
+            "min_rating": min_rating,
+            "order_by": order_by if order_by in ("rating", "reviews", "name") else "rating",
+            "limit": max(1, min(limit, 25)),
+        }
+
+    def search_restaurants(self, neighbourhood=None, cuisine=None, min_rating=None, order_by="rating", limit=10) -> str:
+        start_time = time.time()
+        filters = self._search_filters(neighbourhood, cuisine, min_rating, order_by, limit)
+        rows = restaurant_repository.search_restaurants(**filters)
+        response = services.format_search_results(services.to_search_response(rows, filters["limit"]).items)
+        chat_metrics.record_retrieval("restaurant_search", time.time() - start_time, len(rows))
+        return response
+
+    async def asearch_restaurants(self, neighbourhood=None, cuisine=None, min_rating=None, order_by="rating", limit=10) -> str:
+        start_time = time.time()
+        filters = self._search_filters(neighbourhood, cuisine, min_rating, order_by, limit)
+        async with AsyncSessionLocal() as db:
+            rows = await services.asearch_restaurant_rows(db, **filters)
+        response = services.format_search_results(services.to_search_response(rows, filters["limit"]).items)
+        chat_metrics.record_retrieval("restaurant_search", time.time() - start_time, len(rows))
         return response
 
     def initialize_agent(self):
         """Initialize single agent with both tools"""
         tools = [
-            Tool(
+            StructuredTool.from_function(
                 name="restaurant_database",
                 func=self.query_vectorstore,
+                coroutine=self.arestaurant_database,
+                args_schema=RestaurantDatabaseInput,
                 description="Use this tool first to search the verified UK restaurant database. "
                             "It provides detailed restaurant information, including reviews, ratings, popular dishes, "
-                            "and location details. Always check this database before considering other sources."
+                            "and location details. Always check this database before considering other sources. "
+                            "Use scope 'comparison' when the user compares against other restaurants."
+            ),
+            StructuredTool.from_function(
+                name="restaurant_ranking",
+                func=self.search_restaurants,
+                coroutine=self.asearch_restaurants,
+                args_schema=RestaurantSearchInput,
+                description="Lists restaurants ranked by overall rating (or review count), filtered by neighbourhood, "
+                            "cuisine and minimum rating. Use it to compare the user's restaurant with nearby ones."
             ),
-            Tool(
-                name="general_search",
-                func=lambda q: self.chat_model.invoke(q).content,
-                description="Use this tool only if the restaurant database lacks sufficient information. "
-                            "It helps find recent reviews, current status, or additional details about UK restaurants."
-            )
         ]
 
-        system_message = SystemMessage(
-            content=f"""You are a UK restaurant information specialist with access to two tools:
-            1. A verified restaurant database (primary source)
-            2. A general search capability (backup source)
-
-            Follow these steps strictly for EVERY query:
-
-            1. Always check the verified restaurant database first for information.
-            2. Use a general search only if the database lacks sufficient details.
-            3. Combine both sources seamlessly (without mentioning them).
-            4. Stick strictly to the user's query (do not add extra details).
-            5. Summarize key points from multiple reviews where possible
-
-
-            Guidelines:
-            - Only provide information about UK restaurants(never include restaurants outside the UK) 
-            - Find the most relevant information about [restaurant name] in [city, UK] regarding [specific query].
-            - If the user asks about comparison, automatically fetch nearby restaurants and rank them by overall rating
-            - Respond ONLY to the question asked (DO NOT include extra restaurant details if they are not relevant)
-            - Never mention ambiance, decor, or service unless explicitly asked
-            - If information is unclear or unavailable, acknowledge it
-            - If asked about a specific restaurant, first check its available menu, popular dishes, or customer preferences.
-            - Only provide reviews about [restaurant name] if they are specifically relevant to the query
-            - KEEP RESPONSES UNDER 500 WORDS WHILE MAINTAINING QUALITY AND DETAIL, IF YOU DONT I WILL KILL YOU !!
-            
-            Formatting guidelines:
-            - Use natural paragraph formatting with proper spacing for clarity.
-            - Make sure that the headings are always on a new line for readability
-            - Use bullet points for key information
-            - Avoid Markdown symbols like #, **, and unnecessary \n
-            - Give me response as markdown format 
-
-            Important Note:
-            NEVER mention which tool or source provided the information."""
-        )
-
-        prompt = OpenAIFunctionsAgent.create_prompt(
-            system_message=system_message,
-            extra_prompt_messages=[MessagesPlaceholder(variable_name="chat_history")]
-        )
-
-        agent = OpenAIFunctionsAgent(
-            llm=self.chat_model,
-            tools=tools,
-            prompt=prompt
+        schemas = tool_schemas(tools)
+        agent = tools_agent(
+            self.chat_model,
+            # The restaurant context sits right after the shared system prompt, ahead of the history
+            AGENT_PROMPT.partial(restaurant_context=self.restaurant_context),
+            schemas,
         )
+        self.agent_prefix_tokens = cacheable_prefix_tokens(self.restaurant_context, schemas)
+        self.answer_prefix_tokens = cacheable_prefix_tokens(self.restaurant_context)
 
         self.agent = AgentExecutor.from_agent_and_tools(
             agent=agent,
             tools=tools,
-            memory=self.memory,
+            return_intermediate_steps=True,
             verbose=True,
             handle_parsing_errors=True,
             max_iterations=3
         )
 
-    def format_query_with_context(self, query: str) -> str:
-        return f"""The following questions are about this restaurant:\n{self.restaurant_context}\n\nUser question:\n{query}"""
+    async def _fast_path(self, query: str, chat_history: List[BaseMessage]) -> Tuple[str, Optional[str], Optional[List[BaseMessage]]]:
+        """
+        (route, direct answer, answer prompt) for a question.
 
-    async def get_response(self, query: str) -> Dict:
+        Profile questions get a direct answer from the restaurant row; retrieval
+        questions get the messages for a single model call over reviews fetched up
+        front. A route that cannot answer falls through to the next one, ending at
+        the agent, which gets neither.
+        """
+        route = self.router.classify(query, self.restaurant_scope.get("restaurant_name"))
+        if route == PROFILE:
+            try:
+                answer = self.router.answer_profile(query, await services.afetch_restaurant_facts(self.restaurant_id))
+            except Exception as exc:
+                logger.error(f"Error answering from the restaurant profile: {str(exc)}", exc_info=True)
+                answer = None
+            if answer is not None:
+                return PROFILE, answer, None
+            route = RETRIEVAL
+        if route == RETRIEVAL:
+            reviews = await self.aquery_vectorstore(query, "restaurant")
+            if reviews.strip():
+                return RETRIEVAL, None, ANSWER_PROMPT.format_messages(
+                    restaurant_context=self.restaurant_context,
+                    chat_history=chat_history,
+                    reviews=reviews,
+                    input=query,
+                )
+        return AGENT, None, None
+
+    def _prompt_usage(self, route: str) -> PromptCacheCallback:
+        prefix_tokens = self.agent_prefix_tokens if route == AGENT else self.answer_prefix_tokens
+        return PromptCacheCallback(prefix_tokens, label=route)
+
+    async def _start_turn(self, query: str, memory: ConversationBufferMemory) -> ChatTurn:
+        """Everything before a model call, shared by get_response and astream_response."""
+        start_time = time.time()
+        chat_history: List[BaseMessage] = memory.load_memory_variables({})["chat_history"]
+        # Follow-ups depend on the conversation, so only opening questions use the shared cache
+        use_cache = response_cache is not None and not chat_history
+        cached = await response_cache.lookup(self.restaurant_id, query) if use_cache else None
+        if cached and cached.response is not None:
+            return ChatTurn("cache", start_time, chat_history, cached, response=cached.response)
+        route, response, messages = await self._fast_path(query, chat_history)
+        return ChatTurn(route, start_time, chat_history, cached, response, messages)
+
+    def _finish_turn(self, query: str, memory: ConversationBufferMemory, turn: ChatTurn, response: str, tool_calls: int = 0):
+        memory.save_context({"input": query}, {"output": response})
+        if turn.cached and turn.route != "cache":
+            response_cache.store(self.restaurant_id, query, response, turn.cached)
+        chat_metrics.record_turn(turn.route, time.time() - turn.start_time, tool_calls)
+
+    async def get_response(self, query: str, memory: Optional[ConversationBufferMemory] = None) -> Dict:
+        memory = memory or self.memory
         start_time = time.time()
         try:
-            result = self.agent.invoke({
-                "input": self.format_query_with_context(query),
-            })
-            response = result['output'] if isinstance(result, dict) else str(result)
+            turn = await self._start_turn(query, memory)
+            response, tool_calls = turn.response, 0
+            if turn.messages is not None:
+                message = await self.chat_model.ainvoke(turn.messages, config={"callbacks": [self._prompt_usage(turn.route)]})
+                response = message.content
+                tool_calls = 1
+            elif response is None:
+                async with self._agent_turn(query) as timeline:
+                    result = await self.agent.ainvoke(
+                        {"input": query, "chat_history": turn.chat_history},
+                        config={"callbacks": [self._prompt_usage(turn.route), timeline]},
+                    )
+                response = result['output'] if isinstance(result, dict) else str(result)
+                tool_calls = len(result.get("intermediate_steps", []))
+            self._finish_turn(query, memory, turn, response, tool_calls)
 
             return {
                 "response": response,
-                "agent_used": "unified",
+                "agent_used": "unified" if turn.route == AGENT else turn.route,
                 "elapsed_time": time.time() - start_time
             }
         except Exception as e:
@@ -161,11 +445,73 @@ class RestaurantAssistant:
                 "elapsed_time": time.time() - start_time
             }
 
-    async def on_message(self, message):
+    async def astream_response(
+        self, query: str, memory: Optional[ConversationBufferMemory] = None
+    ) -> AsyncIterator[Dict]:
+        """
+        Stream the reply as events: answer tokens, tool start/end and a final "end" event.
+        """
+        memory = memory or self.memory
+        turn = await self._start_turn(query, memory)
+        response, tool_calls = turn.response, 0
+        if response is not None:
+            yield {"type": "token", "content": response}
+        elif turn.messages is not None:
+            tool_calls = 1
+            chunks = []
+            async for chunk in self.chat_model.astream(turn.messages, config={"callbacks": [self._prompt_usage(turn.route)]}):
+                if chunk.content:
+                    chunks.append(chunk.content)
+                    yield {"type": "token", "content": chunk.content}
+            response = "".join(chunks)
+        else:
+            async with self._agent_turn(query) as timeline:
+                async for event in self.agent.astream_events(
+                    {"input": query, "chat_history": turn.chat_history},
+                    config={"callbacks": [self._prompt_usage(turn.route), timeline]},
+                    version="v2",
+                ):
+                    kind = event["event"]
+                    if kind == "on_chat_model_stream":
+                        content = event["data"]["chunk"].content
+                        if content:
+                            yield {"type": "token", "content": content}
+                    elif kind == "on_tool_start":
+                        tool_calls += 1
+                        yield {"type": "tool_start", "tool": event["name"]}
+                    elif kind == "on_tool_end":
+                        yield {"type": "tool_end", "tool": event["name"]}
+                    elif kind == "on_chain_end" and not event.get("parent_ids"):
+                        output = event["data"].get("output")
+                        response = output["output"] if isinstance(output, dict) else str(output)
+
+        if response is not None:
+            self._finish_turn(query, memory, turn, response, tool_calls)
+        yield {"type": "end", "response": response, "elapsed_time": time.time() - turn.start_time}
+
+    async def on_message(self, message, memory: Optional[ConversationBufferMemory] = None):
         try:
-            response_data = await self.get_response(message)
+            response_data = await self.get_response(message, memory=memory)
             response_text = response_data["response"]
             return response_text
 
         except Exception as e:
             raise HTTPException(status_code=500, detail=f"Error: {str(e)}")
+
+
+class AssistantSession:
+    """Cheap per-session wrapper around a shared, warm RestaurantAssistant."""
+
+    def __init__(self, assistant: RestaurantAssistant, history: Optional[List[BaseMessage]] = None):
+        self.assistant = assistant
+        self.memory = ConversationBufferMemory(memory_key="chat_history", return_messages=True)
+        self.memory.chat_memory.add_messages(history or [])
+
+    async def get_response(self, query: str) -> Dict:
+        return await self.assistant.get_response(query, memory=self.memory)
+
+    async def on_message(self, message):
+        return await self.assistant.on_message(message, memory=self.memory)
+
+    def astream_response(self, query: str) -> AsyncIterator[Dict]:
+        return self.assistant.astream_response(query, memory=self.memory)
@@ -0,0 +1,163 @@
+"""
+Post-processing of vector search candidates before they reach the agent.
+
+The vector store is asked for a wider candidate pool than the agent needs. The
+pool is scored again with BM25 over its own texts, the two scores are min-max
+normalised and blended, near-identical passages are dropped and the survivors are
+packed, best first, into a token budget.
+"""
+import asyncio
+import math
+import re
+import threading
+from collections import Counter
+from typing import Dict, List, Optional, Tuple
+
+from langchain_core.documents import Document
+from langchain_core.vectorstores import VectorStore
+
+from ai_assistants.memory import count_tokens
+from config_project.config import settings
+
+TOKEN_PATTERN = re.compile(r"\w+")
+STOPWORDS = frozenset(
+    "a an and are as at be but by for from had has have i in is it its of on or our so that the their "
+    "there they this to was we were what when which who with you your".split()
+)
+
+
+def tokenize(text: str) -> List[str]:
+    return [t for t in TOKEN_PATTERN.findall(text.lower()) if t not in STOPWORDS]
+
+
+def _shingles(tokens: List[str], size: int = 3) -> frozenset:
+    if len(tokens) < size:
+        return frozenset([tuple(tokens)])
+    return frozenset(tuple(tokens[i:i + size]) for i in range(len(tokens) - size + 1))
+
+
+def _min_max(scores: List[float]) -> List[float]:
+    low, high = min(scores), max(scores)
+    if high - low < 1e-9:
+        return [1.0 for _ in scores]
+    return [(s - low) / (high - low) for s in scores]
+
+
+def bm25_scores(query: str, texts: List[List[str]], k1: float = 1.5, b: float = 0.75) -> List[float]:
+    """BM25 of `query` against each tokenized text, with IDF taken from the texts themselves."""
+    terms = set(tokenize(query))
+    if not terms or not texts:
+        return [0.0 for _ in texts]
+    average_length = sum(len(t) for t in texts) / len(texts) or 1.0
+    document_frequency = Counter(term for tokens in texts for term in set(tokens) & terms)
+    idf = {
+        term: math.log(1 + (len(texts) - document_frequency[term] + 0.5) / (document_frequency[term] + 0.5))
+        for term in terms
+    }
+    scores = []
+    for tokens in texts:
+        frequencies = Counter(tokens)
+        norm = k1 * (1 - b + b * len(tokens) / average_length)
+        scores.append(sum(
+            idf[term] * frequencies[term] * (k1 + 1) / (frequencies[term] + norm)
+            for term in terms if frequencies[term]
+        ))
+    return scores
+
+
+def search_with_scores(vectorstore: VectorStore, vector: List[float], **kwargs) -> List[Tuple[Document, float]]:
+    return vectorstore.similarity_search_by_vector_with_score(vector, **kwargs)
+
+
+async def asearch_with_scores(vectorstore: VectorStore, vector: List[float], **kwargs) -> List[Tuple[Document, float]]:
+    search = getattr(vectorstore, "asimilarity_search_by_vector_with_score", None)
+    if search is not None:
+        return await search(vector, **kwargs)
+    return await asyncio.to_thread(vectorstore.similarity_search_by_vector_with_score, vector, **kwargs)
+
+
+class HybridReranker:
+    """
+    Blends vector and BM25 relevance, removes near-duplicates and enforces a token budget.
+
+    `alpha` weights the vector score (1.0 is pure vector ranking, 0.0 pure BM25).
+    Two passages are duplicates when the Jaccard similarity of their word 3-shingles
+    reaches `dedupe_threshold`; the better-ranked one is kept.
+    """
+
+    def __init__(
+        self,
+        alpha: float = settings.RETRIEVAL_HYBRID_ALPHA,
+        dedupe_threshold: float = settings.RETRIEVAL_DEDUPE_SIMILARITY,
+        token_budget: int = settings.RETRIEVAL_TOKEN_BUDGET,
+    ):
+        self.alpha = alpha
+        self.dedupe_threshold = dedupe_threshold
+        self.token_budget = token_budget
+        self._lock = threading.Lock()
+        self.selections = 0
+        self.candidates = 0
+        self.duplicates = 0
+        self.selected = 0
+        self.candidate_tokens = 0
+        self.context_tokens = 0
+
+    def rerank(self, query: str, candidates: List[Tuple[Document, float]], k: int) -> List[Document]:
+        """Best `k` distinct candidates by blended score."""
+        if not candidates:
+            return []
+        tokens = [tokenize(doc.page_content) for doc, _ in candidates]
+        vector_scores = _min_max([score for _, score in candidates])
+        keyword_scores = _min_max(bm25_scores(query, tokens))
+        blended = [self.alpha * v + (1 - self.alpha) * kw for v, kw in zip(vector_scores, keyword_scores)]
+
+        selected: List[Document] = []
+        kept_shingles: List[frozenset] = []
+        duplicates = 0
+        for index in sorted(range(len(candidates)), key=lambda i: -blended[i]):
+            shingles = _shingles(tokens[index])
+            if any(len(shingles & kept) / len(shingles | kept) >= self.dedupe_threshold for kept in kept_shingles):
+                duplicates += 1
+                continue
+            selected.append(candidates[index][0])
+            kept_shingles.append(shingles)
+            if len(selected) >= k:
+                break
+        with self._lock:
+            self.candidates += len(candidates)
+            self.duplicates += duplicates
+            self.candidate_tokens += sum(count_tokens(doc.page_content) for doc, _ in candidates)
+        return selected
+
+    def trim(self, docs: List[Tuple[str, Document]], budget: Optional[int] = None) -> List[Tuple[str, Document]]:
+        """Keep documents in order while they fit the token budget; oversized ones are skipped."""
+        remaining = self.token_budget if budget is None else budget
+        kept = []
+        for stage, doc in docs:
+            tokens = count_tokens(doc.page_content)
+            if tokens > remaining:
+                continue
+            remaining -= tokens
+            kept.append((stage, doc))
+        with self._lock:
+            self.selections += 1
+            self.selected += len(kept)
+            self.context_tokens += sum(count_tokens(doc.page_content) for _, doc in kept)
+        return kept
+
+    def stats(self) -> Dict:
+        with self._lock:
+            return {
+                "alpha": self.alpha,
+                "token_budget": self.token_budget,
+                "selections": self.selections,
+                "candidates": self.candidates,
+                "duplicates_dropped": self.duplicates,
+                "selected": self.selected,
+                "candidate_tokens": self.candidate_tokens,
+                "context_tokens": self.context_tokens,
+                "avg_context_tokens": self.context_tokens / self.selections if self.selections else 0.0,
+            }
+
+
+reranker = HybridReranker()
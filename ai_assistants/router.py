@@ -0,0 +1,135 @@
+"""
+Query router in front of the restaurant agent.
+
+Each question is sent down the cheapest route that can answer it:
+
+- "profile": facts stored on the restaurant row (rating, review count, star
+  breakdown, cuisine, location, price, hours), answered from the cached profile
+  with no model call.
+- "retrieval": questions about the restaurant's own reviews, answered by one
+  scoped retrieval followed by one model call.
+- "agent": comparisons, questions asking several things at once and questions
+  naming another restaurant, which need the ranking tool or more than one
+  lookup, so they run the full agent loop.
+
+The profile and retrieval routes only know the user's own restaurant, so a
+question that names any other (a capitalised word that is not part of the
+restaurant's name and does not start a sentence) always goes to the agent.
+"""
+import re
+from typing import Dict, List, Optional
+
+from config_project.config import settings
+
+PROFILE = "profile"
+RETRIEVAL = "retrieval"
+AGENT = "agent"
+
+# Questions that need reviews of other restaurants, not only the user's own
+COMPARISON_PATTERN = re.compile(
+    r"\b(compar\w*|versus|vs\.?|nearby|near by|around here|competitors?|other restaurants|"
+    r"rank\w*|better than|worse than|(best|top|similar)( \w+)? (restaurants?|places|spots))\b",
+    re.IGNORECASE,
+)
+# Fact -> words that ask for it; more specific facts come first
+FACT_PATTERNS = [
+    ("food_rating", re.compile(r"\bfood (rating|score)\b", re.IGNORECASE)),
+    ("service_rating", re.compile(r"\bservice (rating|score)\b", re.IGNORECASE)),
+    ("ambience_rating", re.compile(r"\bambi(ence|ance) (rating|score)\b", re.IGNORECASE)),
+    ("star_breakdown", re.compile(r"\b(star breakdown|breakdown of (the )?(stars|ratings)|how many (\w+[- ])?stars?)\b", re.IGNORECASE)),
+    ("total_review_counts", re.compile(r"\b(how many reviews|number of reviews|review count|reviews do we have)\b", re.IGNORECASE)),
+    ("overall_rating", re.compile(r"\b(overall rating|our rating|my rating|(what is|what's) (the |our |my )?rating|average rating)\b", re.IGNORECASE)),
+    ("cuisine", re.compile(r"\b(cuisines?|type of food|kind of food)\b", re.IGNORECASE)),
+    ("restaurant_location", re.compile(r"\b(address|where (is|are)|located|location)\b", re.IGNORECASE)),
+    ("average_price", re.compile(r"\b(average price|price (range|band|level)|how expensive)\b", re.IGNORECASE)),
+    ("hours_of_operation", re.compile(r"\b(opening hours|hours of operation|what time|when (do|does|are) .*\b(open|close))\b", re.IGNORECASE)),
+]
+# Questions about opinions, causes or advice need the reviews even when they mention a fact
+REVIEW_PATTERN = re.compile(
+    r"\b(why|how can|how do|improve|customers?|guests?|people|diners|say|said|think|feel|complain\w*|"
+    r"feedback|reviews? (say|mention)|dish(es)?|menu|recommend\w*|like|liked|dislike\w*|should)\b",
+    re.IGNORECASE,
+)
+MAX_PROFILE_WORDS = 20
+NAME_PATTERN = re.compile(r"\b[A-Z][\w&'-]*")
+
+
+def _number(value, digits: int = 1) -> str:
+    return f"{value:.{digits}f}" if isinstance(value, float) else str(value)
+
+
+def _fact_sentence(fact: str, facts: Dict) -> Optional[str]:
+    name = facts.get("restaurant_name") or "The restaurant"
+    if fact == "star_breakdown":
+        counts = [facts.get(f"{word}_stars") for word in ("five", "four", "three", "two", "one")]
+        if all(count is None for count in counts):
+            return None
+        return f"{name} has " + ", ".join(
+            f"{count or 0} {stars}-star" for count, stars in zip(counts, (5, 4, 3, 2, 1))
+        ) + " reviews."
+    value = facts.get(fact)
+    if value in (None, ""):
+        return None
+    if fact == "overall_rating":
+        reviews = facts.get("total_review_counts")
+        suffix = f" from {reviews} reviews" if reviews else ""
+        return f"{name} has an overall rating of {_number(value)} out of 5{suffix}."
+    if fact == "total_review_counts":
+        return f"{name} has {value} reviews."
+    if fact in ("food_rating", "service_rating", "ambience_rating"):
+        return f"The {fact.split('_')[0]} rating for {name} is {_number(value)} out of 5."
+    if fact == "cuisine":
+        return f"{name} serves {value} cuisine."
+    if fact == "restaurant_location":
+        neighbourhood = facts.get("neighbourhood")
+        return f"{name} is located at {value}" + (f" in {neighbourhood}." if neighbourhood else ".")
+    if fact == "average_price":
+        return f"The average price at {name} is {value}."
+    if fact == "hours_of_operation":
+        return f"{name}'s opening hours are: {value}."
+    return None
+
+
+class QueryRouter:
+    """Classifies questions into profile, retrieval and agent routes with keyword rules, without a model call."""
+
+    def __init__(self, enabled: bool = settings.CHAT_ROUTER_ENABLED):
+        self.enabled = enabled
+
+    def profile_facts(self, query: str) -> List[str]:
+        """Facts a question asks for, or [] when it is not a plain profile lookup."""
+        if len(query.split()) > MAX_PROFILE_WORDS or REVIEW_PATTERN.search(query):
+            return []
+        return [fact for fact, pattern in FACT_PATTERNS if pattern.search(query)]
+
+    def names_other_restaurant(self, query: str, restaurant_name: Optional[str] = None) -> bool:
+        """Whether the question names something other than `restaurant_name`, such as another restaurant."""
+        own_words = {word.lower() for word in re.findall(r"[\w&'-]+", restaurant_name or "")}
+        for match in NAME_PATTERN.finditer(query):
+            before = query[:match.start()].rstrip()
+            if not before or before[-1] in ".?!":
+                continue
+            word = re.sub(r"'s$", "", match.group()).lower()
+            if word != "i" and word not in own_words:
+                return True
+        return False
+
+    def classify(self, query: str, restaurant_name: Optional[str] = None) -> str:
+        """The route for a question; `restaurant_name` is the user's own restaurant."""
+        if not self.enabled or COMPARISON_PATTERN.search(query) or query.count("?") > 1:
+            return AGENT
+        if self.names_other_restaurant(query, restaurant_name):
+            return AGENT
+        if self.profile_facts(query):
+            return PROFILE
+        return RETRIEVAL
+
+    def answer_profile(self, query: str, facts: Dict) -> Optional[str]:
+        """An answer built from the restaurant's stored facts, or None if any requested fact is missing."""
+        sentences = [_fact_sentence(fact, facts) for fact in self.profile_facts(query)]
+        if not sentences or any(sentence is None for sentence in sentences):
+            return None
+        return " ".join(sentences)
+
+
+query_router = QueryRouter()
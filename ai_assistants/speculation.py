@@ -0,0 +1,119 @@
+"""
+Speculative retrieval and overlap timing for the agent loop.
+
+The agent's first step is almost always a restaurant_database lookup for the
+user's question, so that lookup is started alongside the first model call
+instead of after it. When the model then calls restaurant_database with the
+same query (compared after normalize_question) and the same retrieval plan
+(scope and filters), the tool awaits the speculative result instead of
+searching again; a rephrased query searches afresh, since the reviews found
+depend on the query text. A turn that never asks for it cancels it.
+
+TurnTimeline records when each model call, tool call and speculative lookup
+ran, so the time saved by running them concurrently can be reported.
+"""
+import asyncio
+import time
+from contextvars import ContextVar
+from typing import Any, Awaitable, Dict, List, Optional, Tuple
+from uuid import UUID
+
+from langchain_core.callbacks import BaseCallbackHandler
+
+from ai_assistants.metrics import chat_metrics
+from ai_assistants.response_cache import normalize_question
+
+current_speculation: ContextVar[Optional["SpeculativeRetrieval"]] = ContextVar("current_speculation", default=None)
+
+
+class TurnTimeline(BaseCallbackHandler):
+    """Busy intervals of one agent turn: model calls, tool calls and speculative lookups."""
+
+    # Record timestamps as events happen rather than from a thread pool
+    run_inline = True
+
+    def __init__(self):
+        self.intervals: List[Tuple[float, float]] = []
+        self._started: Dict[UUID, float] = {}
+
+    def add(self, start: float, end: float):
+        self.intervals.append((start, end))
+
+    def _start(self, run_id: UUID):
+        self._started[run_id] = time.monotonic()
+
+    def _end(self, run_id: UUID):
+        start = self._started.pop(run_id, None)
+        if start is not None:
+            self.add(start, time.monotonic())
+
+    def on_chat_model_start(self, serialized: Dict, messages: List, *, run_id: UUID, **kwargs: Any) -> None:
+        self._start(run_id)
+
+    def on_llm_end(self, response: Any, *, run_id: UUID, **kwargs: Any) -> None:
+        self._end(run_id)
+
+    def on_llm_error(self, error: BaseException, *, run_id: UUID, **kwargs: Any) -> None:
+        self._end(run_id)
+
+    def on_tool_start(self, serialized: Dict, input_str: str, *, run_id: UUID, **kwargs: Any) -> None:
+        self._start(run_id)
+
+    def on_tool_end(self, output: Any, *, run_id: UUID, **kwargs: Any) -> None:
+        self._end(run_id)
+
+    def on_tool_error(self, error: BaseException, *, run_id: UUID, **kwargs: Any) -> None:
+        self._end(run_id)
+
+    def overlap(self) -> Tuple[float, float]:
+        """(busy, overlapped) seconds: the sum of all intervals, and how much of it ran concurrently."""
+        busy = sum(end - start for start, end in self.intervals)
+        covered = 0.0
+        covered_until = float("-inf")
+        for start, end in sorted(self.intervals):
+            if end > covered_until:
+                covered += end - max(start, covered_until)
+                covered_until = end
+        return busy, busy - covered
+
+    def record(self, label: str):
+        busy, overlapped = self.overlap()
+        chat_metrics.record_overlap(label, busy, overlapped)
+
+
+class SpeculativeRetrieval:
+    """A scoped vector-store lookup started before the model asks for it."""
+
+    def __init__(self, query: str, plan: List, lookup: Awaitable[str], timeline: Optional[TurnTimeline] = None):
+        self.query = normalize_question(query)
+        self.plan = plan
+        self.timeline = timeline
+        self.started_at = time.monotonic()
+        self.finished_at: Optional[float] = None
+        self.task = asyncio.ensure_future(lookup)
+        self.task.add_done_callback(self._done)
+        self.claimed = False
+
+    def _done(self, task: "asyncio.Future"):
+        self.finished_at = time.monotonic()
+
+    def claim(self, query: str, plan: List) -> Optional["asyncio.Future"]:
+        """The speculative lookup if `query` and `plan` match and it has not been used yet, else None."""
+        if self.claimed or plan != self.plan or normalize_question(query) != self.query:
+            return None
+        self.claimed = True
+        chat_metrics.record_speculation(hit=True)
+        if self.timeline is not None:
+            # Only the part done before the tool asked counts; the tool call's own interval covers the rest
+            self.timeline.add(self.started_at, self.finished_at or time.monotonic())
+        return self.task
+
+    def finish(self):
+        """End of turn: cancel the lookup if the model never asked for it."""
+        if self.claimed:
+            return
+        if self.task.done() and not self.task.cancelled():
+            # Retrieve a failure so it is not reported as never retrieved
+            self.task.exception()
+        self.task.cancel()
+        chat_metrics.record_speculation(hit=False)
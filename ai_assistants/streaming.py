@@ -0,0 +1,77 @@
+import asyncio
+import json
+import logging
+from typing import AsyncIterator, Dict
+
+from config_project.config import settings
+
+logger = logging.getLogger(__name__)
+
+_DONE = object()
+
+
+async def buffered_stream(
+    events: AsyncIterator[Dict],
+    max_buffered: int = settings.CHAT_STREAM_BUFFER_SIZE,
+    stall_timeout: float = settings.CHAT_STREAM_STALL_TIMEOUT,
+) -> AsyncIterator[Dict]:
+    """
+    Decouple the agent run from a slow client with a bounded buffer.
+
+    The agent runs in its own task and blocks once `max_buffered` events are waiting,
+    so a slow reader throttles generation instead of growing memory. Tokens queued
+    behind a slow reader are merged into a single event. If the reader stalls for
+    longer than `stall_timeout`, or stops iterating (client disconnect), the agent
+    run is cancelled so we stop paying for an abandoned generation.
+    """
+    queue: asyncio.Queue = asyncio.Queue()
+    slots = asyncio.Semaphore(max_buffered)
+
+    async def produce():
+        try:
+            async for event in events:
+                await asyncio.wait_for(slots.acquire(), timeout=stall_timeout)
+                queue.put_nowait(event)
+        except asyncio.TimeoutError:
+            logger.warning("Chat stream reader stalled, cancelling generation.")
+            queue.put_nowait({"type": "error", "detail": "Client too slow, generation cancelled."})
+        except Exception as exc:
+            logger.error(f"Error in chat stream: {str(exc)}", exc_info=True)
+            queue.put_nowait({"type": "error", "detail": "An error occurred while processing your message."})
+        queue.put_nowait(_DONE)
+
+    def release(event):
+        if event is not _DONE and event["type"] != "error":
+            slots.release()
+        return event
+
+    producer = asyncio.create_task(produce())
+    # An event taken off the queue while merging tokens, to be yielded next
+    held = None
+    try:
+        while True:
+            if held is not None:
+                event, held = held, None
+            else:
+                event = release(await queue.get())
+            if event is _DONE:
+                break
+            if event["type"] == "token":
+                content = [event["content"]]
+                while not queue.empty():
+                    queued = release(queue.get_nowait())
+                    if queued is _DONE or queued["type"] != "token":
+                        held = queued
+                        break
+                    content.append(queued["content"])
+                event = {"type": "token", "content": "".join(content)}
+            yield event
+    finally:
+        if not producer.done():
+            producer.cancel()
+            logger.info("Chat stream closed by client, generation cancelled.")
+
+
+def to_sse(event: Dict) -> str:
+    """Format an event as a Server-Sent Events frame."""
+    return f"event: {event['type']}\ndata: {json.dumps(event)}\n\n"
@@ -0,0 +1,325 @@
+"""
+Vector store backends for the restaurant assistant.
+
+`pinecone` is the hosted index. `local` is an in-process index persisted to a
+directory of memory-mapped NumPy files:
+
+    index.json        dimension, document count and index type
+    vectors.npy       L2-normalised float32 matrix, opened with mmap_mode="r"
+    documents.jsonl   one {"id", "text", "metadata"} object per vector row
+    ivf_*.npy         inverted-file lists, only for large corpora
+
+Small corpora are searched by brute force (one matrix-vector product). Above
+LOCAL_INDEX_IVF_THRESHOLD vectors, the rows are clustered with k-means and a query
+only scores the rows in its `nprobe` nearest clusters.
+
+Import an export (JSONL with "text"/"metadata" and optional precomputed "values"):
+    python -m ai_assistants.vectorstores --input reviews.jsonl --output vector_index
+"""
+import argparse
+import json
+import logging
+import time
+import uuid
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+from langchain_core.documents import Document
+from langchain_core.embeddings import Embeddings
+from langchain_core.vectorstores import VectorStore
+
+from config_project.config import settings
+
+logger = logging.getLogger(__name__)
+
+
+def _normalize(matrix: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(matrix, axis=-1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return matrix / norms
+
+
+def _top_k(scores: np.ndarray, k: int) -> np.ndarray:
+    if len(scores) <= k:
+        return np.argsort(-scores)
+    top = np.argpartition(-scores, k)[:k]
+    return top[np.argsort(-scores[top])]
+
+
+def _kmeans(sample: np.ndarray, clusters: int, iterations: int = 10, seed: int = 0) -> np.ndarray:
+    rng = np.random.default_rng(seed)
+    centroids = sample[rng.choice(len(sample), clusters, replace=False)].copy()
+    for _ in range(iterations):
+        assignments = np.argmax(sample @ centroids.T, axis=1)
+        for cluster in range(clusters):
+            members = sample[assignments == cluster]
+            if len(members):
+                centroids[cluster] = members.mean(axis=0)
+        centroids = _normalize(centroids)
+    return centroids
+
+
+def _matches(field: Any, value: Any) -> bool:
+    if isinstance(field, (list, tuple)):
+        return any(str(item) == str(value) for item in field)
+    return str(field) == str(value)
+
+
+class LocalVectorStore(VectorStore):
+    """In-process cosine-similarity index with optional IVF acceleration."""
+
+    def __init__(
+        self,
+        embedding: Embeddings,
+        vectors: Optional[np.ndarray] = None,
+        documents: Optional[List[Dict]] = None,
+        ivf: Optional[Tuple[np.ndarray, np.ndarray, np.ndarray]] = None,
+        nprobe: int = settings.LOCAL_INDEX_NPROBE,
+    ):
+        self._embedding = embedding
+        self._vectors = vectors
+        # Batches added since the matrix was last built; stacked once, when it is next read
+        self._added: List[np.ndarray] = []
+        self.documents = documents or []
+        # (centroids, row ids ordered by cluster, cluster offsets into that order)
+        self.ivf = ivf
+        self.nprobe = nprobe
+        self._filter_cache: Dict[Tuple[str, str], np.ndarray] = {}
+
+    @property
+    def embeddings(self) -> Embeddings:
+        return self._embedding
+
+    @property
+    def vectors(self) -> Optional[np.ndarray]:
+        if self._added:
+            parts = self._added if self._vectors is None else [self._vectors, *self._added]
+            self._vectors = np.concatenate(parts)
+            self._added = []
+        return self._vectors
+
+    # --- building ---
+
+    def add_texts(
+        self,
+        texts: Iterable[str],
+        metadatas: Optional[List[dict]] = None,
+        ids: Optional[List[str]] = None,
+        vectors: Optional[List[List[float]]] = None,
+        **kwargs: Any,
+    ) -> List[str]:
+        texts = list(texts)
+        if not texts:
+            return []
+        metadatas = metadatas or [{} for _ in texts]
+        ids = ids or [str(uuid.uuid4()) for _ in texts]
+        if vectors is None:
+            vectors = self._embedding.embed_documents(texts)
+        self._added.append(_normalize(np.asarray(vectors, dtype=np.float32)))
+        self.documents.extend({"id": i, "text": t, "metadata": m} for i, t, m in zip(ids, texts, metadatas))
+        self.ivf = None
+        self._filter_cache.clear()
+        return ids
+
+    @classmethod
+    def from_texts(
+        cls,
+        texts: List[str],
+        embedding: Embeddings,
+        metadatas: Optional[List[dict]] = None,
+        **kwargs: Any,
+    ) -> "LocalVectorStore":
+        store = cls(embedding)
+        store.add_texts(texts, metadatas=metadatas, **kwargs)
+        return store
+
+    def build_ivf(self, clusters: Optional[int] = None, sample_size: int = 100_000):
+        count = len(self.documents)
+        clusters = clusters or max(1, int(np.sqrt(count)))
+        rng = np.random.default_rng(0)
+        sample = np.asarray(self.vectors[rng.choice(count, min(sample_size, count), replace=False)])
+        centroids = _kmeans(sample, clusters)
+        assignments = np.empty(count, dtype=np.int32)
+        for start in range(0, count, 65_536):
+            chunk = np.asarray(self.vectors[start:start + 65_536])
+            assignments[start:start + len(chunk)] = np.argmax(chunk @ centroids.T, axis=1)
+        order = np.argsort(assignments, kind="stable").astype(np.int64)
+        offsets = np.searchsorted(assignments[order], np.arange(clusters + 1)).astype(np.int64)
+        self.ivf = (centroids, order, offsets)
+
+    def save(self, path: str, ivf_threshold: int = settings.LOCAL_INDEX_IVF_THRESHOLD):
+        directory = Path(path)
+        directory.mkdir(parents=True, exist_ok=True)
+        if self.ivf is None and len(self.documents) > ivf_threshold:
+            self.build_ivf()
+        np.save(directory / "vectors.npy", np.asarray(self.vectors, dtype=np.float32))
+        with open(directory / "documents.jsonl", "w", encoding="utf-8") as f:
+            for document in self.documents:
+                f.write(json.dumps(document) + "\n")
+        if self.ivf is not None:
+            for name, array in zip(("centroids", "order", "offsets"), self.ivf):
+                np.save(directory / f"ivf_{name}.npy", array)
+        with open(directory / "index.json", "w", encoding="utf-8") as f:
+            json.dump({
+                "dimension": int(self.vectors.shape[1]),
+                "count": len(self.documents),
+                "index": "ivf" if self.ivf is not None else "flat",
+            }, f)
+
+    @classmethod
+    def load(cls, path: str, embedding: Embeddings, **kwargs: Any) -> "LocalVectorStore":
+        directory = Path(path)
+        with open(directory / "index.json", encoding="utf-8") as f:
+            info = json.load(f)
+        vectors = np.load(directory / "vectors.npy", mmap_mode="r")
+        with open(directory / "documents.jsonl", encoding="utf-8") as f:
+            documents = [json.loads(line) for line in f]
+        ivf = None
+        if info["index"] == "ivf":
+            ivf = tuple(np.load(directory / f"ivf_{name}.npy") for name in ("centroids", "order", "offsets"))
+        logger.info(f"Loaded local vector index with {info['count']} vectors ({info['index']}) from {path}")
+        return cls(embedding, vectors=vectors, documents=documents, ivf=ivf, **kwargs)
+
+    # --- searching ---
+
+    def _filtered_ids(self, filter: Dict) -> np.ndarray:
+        """
+        Row ids whose metadata matches every key of `filter` (a value, {"$eq": v} or {"$in": [...]}).
+
+        As in Pinecone, a list-valued metadata field matches when any of its items does.
+        """
+        ids = None
+        for key, condition in filter.items():
+            if isinstance(condition, dict):
+                values = condition["$in"] if "$in" in condition else [condition["$eq"]]
+            else:
+                values = [condition]
+            matches = []
+            for value in values:
+                cache_key = (key, str(value))
+                if cache_key not in self._filter_cache:
+                    self._filter_cache[cache_key] = np.fromiter(
+                        (i for i, d in enumerate(self.documents) if _matches(d["metadata"].get(key), value)),
+                        dtype=np.int64,
+                    )
+                matches.append(self._filter_cache[cache_key])
+            key_ids = np.unique(np.concatenate(matches)) if matches else np.empty(0, dtype=np.int64)
+            ids = key_ids if ids is None else np.intersect1d(ids, key_ids, assume_unique=True)
+        return ids
+
+    def _candidates(self, query: np.ndarray, filter: Optional[Dict]) -> Optional[np.ndarray]:
+        """Row ids worth scoring, or None to score every row."""
+        if filter:
+            # Metadata filters are selective, so score the matching rows exactly
+            return self._filtered_ids(filter)
+        if self.ivf is None:
+            return None
+        centroids, order, offsets = self.ivf
+        probes = _top_k(centroids @ query, self.nprobe)
+        return np.concatenate([order[offsets[c]:offsets[c + 1]] for c in probes])
+
+    def similarity_search_with_score_by_vector(
+        self, embedding: List[float], k: int = 4, filter: Optional[Dict] = None, **kwargs: Any
+    ) -> List[Tuple[Document, float]]:
+        if self.vectors is None or not self.documents:
+            return []
+        query = _normalize(np.asarray(embedding, dtype=np.float32))
+        candidates = self._candidates(query, filter)
+        if candidates is None:
+            scores = self.vectors @ query
+            top = _top_k(scores, k)
+            top_scores = scores[top]
+        else:
+            candidates = np.sort(candidates)
+            scores = np.asarray(self.vectors[candidates]) @ query
+            order = _top_k(scores, k)
+            top, top_scores = candidates[order], scores[order]
+        results = []
+        for row, score in zip(top, top_scores):
+            document = self.documents[row]
+            results.append((
+                Document(page_content=document["text"], metadata=document["metadata"], id=document["id"]),
+                float(score),
+            ))
+        return results
+
+    def similarity_search_by_vector(self, embedding: List[float], k: int = 4, **kwargs: Any) -> List[Document]:
+        return [doc for doc, _ in self.similarity_search_with_score_by_vector(embedding, k, **kwargs)]
+
+    # Same name as PineconeVectorStore, so callers can request scores from either backend
+    similarity_search_by_vector_with_score = similarity_search_with_score_by_vector
+
+    def similarity_search_with_score(self, query: str, k: int = 4, **kwargs: Any) -> List[Tuple[Document, float]]:
+        return self.similarity_search_with_score_by_vector(self._embedding.embed_query(query), k, **kwargs)
+
+    def similarity_search(self, query: str, k: int = 4, **kwargs: Any) -> List[Document]:
+        return [doc for doc, _ in self.similarity_search_with_score(query, k, **kwargs)]
+
+    async def asimilarity_search_by_vector(self, embedding: List[float], k: int = 4, **kwargs: Any) -> List[Document]:
+        # Sub-millisecond for in-process indexes, so skip the executor hop
+        return self.similarity_search_by_vector(embedding, k, **kwargs)
+
+    async def asimilarity_search_by_vector_with_score(
+        self, embedding: List[float], k: int = 4, **kwargs: Any
+    ) -> List[Tuple[Document, float]]:
+        return self.similarity_search_with_score_by_vector(embedding, k, **kwargs)
+
+    async def asimilarity_search(self, query: str, k: int = 4, **kwargs: Any) -> List[Document]:
+        return self.similarity_search_by_vector(await self._embedding.aembed_query(query), k, **kwargs)
+
+    def _select_relevance_score_fn(self):
+        return lambda score: score
+
+
+def import_export(input_path: str, output_path: str, embedding: Optional[Embeddings] = None, text_key: str = "text", batch_size: int = 256):
+    """
+    Build a local index from a JSONL export.
+
+    Each line holds "text" (or metadata[text_key]), optional "metadata", optional "id"
+    and optional "values" with a precomputed vector; lines without "values" are
+    embedded in batches.
+    """
+    store = LocalVectorStore(embedding)
+    batch: List[Dict] = []
+
+    def flush():
+        texts = [r["text"] for r in batch]
+        vectors = [r["values"] for r in batch] if all("values" in r for r in batch) else None
+        if vectors is None and embedding is None:
+            raise ValueError("Export has no precomputed vectors and no embedding model was provided.")
+        store.add_texts(texts, metadatas=[r["metadata"] for r in batch], ids=[r["id"] for r in batch], vectors=vectors)
+        batch.clear()
+
+    start_time = time.time()
+    with open(input_path, encoding="utf-8") as f:
+        for line in f:
+            if not line.strip():
+                continue
+            record = json.loads(line)
+            metadata = dict(record.get("metadata") or {})
+            text = record.get("text") or metadata.pop(text_key, "")
+            entry = {"text": text, "metadata": metadata, "id": str(record.get("id") or uuid.uuid4())}
+            if "values" in record:
+                entry["values"] = record["values"]
+            batch.append(entry)
+            if len(batch) >= batch_size:
+                flush()
+    if batch:
+        flush()
+    store.save(output_path)
+    elapsed_time = time.time() - start_time
+    print(f"Imported {len(store.documents)} documents into {output_path} in {elapsed_time:.2f} seconds")
+    return store
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Import a JSONL export into a local vector index.")
+    parser.add_argument("--input", required=True, help="JSONL export to import.")
+    parser.add_argument("--output", default=settings.LOCAL_VECTOR_STORE_PATH, help="Index directory to write.")
+    parser.add_argument("--text-key", default="text", help="Metadata key holding the text when there is no top-level text.")
+    args = parser.parse_args()
+
+    from ai_assistants.restaurant_reviews import embeddings
+
+    import_export(args.input, args.output, embedding=embeddings, text_key=args.text_key)
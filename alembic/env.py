@@ -25,7 +25,9 @@ if config.config_file_name is not None:
 # target_metadata = mymodel.Base.metadata
 from database import Base
 from users.model import User
-from restaurants.model import Restaurant
+from restaurants.model import Restaurant, ReviewEvent
+from chats.model import ChatMessage
+from emails.model import OutboxEmail
 
 target_metadata = Base.metadata
 
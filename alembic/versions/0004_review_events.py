@@ -0,0 +1,50 @@
+"""review events and sub-rating counts
+
+Revision ID: 8a2d5e7c1b34
+Revises: 3f1c2b7d9e4a
+Create Date: 2026-10-18 14:05:12.504113
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '8a2d5e7c1b34'
+down_revision: Union[str, None] = '3f1c2b7d9e4a'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('review_events',
+    sa.Column('idempotency_key', sa.String(), nullable=False),
+    sa.Column('restaurant_id', sa.UUID(), nullable=False),
+    sa.Column('stars', sa.Integer(), nullable=False),
+    sa.Column('food_rating', sa.Float(), nullable=True),
+    sa.Column('service_rating', sa.Float(), nullable=True),
+    sa.Column('ambience_rating', sa.Float(), nullable=True),
+    sa.Column('created_at', sa.DateTime(), nullable=False),
+    sa.PrimaryKeyConstraint('idempotency_key')
+    )
+    op.create_index(op.f('ix_review_events_restaurant_id'), 'review_events', ['restaurant_id'], unique=False)
+    op.add_column('restaurants', sa.Column('food_rating_count', sa.Integer(), nullable=True))
+    op.add_column('restaurants', sa.Column('service_rating_count', sa.Integer(), nullable=True))
+    op.add_column('restaurants', sa.Column('ambience_rating_count', sa.Integer(), nullable=True))
+    # Existing sub-rating averages were computed over all reviews
+    op.execute(
+        "UPDATE restaurants SET food_rating_count = total_review_counts, "
+        "service_rating_count = total_review_counts, ambience_rating_count = total_review_counts"
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_column('restaurants', 'ambience_rating_count')
+    op.drop_column('restaurants', 'service_rating_count')
+    op.drop_column('restaurants', 'food_rating_count')
+    op.drop_index(op.f('ix_review_events_restaurant_id'), table_name='review_events')
+    op.drop_table('review_events')
@@ -0,0 +1,50 @@
+"""restaurant search indexes
+
+Revision ID: c47e9b2f6a10
+Revises: 8a2d5e7c1b34
+Create Date: 2026-10-18 15:21:48.117562
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c47e9b2f6a10'
+down_revision: Union[str, None] = '8a2d5e7c1b34'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+    # Keyset orderings used by /restaurants/search; expressions match restaurants.repository.SEARCH_ORDERS
+    op.create_index('ix_restaurants_rating_id', 'restaurants',
+                    [sa.text('coalesce(overall_rating, 0) DESC'), 'id'], unique=False)
+    op.create_index('ix_restaurants_reviews_id', 'restaurants',
+                    [sa.text('coalesce(total_review_counts, 0) DESC'), 'id'], unique=False)
+    op.create_index('ix_restaurants_neighbourhood_rating_id', 'restaurants',
+                    [sa.text('lower(neighbourhood)'), sa.text('coalesce(overall_rating, 0) DESC'), 'id'], unique=False)
+    op.create_index('ix_restaurants_average_price', 'restaurants', ['average_price'], unique=False)
+    # Substring (ILIKE '%...%') matching on names, cuisines and tags
+    for column in ('restaurant_name', 'cuisine', 'tags'):
+        op.create_index(f'ix_restaurants_{column}_trgm', 'restaurants', [column], unique=False,
+                        postgresql_using='gin', postgresql_ops={column: 'gin_trgm_ops'})
+    # Full-text search on names
+    op.create_index('ix_restaurants_name_fts', 'restaurants',
+                    [sa.text("to_tsvector('simple', coalesce(restaurant_name, ''))")], unique=False,
+                    postgresql_using='gin')
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_restaurants_name_fts', table_name='restaurants')
+    for column in ('tags', 'cuisine', 'restaurant_name'):
+        op.drop_index(f'ix_restaurants_{column}_trgm', table_name='restaurants')
+    op.drop_index('ix_restaurants_average_price', table_name='restaurants')
+    op.drop_index('ix_restaurants_neighbourhood_rating_id', table_name='restaurants')
+    op.drop_index('ix_restaurants_reviews_id', table_name='restaurants')
+    op.drop_index('ix_restaurants_rating_id', table_name='restaurants')
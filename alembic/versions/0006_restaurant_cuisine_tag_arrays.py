@@ -0,0 +1,47 @@
+"""restaurant cuisine and tag arrays
+
+Revision ID: 5d0b3a91e7f2
+Revises: c47e9b2f6a10
+Create Date: 2026-10-18 16:02:37.950318
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision: str = '5d0b3a91e7f2'
+down_revision: Union[str, None] = 'c47e9b2f6a10'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # Stored generated columns: adding them rewrites the table, which backfills every
+    # existing row, and Postgres keeps them in step with cuisine/tags afterwards
+    op.add_column('restaurants', sa.Column('cuisines', postgresql.ARRAY(sa.String()), sa.Computed(
+        r"array_remove(regexp_split_to_array(lower(btrim(cuisine)), '\s*,\s*'), '')", persisted=True
+    ), nullable=True))
+    op.add_column('restaurants', sa.Column('tag_list', postgresql.ARRAY(sa.String()), sa.Computed(
+        r"array_remove(regexp_split_to_array(lower(btrim(tags)), '\s*,\s*'), '')", persisted=True
+    ), nullable=True))
+    op.create_index('ix_restaurants_cuisines', 'restaurants', ['cuisines'], unique=False, postgresql_using='gin')
+    op.create_index('ix_restaurants_tag_list', 'restaurants', ['tag_list'], unique=False, postgresql_using='gin')
+    # Cuisine and tag filters now use the arrays instead of substring matching
+    op.drop_index('ix_restaurants_tags_trgm', table_name='restaurants')
+    op.drop_index('ix_restaurants_cuisine_trgm', table_name='restaurants')
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    for column in ('cuisine', 'tags'):
+        op.create_index(f'ix_restaurants_{column}_trgm', 'restaurants', [column], unique=False,
+                        postgresql_using='gin', postgresql_ops={column: 'gin_trgm_ops'})
+    op.drop_index('ix_restaurants_tag_list', table_name='restaurants')
+    op.drop_index('ix_restaurants_cuisines', table_name='restaurants')
+    op.drop_column('restaurants', 'tag_list')
+    op.drop_column('restaurants', 'cuisines')
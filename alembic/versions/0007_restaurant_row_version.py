@@ -0,0 +1,28 @@
+"""restaurant row version
+
+Revision ID: 9e4c27b0d1a6
+Revises: 5d0b3a91e7f2
+Create Date: 2026-10-18 17:21:09.412806
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '9e4c27b0d1a6'
+down_revision: Union[str, None] = '5d0b3a91e7f2'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('restaurants', sa.Column('row_version', sa.Integer(), server_default='1', nullable=False))
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_column('restaurants', 'row_version')
@@ -1,22 +1,37 @@
-from fastapi import FastAPI, HTTPException, Depends
-from pydantic import BaseModel
-from typing import Optional, Dict, List
+from fastapi import FastAPI, HTTPException, Depends, Query, WebSocket, WebSocketDisconnect
+from pydantic import BaseModel, ValidationError
+from typing import Literal, Optional, Dict, List
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.security import HTTPBearer
 from langchain_openai import ChatOpenAI
 from dotenv import load_dotenv
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, StreamingResponse
 from fastapi.requests import Request
 from fastapi.exception_handlers import RequestValidationError
 from fastapi.exceptions import HTTPException as FastAPIHTTPException
+import asyncio
+import contextlib
 import logging
+import uuid
+from collections import deque
 
 from config_project.config import settings
-from users.model import User
+from database import pool_stats
+from users.hashing import password_hasher
+from users.identity import UserSnapshot, identity_cache
 from users.routers import router as users_router
+from restaurants.cache import restaurant_labels, restaurant_names, restaurant_profiles
+from restaurants.events import RestaurantChangeListener
 from restaurants.routers import router as restaurant_router
-from ai_assistants.restaurant_reviews import RestaurantAssistant
-from users.utils import get_current_user
+from ai_assistants.metrics import chat_metrics
+from ai_assistants.registry import assistant_registry
+from ai_assistants.retrieval import reranker
+from ai_assistants.restaurant_reviews import embeddings, response_cache
+from ai_assistants.streaming import buffered_stream, to_sse
+from ai_assistants.memory import session_memory
+from chats.store import chat_history_store
+from emails.worker import email_worker
+from users.utils import aget_current_user, aget_user_for_token
 
 load_dotenv()
 
@@ -26,6 +41,8 @@ logger = logging.getLogger(__name__)
 
 app = FastAPI()
 
+DEFAULT_SESSION_ID = "default"
+
 # Add CORS middleware
 app.add_middleware(
     CORSMiddleware,
@@ -45,19 +62,27 @@ chat_model = ChatOpenAI(
     temperature=0.7,
 )
 
-# Simple in-memory storage for chat history
-chat_history = []
-
 class ChatResponse(BaseModel):
     content: str
     author: Optional[str] = "assistant"
 
 class ChatHistory(BaseModel):
     messages: List[Dict]
+    session_id: str
+    total: int
+    limit: int
+    offset: int
 
 
 class ChatRequest(BaseModel):
     message: str
+    session_id: str = DEFAULT_SESSION_ID
+
+
+class ChatSocketMessage(BaseModel):
+    type: Literal["message", "cancel"] = "message"
+    message: Optional[str] = None
+    session_id: Optional[str] = None
 
 
 security = HTTPBearer()
@@ -89,31 +114,205 @@ async def generic_exception_handler(request: Request, exc: Exception):
         content={"error": "Internal server error", "status_code": 500},
     )
 
+@app.on_event("startup")
+def warm_up_assistants():
+    assistant_registry.startup()
+
+@app.on_event("shutdown")
+def stop_password_hasher():
+    password_hasher.shutdown()
+
+@app.on_event("startup")
+def start_email_worker():
+    if settings.EMAIL_WORKER_IN_PROCESS:
+        email_worker.start()
+
+@app.on_event("shutdown")
+def stop_email_worker():
+    email_worker.shutdown()
+
+# Cross-worker cache invalidation, enabled by RESTAURANT_CHANGE_CHANNEL
+restaurant_changes = (
+    RestaurantChangeListener(settings.POSTGRES_CONNECTION_URI, settings.RESTAURANT_CHANGE_CHANNEL)
+    if settings.RESTAURANT_CHANGE_CHANNEL else None
+)
+
+@app.on_event("startup")
+async def listen_for_restaurant_changes():
+    if restaurant_changes:
+        restaurant_changes.start()
+
+@app.on_event("shutdown")
+async def stop_restaurant_change_listener():
+    if restaurant_changes:
+        await restaurant_changes.stop()
+
 @app.get("/")
 async def root():
     return {"message": "Welcome to the Restaurant Review Assistant API"}
 
+async def open_assistant_session(current_user: UserSnapshot, session_id: str):
+    """Warm assistant for the user's restaurant, primed with the history of this chat session."""
+    history = await session_memory.load(current_user.id, session_id)
+    return await assistant_registry.asession(current_user.restaurant_id, history=history)
+
+async def save_exchange(current_user: UserSnapshot, session_id: str, message: str, response: str):
+    await chat_history_store.append(current_user.id, session_id, [
+        {"content": message, "author": "user"},
+        {"content": response, "author": "assistant"},
+    ])
+    session_memory.after_exchange(current_user.id, session_id, assistant_registry.resources.chat_model)
+
 @app.post("/chat/start")
-async def start_chat(current_user: User = Depends(get_current_user)):
-    global chat_history
-    chat_history = []
-    return {"message": "Chat session started. You can now send messages."}
+async def start_chat(session_id: Optional[str] = None, current_user: UserSnapshot = Depends(aget_current_user)):
+    """
+    Start a new chat session, or reset an existing one when its id is given.
+    """
+    if session_id:
+        await chat_history_store.clear(current_user.id, session_id)
+    else:
+        session_id = uuid.uuid4().hex
+    return {"message": "Chat session started. You can now send messages.", "session_id": session_id}
 
 @app.post("/chat/message")
-async def send_message(input: ChatRequest, current_user: User = Depends(get_current_user)):
-    global chat_history
+async def send_message(input: ChatRequest, current_user: UserSnapshot = Depends(aget_current_user)):
     try:
-        # Add user message to history
-        chat_history.append({"content": input.message, "author": "user"})
-        restaurant_assistant = RestaurantAssistant(restaurant_id=current_user.restaurant_id)
-        response = await restaurant_assistant.on_message(input.message)
-        # Add assistant message to history
-        chat_history.append({"content": response, "author": "assistant"})
+        assistant_session = await open_assistant_session(current_user, input.session_id)
+        response = await assistant_session.on_message(input.message)
+        await save_exchange(current_user, input.session_id, input.message, response)
         return {"response": response, "status_code": 200}
     except Exception as exc:
         logger.error(f"Error in send_message: {str(exc)}", exc_info=True)
         raise HTTPException(status_code=500, detail="An error occurred while processing your message.")
 
+@app.post("/chat/stream")
+async def stream_message(input: ChatRequest, current_user: UserSnapshot = Depends(aget_current_user)):
+    """
+    Stream the assistant reply as Server-Sent Events (token, tool_start, tool_end, end).
+    """
+    assistant_session = await open_assistant_session(current_user, input.session_id)
+
+    async def event_stream():
+        async for event in buffered_stream(assistant_session.astream_response(input.message)):
+            if event["type"] == "end" and event["response"] is not None:
+                await save_exchange(current_user, input.session_id, input.message, event["response"])
+            yield to_sse(event)
+
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+@app.websocket("/chat/ws")
+async def chat_websocket(websocket: WebSocket, token: str, session_id: str = DEFAULT_SESSION_ID):
+    """
+    Stream assistant replies over a WebSocket.
+
+    The client sends {"message": "...", "session_id": "..."} (session_id defaults to
+    the query parameter) and receives the same events as /chat/stream. Messages sent
+    while a reply is streaming are answered in order afterwards. Sending
+    {"type": "cancel"} stops the current reply and drops queued ones; disconnecting
+    stops everything. Malformed messages and failed replies get an "error" event,
+    and the socket stays open for the next message.
+    """
+    try:
+        current_user = await aget_user_for_token(token)
+    except HTTPException:
+        await websocket.close(code=1008)
+        return
+    await websocket.accept()
+
+    async def forward(request: ChatRequest):
+        assistant_session = await open_assistant_session(current_user, request.session_id)
+        async for event in buffered_stream(assistant_session.astream_response(request.message)):
+            if event["type"] == "end" and event["response"] is not None:
+                await save_exchange(current_user, request.session_id, request.message, event["response"])
+            await websocket.send_json(event)
+
+    pending: deque = deque()
+    sender = receiver = None
+    try:
+        while True:
+            if sender is None and pending:
+                sender = asyncio.create_task(forward(pending.popleft()))
+            if receiver is None:
+                receiver = asyncio.create_task(websocket.receive_text())
+            done, _ = await asyncio.wait({receiver} | ({sender} if sender else set()), return_when=asyncio.FIRST_COMPLETED)
+            if sender in done:
+                sender, finished = None, sender
+                try:
+                    finished.result()
+                except WebSocketDisconnect:
+                    raise
+                except Exception as exc:
+                    logger.error(f"Error in chat_websocket: {str(exc)}", exc_info=True)
+                    await websocket.send_json({"type": "error", "detail": "An error occurred while processing your message."})
+            if receiver not in done:
+                continue
+            receiver, received = None, receiver
+            try:
+                envelope = ChatSocketMessage.model_validate_json(received.result())
+            except ValidationError as exc:
+                await websocket.send_json({"type": "error", "detail": exc.errors(include_url=False, include_context=False)})
+                continue
+            if envelope.type == "cancel":
+                # A cancel with nothing streaming is a no-op
+                pending.clear()
+                if sender is not None:
+                    sender.cancel()
+                    with contextlib.suppress(asyncio.CancelledError):
+                        await sender
+                    sender = None
+                    await websocket.send_json({"type": "cancelled"})
+            elif not envelope.message:
+                await websocket.send_json({"type": "error", "detail": "A message is required."})
+            else:
+                pending.append(ChatRequest(message=envelope.message, session_id=envelope.session_id or session_id))
+    except WebSocketDisconnect:
+        logger.info("Chat websocket disconnected.")
+    finally:
+        for task in (sender, receiver):
+            if task is not None and not task.done():
+                task.cancel()
+
 @app.get("/chat/history", response_model=ChatHistory)
-async def get_chat_history(current_user: User = Depends(get_current_user)):
-    return ChatHistory(messages=chat_history)
+async def get_chat_history(
+    session_id: str = DEFAULT_SESSION_ID,
+    limit: int = Query(50, ge=1, le=settings.CHAT_HISTORY_WINDOW),
+    offset: int = Query(0, ge=0),
+    current_user: UserSnapshot = Depends(aget_current_user),
+):
+    """
+    Page through a chat session, oldest message first; `offset` counts back from the newest message.
+    """
+    messages = await chat_history_store.get(current_user.id, session_id, limit=limit, offset=offset)
+    total = await chat_history_store.count(current_user.id, session_id)
+    return ChatHistory(messages=messages, session_id=session_id, total=total, limit=limit, offset=offset)
+
+@app.get("/chat/usage")
+async def get_chat_usage(session_id: str = DEFAULT_SESSION_ID, current_user: UserSnapshot = Depends(aget_current_user)):
+    """
+    Token accounting for a chat session: history tokens sent versus a full replay.
+    """
+    return {"session_id": session_id, **session_memory.usage(current_user.id, session_id)}
+
+@app.get("/metrics")
+async def get_metrics(current_user: UserSnapshot = Depends(aget_current_user)):
+    return {
+        "assistants": assistant_registry.stats(),
+        "chat_history": chat_history_store.stats(),
+        "chat_memory": session_memory.stats(),
+        "response_cache": response_cache.stats() if response_cache else None,
+        "embeddings": embeddings.stats(),
+        "chat": chat_metrics.stats(),
+        "retrieval": reranker.stats(),
+        "auth": identity_cache.stats(),
+        "password_hashing": password_hasher.stats(),
+        "database": pool_stats(),
+        "restaurant_names": restaurant_names.stats(),
+        "restaurant_labels": restaurant_labels.stats(),
+        "restaurant_profiles": restaurant_profiles.stats(),
+        "email_outbox": email_worker.stats(),
+        "restaurant_changes": restaurant_changes.stats() if restaurant_changes else None,
+    }
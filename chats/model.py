@@ -0,0 +1,19 @@
+from sqlalchemy import Column, BigInteger, String, Text, DateTime, Index
+from sqlalchemy.dialects.postgresql import UUID
+from database import Base
+from datetime import datetime
+
+
+class ChatMessage(Base):
+    __tablename__ = "chat_messages"
+
+    id = Column(BigInteger, primary_key=True, autoincrement=True)
+    user_id = Column(UUID(as_uuid=True), nullable=False)
+    session_id = Column(String, nullable=False)
+    author = Column(String, nullable=False)
+    content = Column(Text, nullable=False)
+    created_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+
+    __table_args__ = (
+        Index("ix_chat_messages_user_session_id", "user_id", "session_id", "id"),
+    )
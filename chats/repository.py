@@ -0,0 +1,84 @@
+import logging
+from typing import Dict, List
+from uuid import UUID
+
+from sqlalchemy import func
+
+from database import SessionLocal
+from chats.model import ChatMessage
+
+logger = logging.getLogger(__name__)
+
+
+def add_messages(user_id: UUID, session_id: str, messages: List[Dict], window: int):
+    """Append messages to a chat session and drop everything older than the last `window` messages."""
+    try:
+        with SessionLocal() as db:
+            db.add_all([
+                ChatMessage(user_id=user_id, session_id=session_id, author=m["author"], content=m["content"])
+                for m in messages
+            ])
+            db.flush()
+            cutoff = (
+                db.query(ChatMessage.id)
+                .filter(ChatMessage.user_id == user_id, ChatMessage.session_id == session_id)
+                .order_by(ChatMessage.id.desc())
+                .offset(window)
+                .limit(1)
+                .scalar()
+            )
+            if cutoff is not None:
+                db.query(ChatMessage).filter(
+                    ChatMessage.user_id == user_id,
+                    ChatMessage.session_id == session_id,
+                    ChatMessage.id <= cutoff,
+                ).delete(synchronize_session=False)
+            db.commit()
+    except Exception as exc:
+        logger.error(f"Error in add_messages: {str(exc)}", exc_info=True)
+        raise Exception("Failed to save chat messages to the database.")
+
+
+def get_messages(user_id: UUID, session_id: str, limit: int, offset: int = 0) -> List[Dict]:
+    """Get a page of chat messages, oldest first, counting `offset` back from the newest message."""
+    try:
+        with SessionLocal() as db:
+            rows = (
+                db.query(ChatMessage.id, ChatMessage.author, ChatMessage.content)
+                .filter(ChatMessage.user_id == user_id, ChatMessage.session_id == session_id)
+                .order_by(ChatMessage.id.desc())
+                .offset(offset)
+                .limit(limit)
+                .all()
+            )
+            return [{"content": r.content, "author": r.author, "id": r.id} for r in reversed(rows)]
+    except Exception as exc:
+        logger.error(f"Error in get_messages: {str(exc)}", exc_info=True)
+        raise Exception("Failed to fetch chat messages from the database.")
+
+
+def count_messages(user_id: UUID, session_id: str) -> int:
+    """Count the messages kept for a chat session."""
+    try:
+        with SessionLocal() as db:
+            return (
+                db.query(func.count(ChatMessage.id))
+                .filter(ChatMessage.user_id == user_id, ChatMessage.session_id == session_id)
+                .scalar()
+            )
+    except Exception as exc:
+        logger.error(f"Error in count_messages: {str(exc)}", exc_info=True)
+        raise Exception("Failed to count chat messages in the database.")
+
+
+def delete_messages(user_id: UUID, session_id: str):
+    """Delete every message of a chat session."""
+    try:
+        with SessionLocal() as db:
+            db.query(ChatMessage).filter(
+                ChatMessage.user_id == user_id, ChatMessage.session_id == session_id
+            ).delete(synchronize_session=False)
+            db.commit()
+    except Exception as exc:
+        logger.error(f"Error in delete_messages: {str(exc)}", exc_info=True)
+        raise Exception("Failed to delete chat messages from the database.")
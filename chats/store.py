@@ -0,0 +1,172 @@
+import asyncio
+import threading
+from abc import ABC, abstractmethod
+import time
+from collections import OrderedDict, deque
+from typing import Callable, Deque, Dict, List, Tuple
+
+from config_project.config import settings
+from chats import repository
+
+SessionKey = Tuple[str, str]
+
+
+class ChatHistoryStore(ABC):
+    """
+    Chat history keyed by user and session id.
+
+    Every backend keeps at most `window` messages per session, so the history a
+    session can accumulate is bounded regardless of how long the user chats.
+    Listeners registered with `on_session_removed` are called with the session key
+    whenever a session is cleared, expired or evicted, so state derived from its
+    history can be dropped with it.
+    """
+
+    def __init__(self, window: int = settings.CHAT_HISTORY_WINDOW):
+        self.window = window
+        self._removal_listeners: List[Callable[[SessionKey], None]] = []
+
+    def on_session_removed(self, listener: Callable[[SessionKey], None]):
+        self._removal_listeners.append(listener)
+
+    def _session_removed(self, key: SessionKey):
+        for listener in self._removal_listeners:
+            listener(key)
+
+    @abstractmethod
+    async def append(self, user_id, session_id: str, messages: List[Dict]):
+        ...
+
+    @abstractmethod
+    async def get(self, user_id, session_id: str, limit: int, offset: int = 0) -> List[Dict]:
+        """
+        Return up to `limit` messages, oldest first, skipping the `offset` newest ones.
+
+        Each message carries an `id` that increases within the session.
+        """
+
+    @abstractmethod
+    async def count(self, user_id, session_id: str) -> int:
+        ...
+
+    @abstractmethod
+    async def clear(self, user_id, session_id: str):
+        ...
+
+    def stats(self) -> Dict:
+        return {"backend": type(self).__name__, "window": self.window}
+
+
+class InMemoryChatHistoryStore(ChatHistoryStore):
+    """Process-local store with per-session TTL and an LRU cap on the number of sessions."""
+
+    def __init__(
+        self,
+        window: int = settings.CHAT_HISTORY_WINDOW,
+        max_sessions: int = settings.CHAT_HISTORY_MAX_SESSIONS,
+        ttl: float = settings.CHAT_HISTORY_TTL_SECONDS,
+    ):
+        super().__init__(window)
+        self.max_sessions = max_sessions
+        self.ttl = ttl
+        self._sessions: "OrderedDict[SessionKey, Tuple[float, Deque[Dict]]]" = OrderedDict()
+        self._next_ids: Dict[SessionKey, int] = {}
+        self._lock = threading.Lock()
+        self.evictions = 0
+        self.expirations = 0
+
+    def _expire(self, now: float):
+        # Sessions are kept in access order, so expired ones are always at the front
+        while self._sessions:
+            key, (last_access, _) = next(iter(self._sessions.items()))
+            if now - last_access < self.ttl:
+                break
+            del self._sessions[key]
+            self._next_ids.pop(key, None)
+            self.expirations += 1
+            self._session_removed(key)
+
+    def _messages(self, key: SessionKey, create: bool = False):
+        now = time.time()
+        self._expire(now)
+        entry = self._sessions.get(key)
+        if entry is None:
+            if not create:
+                return None
+            entry = (now, deque(maxlen=self.window))
+        self._sessions[key] = (now, entry[1])
+        self._sessions.move_to_end(key)
+        while len(self._sessions) > self.max_sessions:
+            evicted, _ = self._sessions.popitem(last=False)
+            self._next_ids.pop(evicted, None)
+            self.evictions += 1
+            self._session_removed(evicted)
+        return entry[1]
+
+    async def append(self, user_id, session_id: str, messages: List[Dict]):
+        key = (str(user_id), session_id)
+        with self._lock:
+            session_messages = self._messages(key, create=True)
+            next_id = self._next_ids.get(key, 1)
+            for message in messages:
+                session_messages.append({**message, "id": next_id})
+                next_id += 1
+            self._next_ids[key] = next_id
+
+    async def get(self, user_id, session_id: str, limit: int, offset: int = 0) -> List[Dict]:
+        with self._lock:
+            messages = self._messages((str(user_id), session_id))
+            if not messages:
+                return []
+            end = max(len(messages) - offset, 0)
+            return list(messages)[max(end - limit, 0):end]
+
+    async def count(self, user_id, session_id: str) -> int:
+        with self._lock:
+            messages = self._messages((str(user_id), session_id))
+            return len(messages) if messages else 0
+
+    async def clear(self, user_id, session_id: str):
+        key = (str(user_id), session_id)
+        with self._lock:
+            self._sessions.pop(key, None)
+            self._next_ids.pop(key, None)
+        self._session_removed(key)
+
+    def stats(self) -> Dict:
+        with self._lock:
+            return {
+                **super().stats(),
+                "sessions": len(self._sessions),
+                "max_sessions": self.max_sessions,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+            }
+
+
+class PostgresChatHistoryStore(ChatHistoryStore):
+    """Durable store backed by the chat_messages table, shared by every worker."""
+
+    async def append(self, user_id, session_id: str, messages: List[Dict]):
+        await asyncio.to_thread(repository.add_messages, user_id, session_id, messages, self.window)
+
+    async def get(self, user_id, session_id: str, limit: int, offset: int = 0) -> List[Dict]:
+        return await asyncio.to_thread(repository.get_messages, user_id, session_id, limit, offset)
+
+    async def count(self, user_id, session_id: str) -> int:
+        return await asyncio.to_thread(repository.count_messages, user_id, session_id)
+
+    async def clear(self, user_id, session_id: str):
+        await asyncio.to_thread(repository.delete_messages, user_id, session_id)
+        self._session_removed((str(user_id), session_id))
+
+
+def create_chat_history_store(backend: str = settings.CHAT_HISTORY_BACKEND) -> ChatHistoryStore:
+    if backend == "memory":
+        return InMemoryChatHistoryStore()
+    if backend == "postgres":
+        return PostgresChatHistoryStore()
+    raise ValueError(f"Unknown chat history backend: {backend}")
+
+
+chat_history_store = create_chat_history_store()
@@ -7,17 +7,45 @@ load_dotenv()
 class Settings(BaseSettings):
     # Database Settings
     POSTGRES_CONNECTION_URI: str
+    DB_POOL_SIZE: int = 10
+    DB_MAX_OVERFLOW: int = 20
+    DB_POOL_TIMEOUT_SECONDS: float = 30.0
+    DB_POOL_RECYCLE_SECONDS: int = 1800
+    DB_POOL_PRE_PING: bool = True
+    RESTAURANT_UPSERT_CHUNK_SIZE: int = 1000
+    RESTAURANT_NAMES_TTL_SECONDS: int = 300
+    RESTAURANT_LABELS_TTL_SECONDS: int = 600
+    RESTAURANT_PROFILE_CACHE_SIZE: int = 1000
+    RESTAURANT_PROFILE_TTL_SECONDS: int = 60
+    # Postgres LISTEN/NOTIFY channel for restaurant changes across workers; empty disables it
+    RESTAURANT_CHANGE_CHANNEL: str = ""
     
     # JWT Settings
     JWT_SECRET_KEY: str
     JWT_ALGORITHM: str = "HS256"
     ACCESS_TOKEN_EXPIRE_MINUTES: int = 1440
+    AUTH_CACHE_SIZE: int = 10000
+    AUTH_CACHE_TTL_SECONDS: int = 60
+    PASSWORD_BCRYPT_ROUNDS: int = 12
+    PASSWORD_HASH_WORKERS: int = 2
+    PASSWORD_HASH_CONCURRENCY: int = 4
     
     # SMTP Settings
     SMTP_HOST: str
     SMTP_PORT: int
     SMTP_EMAIL: str
     SMTP_PASSWORD: str
+    # Off for a local SMTP stand-in without TLS
+    SMTP_USE_TLS: bool = True
+    EMAIL_WORKER_IN_PROCESS: bool = True
+    EMAIL_SMTP_CONNECTIONS: int = 2
+    EMAIL_SMTP_IDLE_SECONDS: float = 30.0
+    EMAIL_OUTBOX_BATCH_SIZE: int = 50
+    EMAIL_OUTBOX_POLL_SECONDS: float = 2.0
+    EMAIL_SEND_LEASE_SECONDS: int = 300
+    EMAIL_MAX_ATTEMPTS: int = 6
+    EMAIL_RETRY_BASE_SECONDS: float = 30.0
+    EMAIL_RETRY_MAX_SECONDS: float = 3600.0
     
     # Base URL for email verification links
     BASE_URL: str
@@ -25,10 +53,50 @@ class Settings(BaseSettings):
     # OpenAI Settings
     OPENAI_API_KEY: str
     
+    # Vector Store Settings
+    VECTOR_STORE_BACKEND: str = "pinecone"
+    LOCAL_VECTOR_STORE_PATH: str = "vector_index"
+    LOCAL_INDEX_IVF_THRESHOLD: int = 50000
+    LOCAL_INDEX_NPROBE: int = 8
+    RETRIEVAL_K: int = 10
+    RETRIEVAL_SCOPE_MODE: str = "two_stage"
+    RETRIEVAL_MIN_SCOPED_RESULTS: int = 3
+    RETRIEVAL_CANDIDATE_FACTOR: int = 4
+    RETRIEVAL_HYBRID_ALPHA: float = 0.6
+    RETRIEVAL_DEDUPE_SIMILARITY: float = 0.8
+    RETRIEVAL_TOKEN_BUDGET: int = 1500
+
     # Pinecone Settings
     PINECONE_API_KEY: str
     PINECONE_INDEX: str
     EMBEDDING_MODEL: str
+    EMBEDDING_CACHE_SIZE: int = 10000
+    EMBEDDING_CACHE_PATH: str = ""
+    EMBEDDING_BATCH_SIZE: int = 32
+    EMBEDDING_BATCH_WAIT_MS: float = 5.0
+
+    # Assistant Settings
+    ASSISTANT_CACHE_SIZE: int = 128
+    CHAT_STREAM_BUFFER_SIZE: int = 64
+    CHAT_STREAM_STALL_TIMEOUT: float = 30.0
+    CHAT_ROUTER_ENABLED: bool = True
+    CHAT_SPECULATIVE_RETRIEVAL: bool = True
+
+    # Chat History Settings
+    CHAT_HISTORY_BACKEND: str = "memory"
+    CHAT_HISTORY_WINDOW: int = 100
+    CHAT_HISTORY_MAX_SESSIONS: int = 10000
+    CHAT_HISTORY_TTL_SECONDS: int = 86400
+    CHAT_CONTEXT_MESSAGES: int = 10
+    CHAT_MEMORY_MODE: str = "token_budget"
+    CHAT_MEMORY_TOKEN_BUDGET: int = 2000
+    CHAT_MEMORY_SUMMARY_WORDS: int = 200
+
+    # Response Cache Settings
+    RESPONSE_CACHE_ENABLED: bool = True
+    RESPONSE_CACHE_SIMILARITY: float = 0.95
+    RESPONSE_CACHE_TTL_SECONDS: int = 3600
+    RESPONSE_CACHE_SIZE: int = 5000
     
     class Config:
         env_file = ".env"
@@ -1,32 +1,61 @@
 import smtplib
 from email.mime.text import MIMEText
 from email.mime.multipart import MIMEMultipart
+from typing import Optional
 
 from config_project.config import settings
 from restaurants import repository
 
 
-def send_email(receiver_email: str, subject: str, message: str):
+def build_message(receiver_email: str, subject: str, message: str, text: Optional[str] = None) -> MIMEMultipart:
     """
-    Send an email using SMTP
-    
+    Build a MIME message with an HTML part and, if given, a plain-text alternative.
+
     Args:
         receiver_email (str): Email address of the recipient
         subject (str): Subject of the email
         message (str): HTML content of the email
+        text (str): Plain-text content of the email
     """
     msg = MIMEMultipart('alternative')
     msg['Subject'] = subject
     msg['From'] = settings.SMTP_EMAIL
     msg['To'] = receiver_email
 
-    # Attach the HTML message
+    # Clients show the last alternative they support, so plain text goes first
+    if text:
+        msg.attach(MIMEText(text, 'plain'))
     msg.attach(MIMEText(message, 'html'))
+    return msg
 
+
+def connect_smtp(timeout: float = 30.0) -> smtplib.SMTP:
+    """Open an SMTP session, with STARTTLS and login when configured."""
+    server = smtplib.SMTP(settings.SMTP_HOST, settings.SMTP_PORT, timeout=timeout)
     try:
-        with smtplib.SMTP(settings.SMTP_HOST, settings.SMTP_PORT) as server:
+        if settings.SMTP_USE_TLS:
             server.starttls()
+        if settings.SMTP_PASSWORD:
             server.login(settings.SMTP_EMAIL, settings.SMTP_PASSWORD)
+    except Exception:
+        server.close()
+        raise
+    return server
+
+
+def send_email(receiver_email: str, subject: str, message: str):
+    """
+    Send an email using SMTP
+
+    Args:
+        receiver_email (str): Email address of the recipient
+        subject (str): Subject of the email
+        message (str): HTML content of the email
+    """
+    msg = build_message(receiver_email, subject, message)
+
+    try:
+        with connect_smtp() as server:
             server.send_message(msg)
     except Exception as e:
         print(f"Error sending email: {str(e)}")
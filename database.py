@@ -1,12 +1,61 @@
 import os
+from typing import AsyncIterator, Dict
 from sqlalchemy.orm import declarative_base, sessionmaker
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
 from dotenv import load_dotenv
 from sqlalchemy import create_engine
 load_dotenv()
 
+from config_project.config import settings
+
 # Create Base class for models to inherit from
 Base = declarative_base()
 
+
+def async_connection_uri(uri: str) -> str:
+    """The asyncpg form of a postgres connection URI."""
+    url = make_url(uri)
+    query = dict(url.query)
+    # asyncpg spells libpq's sslmode as ssl
+    if "sslmode" in query:
+        query["ssl"] = query.pop("sslmode")
+    return url.set(drivername="postgresql+asyncpg", query=query).render_as_string(hide_password=False)
+
+
+pool_options = {
+    "pool_size": settings.DB_POOL_SIZE,
+    "max_overflow": settings.DB_MAX_OVERFLOW,
+    "pool_timeout": settings.DB_POOL_TIMEOUT_SECONDS,
+    "pool_recycle": settings.DB_POOL_RECYCLE_SECONDS,
+    "pool_pre_ping": settings.DB_POOL_PRE_PING,
+}
+
 # Create engine and session
-engine = create_engine(os.getenv("POSTGRES_CONNECTION_URI", ""))
+engine = create_engine(os.getenv("POSTGRES_CONNECTION_URI", ""), **pool_options)
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+
+# Async engine for request handlers, so DB waits don't hold threadpool slots
+async_engine = create_async_engine(async_connection_uri(settings.POSTGRES_CONNECTION_URI), **pool_options)
+AsyncSessionLocal = async_sessionmaker(async_engine, autoflush=False, expire_on_commit=False)
+
+
+async def get_async_session() -> AsyncIterator[AsyncSession]:
+    """FastAPI dependency: one session per request, closed when the response is sent."""
+    async with AsyncSessionLocal() as session:
+        yield session
+
+
+def _pool_stats(pool) -> Dict:
+    return {
+        "size": pool.size(),
+        "checked_out": pool.checkedout(),
+        "checked_in": pool.checkedin(),
+        "overflow": max(pool.overflow(), 0),
+        "capacity": settings.DB_POOL_SIZE + settings.DB_MAX_OVERFLOW,
+        "utilisation": pool.checkedout() / (settings.DB_POOL_SIZE + settings.DB_MAX_OVERFLOW),
+    }
+
+
+def pool_stats() -> Dict:
+    return {"sync": _pool_stats(engine.pool), "async": _pool_stats(async_engine.pool)}
@@ -0,0 +1,80 @@
+"""
+Render throughput for bulk email sends.
+
+Compares the old per-call f-string + MIMEMultipart construction with the
+precompiled templates, alone, serialized through the email package, and
+serialized with to_mime as the outbox worker does. No database or SMTP server
+is used.
+
+Usage:
+    python -m emails.benchmark --messages 100000
+"""
+import argparse
+import time
+from email.mime.multipart import MIMEMultipart
+from email.mime.text import MIMEText
+from typing import Callable, Dict, List, Tuple
+
+from config_project.information_gathering.utils import build_message
+from config_project.config import settings
+from emails.templates import get_template, to_mime
+
+
+def legacy_render(recipient: str, values: Dict):
+    message = f"""
+    <html>
+      <body>
+        <p>Dear {values['name']},</p>
+        <p>Click the link to verify your email: {values['link']}</p>
+        <p>For security reasons, please change your password after logging in.</p>
+        <p>If you did not request this, please contact support immediately.</p>
+        <p>Best regards,</p>
+      </body>
+    </html>
+    """
+    msg = MIMEMultipart('alternative')
+    msg['Subject'] = "Verify Email"
+    msg['To'] = recipient
+    msg.attach(MIMEText(message, 'html'))
+    return msg.as_string()
+
+
+def compiled_render(messages: List[Tuple[str, Dict]]) -> int:
+    return sum(1 for _ in get_template("verify_email").render_many(messages))
+
+
+def compiled_render_mime(messages: List[Tuple[str, Dict]]) -> int:
+    count = 0
+    for email in get_template("verify_email").render_many(messages):
+        build_message(email.recipient, email.subject, email.html_body, email.text_body).as_string()
+        count += 1
+    return count
+
+
+def compiled_render_to_mime(messages: List[Tuple[str, Dict]]) -> int:
+    return sum(1 for email in get_template("verify_email").render_many(messages) if to_mime(email, settings.SMTP_EMAIL))
+
+
+def measure(label: str, run: Callable[[], int], count: int):
+    start_time = time.perf_counter()
+    run()
+    elapsed_time = time.perf_counter() - start_time
+    print(f"{label:<36} {count / elapsed_time:>12,.0f} messages/s ({elapsed_time:.2f} s)")
+
+
+def main(count: int):
+    messages = [
+        (f"user{i}@example.com", {"name": f"User <{i}> & Co", "link": f"https://example.com/verify-email?token=t{i:08d}"})
+        for i in range(count)
+    ]
+    measure("f-string + MIME (previous)", lambda: sum(1 for r, v in messages if legacy_render(r, v)), count)
+    measure("compiled template", lambda: compiled_render(messages), count)
+    measure("compiled template + MIMEMultipart", lambda: compiled_render_mime(messages), count)
+    measure("compiled template + to_mime", lambda: compiled_render_to_mime(messages), count)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark bulk email rendering.")
+    parser.add_argument("--messages", type=int, default=100000)
+    args = parser.parse_args()
+    main(args.messages)
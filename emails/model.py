@@ -0,0 +1,26 @@
+from sqlalchemy import Column, BigInteger, Integer, String, Text, DateTime, Index
+from database import Base
+from datetime import datetime
+
+
+class OutboxEmail(Base):
+    __tablename__ = "email_outbox"
+
+    id = Column(BigInteger, primary_key=True, autoincrement=True)
+    recipient = Column(String, nullable=False)
+    subject = Column(String, nullable=False)
+    html_body = Column(Text, nullable=False)
+    text_body = Column(Text, nullable=True)
+    # pending -> sending -> sent, or back to pending for a retry, or dead after the last attempt
+    status = Column(String, default="pending", nullable=False)
+    attempts = Column(Integer, default=0, nullable=False)
+    next_attempt_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+    # A "sending" row whose lease has passed belongs to a worker that died and is claimed again
+    locked_until = Column(DateTime, nullable=True)
+    last_error = Column(Text, nullable=True)
+    created_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+    sent_at = Column(DateTime, nullable=True)
+
+    __table_args__ = (
+        Index("ix_email_outbox_status_next_attempt_at", "status", "next_attempt_at"),
+    )
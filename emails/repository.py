@@ -0,0 +1,140 @@
+import logging
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional
+
+from sqlalchemy import and_, func, insert, or_, select, update
+
+from database import SessionLocal
+from emails.model import OutboxEmail
+
+logger = logging.getLogger(__name__)
+
+
+def enqueue_emails(messages: List[Dict]) -> List[int]:
+    """Add messages (recipient, subject, html_body and optional text_body) to the outbox; returns their ids."""
+    try:
+        with SessionLocal() as db:
+            email_ids = db.scalars(
+                insert(OutboxEmail).returning(OutboxEmail.id),
+                [
+                    {
+                        "recipient": m["recipient"],
+                        "subject": m["subject"],
+                        "html_body": m["html_body"],
+                        "text_body": m.get("text_body"),
+                    }
+                    for m in messages
+                ],
+            ).all()
+            db.commit()
+            return list(email_ids)
+    except Exception as exc:
+        logger.error(f"Error in enqueue_emails: {str(exc)}", exc_info=True)
+        raise Exception("Failed to add emails to the outbox.")
+
+
+def claim_emails(limit: int, lease_seconds: float) -> List[Dict]:
+    """
+    Mark up to `limit` due messages as sending and return them.
+
+    Rows are picked with FOR UPDATE SKIP LOCKED, so several workers can drain the
+    outbox without sending a message twice. Messages left in "sending" by a worker
+    that died are claimed again once their lease expires.
+    """
+    try:
+        now = datetime.utcnow()
+        with SessionLocal() as db:
+            due = (
+                select(OutboxEmail.id)
+                .where(or_(
+                    and_(OutboxEmail.status == "pending", OutboxEmail.next_attempt_at <= now),
+                    and_(OutboxEmail.status == "sending", OutboxEmail.locked_until < now),
+                ))
+                .order_by(OutboxEmail.next_attempt_at)
+                .limit(limit)
+                .with_for_update(skip_locked=True)
+            )
+            rows = db.execute(
+                update(OutboxEmail)
+                .where(OutboxEmail.id.in_(due.scalar_subquery()))
+                .values(
+                    status="sending",
+                    attempts=OutboxEmail.attempts + 1,
+                    locked_until=now + timedelta(seconds=lease_seconds),
+                )
+                .returning(
+                    OutboxEmail.id,
+                    OutboxEmail.recipient,
+                    OutboxEmail.subject,
+                    OutboxEmail.html_body,
+                    OutboxEmail.text_body,
+                    OutboxEmail.attempts,
+                )
+            ).mappings().all()
+            db.commit()
+            return [dict(row) for row in rows]
+    except Exception as exc:
+        logger.error(f"Error in claim_emails: {str(exc)}", exc_info=True)
+        raise Exception("Failed to claim emails from the outbox.")
+
+
+def mark_sent(email_ids: List[int]):
+    if not email_ids:
+        return
+    try:
+        with SessionLocal() as db:
+            db.execute(
+                update(OutboxEmail)
+                .where(OutboxEmail.id.in_(email_ids))
+                .values(status="sent", sent_at=datetime.utcnow(), locked_until=None, last_error=None)
+            )
+            db.commit()
+    except Exception as exc:
+        logger.error(f"Error in mark_sent: {str(exc)}", exc_info=True)
+        raise Exception("Failed to mark outbox emails as sent.")
+
+
+def mark_failed(email_id: int, error: str, retry_at: Optional[datetime]):
+    """Schedule another attempt at `retry_at`, or dead-letter the message when it is None."""
+    try:
+        with SessionLocal() as db:
+            db.execute(
+                update(OutboxEmail)
+                .where(OutboxEmail.id == email_id)
+                .values(
+                    status="pending" if retry_at else "dead",
+                    next_attempt_at=retry_at or OutboxEmail.next_attempt_at,
+                    locked_until=None,
+                    last_error=error[:2000],
+                )
+            )
+            db.commit()
+    except Exception as exc:
+        logger.error(f"Error in mark_failed: {str(exc)}", exc_info=True)
+        raise Exception("Failed to record an outbox email failure.")
+
+
+def requeue_dead(email_ids: Optional[List[int]] = None) -> int:
+    """Move dead-lettered messages (all, or the given ids) back to pending with fresh attempts."""
+    try:
+        with SessionLocal() as db:
+            statement = update(OutboxEmail).where(OutboxEmail.status == "dead")
+            if email_ids is not None:
+                statement = statement.where(OutboxEmail.id.in_(email_ids))
+            result = db.execute(statement.values(status="pending", attempts=0, next_attempt_at=datetime.utcnow()))
+            db.commit()
+            return result.rowcount
+    except Exception as exc:
+        logger.error(f"Error in requeue_dead: {str(exc)}", exc_info=True)
+        raise Exception("Failed to requeue dead outbox emails.")
+
+
+def outbox_counts() -> Dict[str, int]:
+    """Number of messages per status."""
+    try:
+        with SessionLocal() as db:
+            rows = db.execute(select(OutboxEmail.status, func.count()).group_by(OutboxEmail.status)).all()
+            return {status: count for status, count in rows}
+    except Exception as exc:
+        logger.error(f"Error in outbox_counts: {str(exc)}", exc_info=True)
+        raise Exception("Failed to count outbox emails.")
@@ -0,0 +1,322 @@
+"""
+Email outbox worker.
+
+Drains the email_outbox table over a small pool of persistent SMTP connections.
+The API process runs one in a background thread (EMAIL_WORKER_IN_PROCESS); it can
+also run on its own, as many copies as needed:
+
+    python -m emails.worker
+
+For local testing, point SMTP_HOST/SMTP_PORT at a stand-in such as
+`python -m aiosmtpd -n -l localhost:1025` and set SMTP_USE_TLS=false.
+"""
+import logging
+import queue
+import random
+import smtplib
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from itertools import islice
+from typing import Callable, Dict, Iterable, List, Optional
+
+from config_project.config import settings
+from config_project.information_gathering.utils import connect_smtp
+from emails import repository
+from emails.templates import RenderedEmail, to_mime
+
+logger = logging.getLogger(__name__)
+
+
+class SMTPConnectionPool:
+    """
+    Up to `size` SMTP sessions kept open between messages.
+
+    A session is opened (STARTTLS and login included) on first use and reused for
+    later messages. One idle for longer than `idle_timeout` is checked with NOOP
+    before reuse, and a session that failed is discarded rather than returned.
+    """
+
+    def __init__(
+        self,
+        size: int = settings.EMAIL_SMTP_CONNECTIONS,
+        idle_timeout: float = settings.EMAIL_SMTP_IDLE_SECONDS,
+        connect: Callable[[], smtplib.SMTP] = connect_smtp,
+    ):
+        self.size = size
+        self.idle_timeout = idle_timeout
+        self.connect = connect
+        self._idle: "queue.LifoQueue" = queue.LifoQueue()
+        self._slots = threading.BoundedSemaphore(size)
+        self._lock = threading.Lock()
+        self.opened = 0
+        self.reused = 0
+        self.discarded = 0
+
+    def _is_alive(self, server: smtplib.SMTP) -> bool:
+        try:
+            return server.noop()[0] == 250
+        except smtplib.SMTPException:
+            return False
+        except OSError:
+            return False
+
+    def acquire(self) -> smtplib.SMTP:
+        self._slots.acquire()
+        try:
+            while True:
+                try:
+                    server, released_at = self._idle.get_nowait()
+                except queue.Empty:
+                    break
+                if time.monotonic() - released_at < self.idle_timeout or self._is_alive(server):
+                    with self._lock:
+                        self.reused += 1
+                    return server
+                self._close(server)
+            server = self.connect()
+            with self._lock:
+                self.opened += 1
+            return server
+        except Exception:
+            self._slots.release()
+            raise
+
+    def release(self, server: smtplib.SMTP, broken: bool = False):
+        if broken:
+            self._close(server)
+        else:
+            self._idle.put((server, time.monotonic()))
+        self._slots.release()
+
+    def _close(self, server: smtplib.SMTP):
+        with self._lock:
+            self.discarded += 1
+        try:
+            server.quit()
+        except Exception:
+            server.close()
+
+    def close(self):
+        while True:
+            try:
+                server, _ = self._idle.get_nowait()
+            except queue.Empty:
+                return
+            self._close(server)
+
+    def stats(self) -> Dict:
+        with self._lock:
+            return {
+                "size": self.size,
+                "idle": self._idle.qsize(),
+                "opened": self.opened,
+                "reused": self.reused,
+                "discarded": self.discarded,
+            }
+
+
+def is_permanent(exc: Exception) -> bool:
+    """5xx replies and refused recipients will not succeed on retry; everything else might."""
+    if isinstance(exc, smtplib.SMTPRecipientsRefused):
+        return all(code >= 500 for code, _ in exc.recipients.values())
+    if isinstance(exc, smtplib.SMTPResponseException):
+        return exc.smtp_code >= 500
+    return False
+
+
+class OutboxWorker:
+    """
+    Claims batches of due messages and sends them over an SMTPConnectionPool.
+
+    A batch is split across the pool's connections, each sending its share in turn
+    on one session. Failures are retried with exponential backoff and jitter up to
+    `max_attempts`; permanent failures, messages that cannot be rendered and the
+    last failed attempt dead-letter the message. Idle workers poll every
+    `poll_interval` seconds, and `wake()` lets an in-process enqueue skip the wait.
+    """
+
+    def __init__(
+        self,
+        pool: Optional[SMTPConnectionPool] = None,
+        batch_size: int = settings.EMAIL_OUTBOX_BATCH_SIZE,
+        max_attempts: int = settings.EMAIL_MAX_ATTEMPTS,
+        retry_base: float = settings.EMAIL_RETRY_BASE_SECONDS,
+        retry_max: float = settings.EMAIL_RETRY_MAX_SECONDS,
+        poll_interval: float = settings.EMAIL_OUTBOX_POLL_SECONDS,
+        lease_seconds: float = settings.EMAIL_SEND_LEASE_SECONDS,
+    ):
+        self.pool = pool or SMTPConnectionPool()
+        self.batch_size = batch_size
+        self.max_attempts = max_attempts
+        self.retry_base = retry_base
+        self.retry_max = retry_max
+        self.poll_interval = poll_interval
+        self.lease_seconds = lease_seconds
+        self._executor = ThreadPoolExecutor(max_workers=self.pool.size, thread_name_prefix="smtp")
+        self._wakeup = threading.Event()
+        self._stopping = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+        self.batches = 0
+        self.sent = 0
+        self.retried = 0
+        self.dead = 0
+        self.last_batch_time = 0.0
+
+    def retry_at(self, attempts: int) -> datetime:
+        delay = min(self.retry_base * 2 ** (attempts - 1), self.retry_max)
+        return datetime.utcnow() + timedelta(seconds=delay * random.uniform(0.8, 1.2))
+
+    def _fail(self, email: Dict, exc: Exception, permanent: bool = False):
+        error = f"{type(exc).__name__}: {str(exc)}"
+        if permanent or is_permanent(exc) or email["attempts"] >= self.max_attempts:
+            logger.error(f"Dead-lettering email {email['id']} to {email['recipient']} after {email['attempts']} attempts: {error}")
+            repository.mark_failed(email["id"], error, None)
+            with self._lock:
+                self.dead += 1
+        else:
+            logger.warning(f"Email {email['id']} attempt {email['attempts']} failed, retrying: {error}")
+            repository.mark_failed(email["id"], error, self.retry_at(email["attempts"]))
+            with self._lock:
+                self.retried += 1
+
+    def _send_share(self, emails: List[Dict]) -> List[int]:
+        """Send `emails` over one pooled session; returns the ids that were accepted."""
+        sent = []
+        try:
+            server = self.pool.acquire()
+        except Exception as exc:
+            for email in emails:
+                self._fail(email, exc)
+            return sent
+        broken = False
+        try:
+            for email in emails:
+                if broken:
+                    # The session died mid-share; the rest wait for the next attempt
+                    self._fail(email, smtplib.SMTPServerDisconnected("connection lost earlier in the batch"))
+                    continue
+                try:
+                    message = to_mime(
+                        RenderedEmail(email["recipient"], email["subject"], email["html_body"], email["text_body"]),
+                        settings.SMTP_EMAIL,
+                    )
+                except Exception as exc:
+                    # Nothing was sent on the session, and the message would fail the same way on a retry
+                    self._fail(email, exc, permanent=True)
+                    continue
+                try:
+                    server.sendmail(settings.SMTP_EMAIL, [email["recipient"]], message)
+                    sent.append(email["id"])
+                except (smtplib.SMTPRecipientsRefused, smtplib.SMTPDataError, smtplib.SMTPSenderRefused) as exc:
+                    self._fail(email, exc)
+                    # The session is still usable after a per-message rejection once reset
+                    try:
+                        server.rset()
+                    except Exception:
+                        broken = True
+                except Exception as exc:
+                    broken = True
+                    self._fail(email, exc)
+        finally:
+            self.pool.release(server, broken=broken)
+        return sent
+
+    def run_once(self) -> int:
+        """Claim and send one batch; returns the number of messages claimed."""
+        emails = repository.claim_emails(self.batch_size, self.lease_seconds)
+        if not emails:
+            return 0
+        start_time = time.time()
+        shares = [emails[i::self.pool.size] for i in range(min(self.pool.size, len(emails)))]
+        sent = []
+        for share, future in [(share, self._executor.submit(self._send_share, share)) for share in shares]:
+            try:
+                sent.extend(future.result())
+            except Exception as exc:
+                # The other shares' deliveries are still recorded; this share is retried when its lease expires
+                logger.error(f"Error sending {len(share)} emails: {str(exc)}", exc_info=True)
+        repository.mark_sent(sent)
+        elapsed_time = time.time() - start_time
+        with self._lock:
+            self.batches += 1
+            self.sent += len(sent)
+            self.last_batch_time = elapsed_time
+        logger.info(f"Email batch: {len(sent)}/{len(emails)} sent in {elapsed_time:.2f} seconds")
+        return len(emails)
+
+    def run_forever(self):
+        while not self._stopping.is_set():
+            try:
+                claimed = self.run_once()
+            except Exception as exc:
+                logger.error(f"Error in email outbox worker: {str(exc)}", exc_info=True)
+                claimed = 0
+            if claimed < self.batch_size:
+                self._wakeup.wait(self.poll_interval)
+                self._wakeup.clear()
+
+    def wake(self):
+        self._wakeup.set()
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self.run_forever, name="email-outbox", daemon=True)
+            self._thread.start()
+
+    def shutdown(self):
+        self._stopping.set()
+        self._wakeup.set()
+        if self._thread is not None:
+            self._thread.join(timeout=self.poll_interval + 5)
+            self._thread = None
+        self._executor.shutdown(wait=True)
+        self.pool.close()
+
+    def stats(self) -> Dict:
+        with self._lock:
+            return {
+                "running": self._thread is not None and self._thread.is_alive(),
+                "batches": self.batches,
+                "sent": self.sent,
+                "retried": self.retried,
+                "dead": self.dead,
+                "last_batch_time": self.last_batch_time,
+                "smtp": self.pool.stats(),
+            }
+
+
+email_worker = OutboxWorker()
+
+
+def enqueue_email(receiver_email: str, subject: str, message: str, text: Optional[str] = None) -> int:
+    """Queue one email for the worker and return its outbox id."""
+    email_id = repository.enqueue_emails(
+        [{"recipient": receiver_email, "subject": subject, "html_body": message, "text_body": text}]
+    )[0]
+    email_worker.wake()
+    return email_id
+
+
+def enqueue_rendered(emails: Iterable[RenderedEmail], chunk_size: int = 1000) -> int:
+    """Queue rendered emails in chunks of `chunk_size` rows per insert; returns how many were queued."""
+    iterator = iter(emails)
+    queued = 0
+    while True:
+        chunk = [email._asdict() for email in islice(iterator, chunk_size)]
+        if not chunk:
+            break
+        repository.enqueue_emails(chunk)
+        queued += len(chunk)
+        email_worker.wake()
+    return queued
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    try:
+        email_worker.run_forever()
+    except KeyboardInterrupt:
+        email_worker.shutdown()
@@ -0,0 +1,361 @@
+import asyncio
+import bisect
+import hashlib
+import json
+import logging
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, List, NamedTuple, Optional
+
+from config_project.config import settings
+from restaurants.events import on_restaurant_updated
+
+logger = logging.getLogger(__name__)
+
+
+class NamePage(NamedTuple):
+    body: bytes
+    total: int
+    etag: str
+
+
+class RestaurantNameSnapshot:
+    """
+    In-process copy of the restaurant id/name list behind /get_all_restaurants_name.
+
+    Names are kept sorted case-insensitively with each item already serialized, so
+    a prefix search is a bisect and a page is a byte join. The full list is
+    serialized once per refresh. The ETag is a hash of the list, so clients can
+    revalidate with If-None-Match. The snapshot is reloaded after `ttl` seconds,
+    or as soon as a change is reported for a restaurant it does not contain yet.
+    """
+
+    def __init__(self, ttl: float = settings.RESTAURANT_NAMES_TTL_SECONDS):
+        self.ttl = ttl
+        self._keys: List[str] = []
+        self._items: List[bytes] = []
+        self._ids = set()
+        self._full_body = b"[]"
+        self.etag = ""
+        self._loaded_at = 0.0
+        self._stale = True
+        self._lock = threading.Lock()
+        self._refresh_lock: Optional[asyncio.Lock] = None
+        self.hits = 0
+        self.refreshes = 0
+        self.not_modified = 0
+
+    def _is_fresh(self) -> bool:
+        return not self._stale and time.time() - self._loaded_at < self.ttl
+
+    def load(self, restaurants: List[Dict]):
+        rows = sorted(((r["name"] or "").casefold(), str(r["id"]), r["name"]) for r in restaurants)
+        items = [json.dumps({"id": restaurant_id, "name": name}).encode("utf-8") for _, restaurant_id, name in rows]
+        full_body = b"[" + b",".join(items) + b"]"
+        with self._lock:
+            self._keys = [key for key, _, _ in rows]
+            self._items = items
+            self._ids = {restaurant_id for _, restaurant_id, _ in rows}
+            self._full_body = full_body
+            self.etag = f'"{hashlib.sha1(full_body).hexdigest()}"'
+            self._loaded_at = time.time()
+            self._stale = False
+            self.refreshes += 1
+
+    async def ensure_fresh(self, fetch: Callable[[], Awaitable[List[Dict]]]):
+        if self._is_fresh():
+            self.hits += 1
+            return
+        if self._refresh_lock is None:
+            self._refresh_lock = asyncio.Lock()
+        async with self._refresh_lock:
+            # Another request may have refreshed while this one waited
+            if not self._is_fresh():
+                self.load(await fetch())
+
+    def page(self, prefix: Optional[str] = None, limit: Optional[int] = None, offset: int = 0) -> NamePage:
+        with self._lock:
+            if not prefix and limit is None and not offset:
+                return NamePage(self._full_body, len(self._items), self.etag)
+            start, end = 0, len(self._keys)
+            if prefix:
+                key = prefix.casefold()
+                start = bisect.bisect_left(self._keys, key)
+                end = bisect.bisect_left(self._keys, key + "\U0010ffff", lo=start)
+            total = end - start
+            start += offset
+            if limit is not None:
+                end = min(end, start + limit)
+            return NamePage(b"[" + b",".join(self._items[start:end]) + b"]", total, self.etag)
+
+    def matches(self, if_none_match: Optional[str]) -> bool:
+        if not if_none_match or not self.etag:
+            return False
+        tags = {tag.strip().removeprefix("W/") for tag in if_none_match.split(",")}
+        if "*" in tags or self.etag in tags:
+            self.not_modified += 1
+            return True
+        return False
+
+    def invalidate(self, restaurant_id=None):
+        """Mark stale when a restaurant the snapshot has not seen yet is reported; rating changes are ignored."""
+        with self._lock:
+            if restaurant_id is None or str(restaurant_id) not in self._ids:
+                self._stale = True
+
+    def stats(self) -> Dict:
+        with self._lock:
+            return {
+                "restaurants": len(self._items),
+                "age": time.time() - self._loaded_at if self._loaded_at else None,
+                "ttl": self.ttl,
+                "hits": self.hits,
+                "refreshes": self.refreshes,
+                "not_modified": self.not_modified,
+            }
+
+
+restaurant_names = RestaurantNameSnapshot()
+on_restaurant_updated(restaurant_names.invalidate)
+
+
+class RestaurantLabelIndex:
+    """
+    In-process inverted index of cuisine -> restaurant ids and tag -> restaurant ids.
+
+    Built from the cuisines/tag_list arrays, so labels are already lowercased and
+    trimmed. Lookups are set intersections with no database round trip. The index
+    is rebuilt after `ttl` seconds; restaurants reported as updated are re-read on
+    the next lookup instead of forcing a full rebuild.
+    """
+
+    def __init__(self, ttl: float = settings.RESTAURANT_LABELS_TTL_SECONDS):
+        self.ttl = ttl
+        self._cuisines: Dict[str, set] = {}
+        self._tags: Dict[str, set] = {}
+        self._labels: Dict[str, tuple] = {}
+        self._dirty = set()
+        self._loaded_at = 0.0
+        self._lock = threading.Lock()
+        self._refresh_lock: Optional[asyncio.Lock] = None
+        self.hits = 0
+        self.refreshes = 0
+        self.patches = 0
+
+    def _is_fresh(self) -> bool:
+        return bool(self._loaded_at) and time.time() - self._loaded_at < self.ttl
+
+    def _add(self, restaurant_id: str, cuisines, tags):
+        self._labels[restaurant_id] = (tuple(cuisines or ()), tuple(tags or ()))
+        for cuisine in cuisines or ():
+            self._cuisines.setdefault(cuisine, set()).add(restaurant_id)
+        for tag in tags or ():
+            self._tags.setdefault(tag, set()).add(restaurant_id)
+
+    def _remove(self, restaurant_id: str):
+        cuisines, tags = self._labels.pop(restaurant_id, ((), ()))
+        for index, labels in ((self._cuisines, cuisines), (self._tags, tags)):
+            for label in labels:
+                ids = index.get(label)
+                if ids is not None:
+                    ids.discard(restaurant_id)
+                    if not ids:
+                        del index[label]
+
+    def load(self, rows: List[tuple]):
+        """Replace the index with (id, cuisines, tag_list) rows."""
+        with self._lock:
+            self._cuisines, self._tags, self._labels = {}, {}, {}
+            for restaurant_id, cuisines, tags in rows:
+                self._add(str(restaurant_id), cuisines, tags)
+            self._dirty.clear()
+            self._loaded_at = time.time()
+            self.refreshes += 1
+
+    def patch(self, rows: List[tuple], restaurant_ids):
+        """Re-index `restaurant_ids` from their current rows; ids without a row are dropped."""
+        with self._lock:
+            for restaurant_id in restaurant_ids:
+                self._remove(str(restaurant_id))
+            for restaurant_id, cuisines, tags in rows:
+                self._add(str(restaurant_id), cuisines, tags)
+            self._dirty.difference_update(str(restaurant_id) for restaurant_id in restaurant_ids)
+            self.patches += 1
+
+    async def ensure_fresh(self, fetch: Callable[[Optional[List[str]]], Awaitable[List[tuple]]]):
+        """Rebuild or patch via `fetch(ids)`, which returns rows for `ids` or for every restaurant when None."""
+        if self._is_fresh() and not self._dirty:
+            self.hits += 1
+            return
+        if self._refresh_lock is None:
+            self._refresh_lock = asyncio.Lock()
+        async with self._refresh_lock:
+            if not self._is_fresh():
+                self.load(await fetch(None))
+            elif self._dirty:
+                with self._lock:
+                    dirty = list(self._dirty)
+                self.patch(await fetch(dirty), dirty)
+
+    def restaurant_ids(self, cuisine: Optional[str] = None, tags: Optional[List[str]] = None, match_all: bool = True) -> set:
+        """Ids serving `cuisine` and carrying all (or, with match_all=False, any) of `tags`."""
+        with self._lock:
+            candidates = None
+            if cuisine:
+                candidates = set(self._cuisines.get(cuisine.strip().lower(), ()))
+            if tags:
+                tag_sets = [self._tags.get(tag.strip().lower(), set()) for tag in tags]
+                matched = set.intersection(*tag_sets) if match_all else set().union(*tag_sets)
+                candidates = matched if candidates is None else candidates & matched
+            return candidates if candidates is not None else set(self._labels)
+
+    def counts(self) -> Dict[str, Dict[str, int]]:
+        """Restaurants per cuisine and per tag, most common first."""
+        with self._lock:
+            return {
+                "cuisines": {k: len(v) for k, v in sorted(self._cuisines.items(), key=lambda item: (-len(item[1]), item[0]))},
+                "tags": {k: len(v) for k, v in sorted(self._tags.items(), key=lambda item: (-len(item[1]), item[0]))},
+            }
+
+    def invalidate(self, restaurant_id=None):
+        """Queue a restaurant for re-indexing, or force a rebuild when no id is given."""
+        with self._lock:
+            if restaurant_id is None:
+                self._loaded_at = 0.0
+            else:
+                self._dirty.add(str(restaurant_id))
+
+    def stats(self) -> Dict:
+        with self._lock:
+            return {
+                "restaurants": len(self._labels),
+                "cuisines": len(self._cuisines),
+                "tags": len(self._tags),
+                "dirty": len(self._dirty),
+                "age": time.time() - self._loaded_at if self._loaded_at else None,
+                "ttl": self.ttl,
+                "hits": self.hits,
+                "refreshes": self.refreshes,
+                "patches": self.patches,
+            }
+
+
+restaurant_labels = RestaurantLabelIndex()
+on_restaurant_updated(restaurant_labels.invalidate)
+
+
+class RestaurantProfile(NamedTuple):
+    """Everything derived from one restaurant row that requests and assistants reuse."""
+    version: int
+    response: Any
+    context: str
+    scope: Dict
+    facts: Dict
+
+
+class _ProfileEntry:
+    __slots__ = ("profile", "expires_at")
+
+    def __init__(self, profile: RestaurantProfile, expires_at: float):
+        self.profile = profile
+        self.expires_at = expires_at
+
+
+class RestaurantProfileCache:
+    """
+    Bounded LRU of restaurant profiles: the API response, the assistant's context
+    string and the retrieval scope, all built from one row read.
+
+    Entries live for `ttl` seconds. An expired entry is revalidated by comparing
+    its row_version with the database, which reads one integer instead of the row.
+    Update events drop the entry. Each key carries a generation that invalidation
+    bumps, so a load that raced with an update does not store the stale row.
+    """
+
+    def __init__(self, max_size: int = settings.RESTAURANT_PROFILE_CACHE_SIZE, ttl: float = settings.RESTAURANT_PROFILE_TTL_SECONDS):
+        self.max_size = max_size
+        self.ttl = ttl
+        self._entries: "OrderedDict[str, _ProfileEntry]" = OrderedDict()
+        self._generations: Dict[str, int] = {}
+        self._epoch = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.revalidations = 0
+        self.loads = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    def get(self, restaurant_id) -> Optional[RestaurantProfile]:
+        """A live profile, or None on a miss or after expiry."""
+        key = str(restaurant_id)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry.expires_at <= time.time():
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry.profile
+
+    def peek(self, restaurant_id) -> Optional[RestaurantProfile]:
+        """The stored profile even if expired, for revalidation."""
+        with self._lock:
+            entry = self._entries.get(str(restaurant_id))
+            return entry.profile if entry is not None else None
+
+    def generation(self, restaurant_id) -> tuple:
+        with self._lock:
+            return self._epoch, self._generations.get(str(restaurant_id), 0)
+
+    def put(self, restaurant_id, profile: RestaurantProfile, generation: tuple, revalidated: bool = False) -> RestaurantProfile:
+        """Store `profile` unless the restaurant was invalidated since `generation` was taken."""
+        key = str(restaurant_id)
+        with self._lock:
+            if generation != (self._epoch, self._generations.get(key, 0)):
+                return profile
+            if revalidated:
+                self.revalidations += 1
+            else:
+                self.loads += 1
+            self._entries[key] = _ProfileEntry(profile, time.time() + self.ttl)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                evicted, _ = self._entries.popitem(last=False)
+                self._generations.pop(evicted, None)
+                self.evictions += 1
+        return profile
+
+    def invalidate(self, restaurant_id=None):
+        """Drop a restaurant's profile, or every profile when no id is given."""
+        with self._lock:
+            self.invalidations += 1
+            if restaurant_id is None:
+                self._entries.clear()
+                self._generations.clear()
+                self._epoch += 1
+                return
+            key = str(restaurant_id)
+            self._entries.pop(key, None)
+            self._generations[key] = self._generations.get(key, 0) + 1
+
+    def stats(self) -> Dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "size": len(self._entries),
+                "max_size": self.max_size,
+                "ttl": self.ttl,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "revalidations": self.revalidations,
+                "loads": self.loads,
+                "evictions": self.evictions,
+                "invalidations": self.invalidations,
+            }
+
+
+restaurant_profiles = RestaurantProfileCache()
+on_restaurant_updated(restaurant_profiles.invalidate)
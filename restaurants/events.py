@@ -0,0 +1,110 @@
+import asyncio
+import logging
+import uuid
+from typing import Callable, Iterable, List, Optional
+
+from sqlalchemy.engine import make_url
+
+logger = logging.getLogger(__name__)
+
+_restaurant_updated_listeners: List[Callable] = []
+
+# Tags this process's NOTIFY payloads so it can skip its own changes, which it has already applied
+WORKER_ID = uuid.uuid4().hex[:12]
+
+
+def on_restaurant_updated(listener: Callable):
+    """Register a callback that receives the id of every restaurant whose data changed."""
+    _restaurant_updated_listeners.append(listener)
+    return listener
+
+
+def notify_restaurant_updated(restaurant_ids: Iterable):
+    for restaurant_id in restaurant_ids:
+        for listener in _restaurant_updated_listeners:
+            try:
+                listener(restaurant_id)
+            except Exception as exc:
+                logger.error(f"Error in restaurant update listener: {str(exc)}", exc_info=True)
+
+
+def change_payloads(restaurant_ids: Iterable) -> List[str]:
+    return [f"{WORKER_ID}:{restaurant_id}" for restaurant_id in restaurant_ids]
+
+
+class RestaurantChangeListener:
+    """
+    Relays restaurant changes made by other workers to this process's listeners.
+
+    Holds one dedicated asyncpg connection that LISTENs on `channel`. Each payload
+    is "<worker id>:<restaurant id>"; payloads from this process are skipped. When
+    the connection drops, every listener is told to drop everything (a None id),
+    since notifications sent while disconnected are lost, and the listener reconnects.
+    """
+
+    def __init__(self, connection_uri: str, channel: str, reconnect_delay: float = 5.0):
+        self.connection_uri = make_url(connection_uri).set(drivername="postgresql").render_as_string(hide_password=False)
+        self.channel = channel
+        self.reconnect_delay = reconnect_delay
+        self._connection = None
+        self._task: Optional[asyncio.Task] = None
+        self._disconnected: Optional[asyncio.Event] = None
+        self.received = 0
+        self.own = 0
+        self.reconnects = 0
+
+    def _on_notification(self, connection, pid, channel, payload: str):
+        origin, _, restaurant_id = payload.partition(":")
+        if origin == WORKER_ID:
+            self.own += 1
+            return
+        self.received += 1
+        notify_restaurant_updated([restaurant_id])
+
+    def _on_termination(self, connection):
+        self._disconnected.set()
+
+    async def _run(self):
+        import asyncpg
+
+        while True:
+            self._disconnected = asyncio.Event()
+            try:
+                self._connection = await asyncpg.connect(self.connection_uri)
+                self._connection.add_termination_listener(self._on_termination)
+                await self._connection.add_listener(self.channel, self._on_notification)
+                logger.info(f"Listening for restaurant changes on {self.channel}")
+                await self._disconnected.wait()
+            except asyncio.CancelledError:
+                raise
+            except Exception as exc:
+                logger.error(f"Restaurant change listener failed: {str(exc)}", exc_info=True)
+            self._connection = None
+            self.reconnects += 1
+            notify_restaurant_updated([None])
+            await asyncio.sleep(self.reconnect_delay)
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        if self._connection is not None:
+            await self._connection.close()
+            self._connection = None
+
+    def stats(self):
+        return {
+            "channel": self.channel,
+            "connected": self._connection is not None and not self._connection.is_closed(),
+            "received": self.received,
+            "own": self.own,
+            "reconnects": self.reconnects,
+        }
@@ -0,0 +1,167 @@
+"""
+Bulk restaurant importer.
+
+Streams a CSV, JSONL or Parquet file row by row, validates each row against the
+Restaurant columns and upserts it in chunks, so memory stays flat regardless of
+file size. Existing restaurants (matched by restaurant_name) are updated; new ones
+are inserted unless --update-only is given.
+
+Usage:
+    python -m restaurants.importer --input restaurants.csv
+    python -m restaurants.importer --input ratings.parquet --batch-size 5000 --update-only
+"""
+import argparse
+import csv
+import json
+import logging
+from pathlib import Path
+from typing import Dict, Iterator, Optional
+
+from config_project.config import settings
+from restaurants.model import Restaurant
+from restaurants.repository import RATING_FIELDS, bulk_upsert_restaurants
+
+logger = logging.getLogger(__name__)
+
+# Columns a file may set; id, created_at, row_version and generated columns are owned by the database
+IMPORT_COLUMNS = {
+    column.name: column.type.python_type
+    for column in Restaurant.__table__.columns
+    if column.name not in ("id", "created_at", "row_version") and column.computed is None
+}
+# Record key -> column, accepting the rating feed's total_review_count spelling too
+IMPORT_FIELDS = {**{name: name for name in IMPORT_COLUMNS}, **RATING_FIELDS}
+TRUE_VALUES = {"1", "true", "t", "yes", "y"}
+
+
+def read_csv(path: Path) -> Iterator[Dict]:
+    with open(path, newline="", encoding="utf-8") as f:
+        yield from csv.DictReader(f)
+
+
+def read_jsonl(path: Path) -> Iterator[Dict]:
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            if line.strip():
+                yield json.loads(line)
+
+
+def read_parquet(path: Path, batch_size: int) -> Iterator[Dict]:
+    try:
+        import pyarrow.parquet as pq
+    except ImportError:
+        raise ImportError("Parquet import requires pyarrow: pip install pyarrow")
+    parquet_file = pq.ParquetFile(path)
+    columns = [name for name in parquet_file.schema_arrow.names if name in IMPORT_FIELDS]
+    for batch in parquet_file.iter_batches(batch_size=batch_size, columns=columns):
+        yield from batch.to_pylist()
+
+
+READERS = {".csv": "csv", ".jsonl": "jsonl", ".ndjson": "jsonl", ".parquet": "parquet"}
+
+
+def read_rows(path: Path, file_format: Optional[str] = None, batch_size: int = settings.RESTAURANT_UPSERT_CHUNK_SIZE) -> Iterator[Dict]:
+    file_format = file_format or READERS.get(path.suffix.lower())
+    if file_format == "csv":
+        return read_csv(path)
+    if file_format == "jsonl":
+        return read_jsonl(path)
+    if file_format == "parquet":
+        return read_parquet(path, batch_size)
+    raise ValueError(f"Cannot tell the format of {path}; pass --format csv, jsonl or parquet.")
+
+
+def convert(value, python_type):
+    if isinstance(value, str):
+        value = value.strip()
+        if value == "":
+            return None
+    if value is None or isinstance(value, python_type):
+        return value
+    if python_type is bool:
+        return str(value).lower() in TRUE_VALUES
+    if python_type is int:
+        return int(float(value))
+    return python_type(value)
+
+
+class RowValidator:
+    """Keeps known columns with values of the column's type and counts rows it rejects."""
+
+    def __init__(self):
+        self.rows = 0
+        self.invalid = 0
+
+    def validate(self, row: Dict) -> Optional[Dict]:
+        self.rows += 1
+        record = {}
+        try:
+            for key, value in row.items():
+                column = IMPORT_FIELDS.get(key)
+                if column is None:
+                    continue
+                value = convert(value, IMPORT_COLUMNS[column])
+                if value is not None:
+                    record[key] = value
+        except (TypeError, ValueError) as exc:
+            self.invalid += 1
+            logger.warning(f"Skipping row {self.rows}: {str(exc)}")
+            return None
+        if not record.get("restaurant_name"):
+            self.invalid += 1
+            logger.warning(f"Skipping row {self.rows}: missing restaurant_name")
+            return None
+        return record
+
+    def records(self, rows: Iterator[Dict]) -> Iterator[Dict]:
+        for row in rows:
+            record = self.validate(row)
+            if record is not None:
+                yield record
+
+
+def import_restaurants(
+    path: str,
+    file_format: Optional[str] = None,
+    batch_size: int = settings.RESTAURANT_UPSERT_CHUNK_SIZE,
+    insert_missing: bool = True,
+) -> Dict:
+    validator = RowValidator()
+
+    def report(stats: Dict):
+        if stats["chunks"] % 10:
+            return
+        rate = validator.rows / stats["elapsed_time"] if stats["elapsed_time"] else 0.0
+        print(
+            f"{validator.rows} rows read, {stats['inserted']} inserted, {stats['updated']} updated, "
+            f"{stats['skipped']} skipped, {validator.invalid} invalid ({rate:.0f} rows/s)"
+        )
+
+    stats = bulk_upsert_restaurants(
+        validator.records(read_rows(Path(path), file_format, batch_size)),
+        chunk_size=batch_size,
+        insert_missing=insert_missing,
+        fields=IMPORT_FIELDS,
+        progress=report,
+    )
+    stats["rows"] = validator.rows
+    stats["invalid"] = validator.invalid
+    stats["rows_per_second"] = validator.rows / stats["elapsed_time"] if stats["elapsed_time"] else 0.0
+    print(
+        f"Imported {path}: {stats['rows']} rows, {stats['inserted']} inserted, {stats['updated']} updated, "
+        f"{stats['skipped']} skipped, {stats['invalid']} invalid in {stats['elapsed_time']:.2f} seconds "
+        f"({stats['rows_per_second']:.0f} rows/s)"
+    )
+    return stats
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    parser = argparse.ArgumentParser(description="Stream a CSV/JSONL/Parquet file of restaurants into the database.")
+    parser.add_argument("--input", required=True, help="File to import.")
+    parser.add_argument("--format", choices=["csv", "jsonl", "parquet"], help="File format; defaults to the file extension.")
+    parser.add_argument("--batch-size", type=int, default=settings.RESTAURANT_UPSERT_CHUNK_SIZE, help="Rows per upsert transaction.")
+    parser.add_argument("--update-only", action="store_true", help="Only update restaurants that already exist.")
+    args = parser.parse_args()
+
+    import_restaurants(args.input, args.format, args.batch_size, insert_missing=not args.update_only)
@@ -1,7 +1,7 @@
 import uuid
-from sqlalchemy import Column, Integer, String, Boolean, DateTime, Float
+from sqlalchemy import Column, Computed, Integer, String, Boolean, DateTime, Float
 from database import Base
-from sqlalchemy.dialects.postgresql import UUID
+from sqlalchemy.dialects.postgresql import ARRAY, UUID
 from datetime import datetime
 
 
@@ -17,6 +17,13 @@ class Restaurant(Base):
     hours_of_operation = Column(String, nullable=True)
     cuisine = Column(String, nullable=True)
     tags = Column(String, nullable=True)
+    # Lower-cased, trimmed elements of the comma-separated cuisine/tags, kept in sync by Postgres
+    cuisines = Column(ARRAY(String), Computed(
+        r"array_remove(regexp_split_to_array(lower(btrim(cuisine)), '\s*,\s*'), '')", persisted=True
+    ))
+    tag_list = Column(ARRAY(String), Computed(
+        r"array_remove(regexp_split_to_array(lower(btrim(tags)), '\s*,\s*'), '')", persisted=True
+    ))
     overall_rating = Column(Float, default=0, nullable=True)
     food_rating = Column(Float, default=0, nullable=True)
     service_rating = Column(Float, default=0, nullable=True)
@@ -27,5 +34,23 @@ class Restaurant(Base):
     one_stars = Column(Integer, default=0, nullable=True)
     total_review_counts = Column(Integer, default=0, nullable=True)
     ambience_rating = Column(Float, default=0, nullable=True)
+    # Number of reviews behind each sub-rating average, for incremental updates
+    food_rating_count = Column(Integer, default=0, nullable=True)
+    service_rating_count = Column(Integer, default=0, nullable=True)
+    ambience_rating_count = Column(Integer, default=0, nullable=True)
     created_at = Column(DateTime, default=datetime.utcnow)
-    is_active = Column(Boolean, default=True, nullable=True)
\ No newline at end of file
+    is_active = Column(Boolean, default=True, nullable=True)
+    # Bumped by every write, so cached profiles can be revalidated without reloading the row
+    row_version = Column(Integer, default=1, server_default="1", nullable=False)
+
+class ReviewEvent(Base):
+    __tablename__ = "review_events"
+
+    # Supplied by the producer so a redelivered event is applied once
+    idempotency_key = Column(String, primary_key=True)
+    restaurant_id = Column(UUID(as_uuid=True), nullable=False, index=True)
+    stars = Column(Integer, nullable=False)
+    food_rating = Column(Float, nullable=True)
+    service_rating = Column(Float, nullable=True)
+    ambience_rating = Column(Float, nullable=True)
+    created_at = Column(DateTime, default=datetime.utcnow, nullable=False)
@@ -1,20 +1,46 @@
+from sqlalchemy import and_, func, literal_column, or_, select, text, update
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.ext.asyncio import AsyncSession
 from database import SessionLocal
-from restaurants.model import Restaurant
-from uuid import UUID
+from config_project.config import settings
+from restaurants.model import Restaurant, ReviewEvent
+from restaurants.events import change_payloads, notify_restaurant_updated
+from itertools import islice
+from typing import Callable, Dict, Iterable, List, Optional
+from uuid import UUID, uuid4
 import logging
+import time
 
 logger = logging.getLogger(__name__)
 
-
-def get_restaurant_names():
-    """Get all restaurant names from the database."""
-    try:
-        with SessionLocal() as db:
-            result = db.query(Restaurant.id, Restaurant.restaurant_name).all()
-            return [{"id": r.id, "name": r.restaurant_name} for r in result]
-    except Exception as exc:
-        logger.error(f"Error in get_restaurant_names: {str(exc)}", exc_info=True)
-        raise Exception("Failed to fetch restaurant names from the database.")
+# Rating record key -> Restaurant column
+RATING_FIELDS = {
+    "overall_rating": "overall_rating",
+    "total_rating": "total_rating",
+    "food_rating": "food_rating",
+    "service_rating": "service_rating",
+    "ambience_rating": "ambience_rating",
+    "total_review_count": "total_review_counts",
+    "five_stars": "five_stars",
+    "four_stars": "four_stars",
+    "three_stars": "three_stars",
+    "two_stars": "two_stars",
+    "one_stars": "one_stars",
+}
+# Search ordering -> (sort expression, descending)
+SEARCH_ORDERS = {
+    # Literal 0 so the expression matches the index definitions textually
+    "rating": (func.coalesce(Restaurant.overall_rating, literal_column("0")), True),
+    "reviews": (func.coalesce(Restaurant.total_review_counts, literal_column("0")), True),
+    "name": (Restaurant.restaurant_name, False),
+}
+STAR_COLUMNS = {5: "five_stars", 4: "four_stars", 3: "three_stars", 2: "two_stars", 1: "one_stars"}
+# Sub-rating -> column holding the number of reviews averaged into it
+SUB_RATING_COUNTS = {
+    "food_rating": "food_rating_count",
+    "service_rating": "service_rating_count",
+    "ambience_rating": "ambience_rating_count",
+}
 
 
 def get_restaurant_data(restaurant_id: UUID):
@@ -29,6 +55,123 @@ def get_restaurant_data(restaurant_id: UUID):
         raise Exception("Failed to fetch restaurant data from the database.")
 
 
+async def aget_restaurant_names(db: AsyncSession):
+    """Get all restaurant names using the request's async session."""
+    try:
+        result = await db.execute(select(Restaurant.id, Restaurant.restaurant_name))
+        return [{"id": r.id, "name": r.restaurant_name} for r in result]
+    except Exception as exc:
+        logger.error(f"Error in aget_restaurant_names: {str(exc)}", exc_info=True)
+        raise Exception("Failed to fetch restaurant names from the database.")
+
+
+async def aget_restaurant_data(db: AsyncSession, restaurant_id: UUID):
+    """Get restaurant data by ID using the request's async session."""
+    try:
+        result = await db.execute(select(Restaurant).where(Restaurant.id == restaurant_id))
+        return result.scalars().first()
+    except Exception as exc:
+        logger.error(f"Error in aget_restaurant_data: {str(exc)}", exc_info=True)
+        raise Exception("Failed to fetch restaurant data from the database.")
+
+
+def normalize_label(label: str) -> str:
+    """A cuisine or tag as stored in the cuisines/tag_list arrays."""
+    return label.strip().lower()
+
+
+def _contains(text: str) -> str:
+    """ILIKE pattern matching `text` anywhere, with LIKE wildcards in it escaped."""
+    return "%" + text.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_") + "%"
+
+
+def _search_statement(
+    query: Optional[str] = None,
+    neighbourhood: Optional[str] = None,
+    cuisine: Optional[str] = None,
+    tag: Optional[str] = None,
+    price: Optional[str] = None,
+    min_rating: Optional[float] = None,
+    restaurant_ids: Optional[List[UUID]] = None,
+    order_by: str = "rating",
+    limit: int = 20,
+    after: Optional[tuple] = None,
+):
+    """
+    Filtered, keyset-paginated restaurant query.
+
+    Every filter and ordering matches an index: lower(neighbourhood) btree, trigram
+    and full-text GIN on restaurant_name, GIN on the cuisines/tag_list arrays, the
+    primary key and (sort key, id) btrees.
+    `restaurant_ids` limits the search to those restaurants, e.g. the label index's
+    matches for a cuisine or tag. `after` is the (sort value, id) of the last row
+    of the previous page.
+    """
+    sort_key, descending = SEARCH_ORDERS[order_by]
+    statement = select(Restaurant, sort_key.label("sort_value")).where(Restaurant.is_active.isnot(False))
+    if query:
+        statement = statement.where(or_(
+            Restaurant.restaurant_name.ilike(_contains(query), escape="\\"),
+            func.to_tsvector("simple", func.coalesce(Restaurant.restaurant_name, "")).bool_op("@@")(
+                func.plainto_tsquery("simple", query)
+            ),
+        ))
+    if neighbourhood:
+        statement = statement.where(func.lower(Restaurant.neighbourhood) == neighbourhood.lower())
+    if cuisine:
+        statement = statement.where(Restaurant.cuisines.contains([normalize_label(cuisine)]))
+    if tag:
+        statement = statement.where(Restaurant.tag_list.contains([normalize_label(tag)]))
+    if price:
+        statement = statement.where(Restaurant.average_price == price)
+    if min_rating is not None:
+        statement = statement.where(Restaurant.overall_rating >= min_rating)
+    if restaurant_ids is not None:
+        statement = statement.where(Restaurant.id.in_(restaurant_ids))
+    if after is not None:
+        value, last_id = after
+        if descending:
+            statement = statement.where(or_(sort_key < value, and_(sort_key == value, Restaurant.id > last_id)))
+        else:
+            statement = statement.where(or_(sort_key > value, and_(sort_key == value, Restaurant.id > last_id)))
+    return statement.order_by(sort_key.desc() if descending else sort_key.asc(), Restaurant.id).limit(limit)
+
+
+def search_restaurants(**filters) -> List[tuple]:
+    """Search restaurants; returns (restaurant, sort value) pairs. See _search_statement for filters."""
+    try:
+        with SessionLocal() as db:
+            return [tuple(row) for row in db.execute(_search_statement(**filters)).all()]
+    except Exception as exc:
+        logger.error(f"Error in search_restaurants: {str(exc)}", exc_info=True)
+        raise Exception("Failed to search restaurants in the database.")
+
+
+async def asearch_restaurants(db: AsyncSession, **filters) -> List[tuple]:
+    """Search restaurants using the request's async session."""
+    try:
+        result = await db.execute(_search_statement(**filters))
+        return [tuple(row) for row in result.all()]
+    except Exception as exc:
+        logger.error(f"Error in asearch_restaurants: {str(exc)}", exc_info=True)
+        raise Exception("Failed to search restaurants in the database.")
+
+
+async def aget_restaurant_labels(db: AsyncSession, restaurant_ids: Optional[List] = None) -> List[tuple]:
+    """(id, cuisines, tag_list) for the given restaurants, or for all active ones."""
+    try:
+        statement = select(Restaurant.id, Restaurant.cuisines, Restaurant.tag_list)
+        if restaurant_ids is None:
+            statement = statement.where(Restaurant.is_active.isnot(False))
+        else:
+            statement = statement.where(Restaurant.id.in_(restaurant_ids))
+        result = await db.execute(statement)
+        return [tuple(row) for row in result.all()]
+    except Exception as exc:
+        logger.error(f"Error in aget_restaurant_labels: {str(exc)}", exc_info=True)
+        raise Exception("Failed to fetch restaurant cuisines and tags from the database.")
+
+
 def get_existing_restaurant(restaurant_name: str, location: str):
     """Check if a restaurant already exists in the database."""
     try:
@@ -43,27 +186,218 @@ def get_existing_restaurant(restaurant_name: str, location: str):
         raise Exception("Failed to check for existing restaurant in the database.")
 
 
+def get_restaurant_version(restaurant_id: UUID) -> Optional[int]:
+    """The restaurant's row_version, or None if it does not exist."""
+    try:
+        with SessionLocal() as db:
+            return db.scalar(select(Restaurant.row_version).where(Restaurant.id == restaurant_id))
+    except Exception as exc:
+        logger.error(f"Error in get_restaurant_version: {str(exc)}", exc_info=True)
+        raise Exception("Failed to fetch restaurant version from the database.")
+
+
+async def aget_restaurant_version(db: AsyncSession, restaurant_id: UUID) -> Optional[int]:
+    """The restaurant's row_version using the request's async session."""
+    try:
+        return await db.scalar(select(Restaurant.row_version).where(Restaurant.id == restaurant_id))
+    except Exception as exc:
+        logger.error(f"Error in aget_restaurant_version: {str(exc)}", exc_info=True)
+        raise Exception("Failed to fetch restaurant version from the database.")
+
+
+def publish_restaurant_changes(db, restaurant_ids: List):
+    """
+    Queue a NOTIFY per changed restaurant on the open transaction.
+
+    Postgres delivers them only if the transaction commits, so other workers never
+    hear about a change they cannot read yet. Does nothing without a change channel.
+    """
+    if not settings.RESTAURANT_CHANGE_CHANNEL or not restaurant_ids:
+        return
+    db.execute(
+        text("SELECT pg_notify(:channel, payload) FROM unnest(CAST(:payloads AS text[])) AS payload"),
+        {"channel": settings.RESTAURANT_CHANGE_CHANNEL, "payloads": change_payloads(restaurant_ids)},
+    )
+
+
 def update_restaurant(restaurant_data):
     """Update restaurant data in the database."""
     try:
-        with SessionLocal() as db:
-            for each in restaurant_data:
-                restaurant_name = each.get("restaurant_name")
-                restaurant = db.query(Restaurant).filter(Restaurant.restaurant_name == restaurant_name).first()
-                if restaurant:
-                    restaurant.overall_rating = each.get("overall_rating", restaurant.overall_rating)
-                    restaurant.total_rating = each.get("total_rating", restaurant.total_rating)
-                    restaurant.food_rating = each.get("food_rating", restaurant.food_rating)
-                    restaurant.service_rating = each.get("service_rating", restaurant.service_rating)
-                    restaurant.ambience_rating = each.get("ambience_rating", restaurant.ambience_rating)
-                    restaurant.total_review_counts = each.get("total_review_count", restaurant.total_review_counts)
-                    restaurant.five_stars = each.get("five_stars", restaurant.five_stars)
-                    restaurant.four_stars = each.get("four_stars", restaurant.four_stars)
-                    restaurant.three_stars = each.get("three_stars", restaurant.three_stars)
-                    restaurant.two_stars = each.get("two_stars", restaurant.two_stars)
-                    restaurant.one_stars = each.get("one_stars", restaurant.one_stars)
-                    db.commit()
-            return {"message": "Restaurant updated successfully"}
+        bulk_upsert_restaurants(restaurant_data)
+        return {"message": "Restaurant updated successfully"}
     except Exception as exc:
         logger.error(f"Error in update_restaurant: {str(exc)}", exc_info=True)
         raise Exception("Failed to update restaurant data.")
+
+
+def _rating_rows(chunk: List[Dict], fields: Dict[str, str]) -> Dict[str, Dict]:
+    """Restaurant name -> column values for one chunk; later records for a name win, None values are left out."""
+    rows = {}
+    for each in chunk:
+        restaurant_name = each.get("restaurant_name")
+        if not restaurant_name:
+            continue
+        row = rows.setdefault(restaurant_name, {"restaurant_name": restaurant_name})
+        row.update({column: each[key] for key, column in fields.items() if each.get(key) is not None})
+    return rows
+
+
+# Scalar model defaults, written out for columns a record leaves out so inserted rows get them
+INSERT_DEFAULTS = {
+    column.name: column.default.arg
+    for column in Restaurant.__table__.columns
+    if column.default is not None and column.default.is_scalar
+}
+
+
+def _upsert_chunk(db, rows: Dict[str, Dict], fields: Dict[str, str], insert_missing: bool):
+    if not insert_missing:
+        existing = set(db.scalars(select(Restaurant.restaurant_name).where(Restaurant.restaurant_name.in_(rows))))
+        rows = {name: row for name, row in rows.items() if name in existing}
+    # One statement per set of columns present: a column a record leaves out gets its
+    # default in the VALUES but is not in the update, so an existing row keeps its value
+    groups: Dict[tuple, List[Dict]] = {}
+    for row in rows.values():
+        groups.setdefault(tuple(sorted(column for column in row if column != "restaurant_name")), []).append(row)
+    results = []
+    for columns, group in groups.items():
+        statement = insert(Restaurant).values([{"id": uuid4(), **INSERT_DEFAULTS, **row} for row in group])
+        statement = statement.on_conflict_do_update(
+            index_elements=[Restaurant.restaurant_name],
+            set_={
+                **{column: statement.excluded[column] for column in columns},
+                "row_version": Restaurant.row_version + 1,
+            },
+        ).returning(Restaurant.id, literal_column("xmax = 0").label("inserted"))
+        results.extend(db.execute(statement).all())
+    return results
+
+
+def bulk_upsert_restaurants(
+    records: Iterable[Dict],
+    chunk_size: int = settings.RESTAURANT_UPSERT_CHUNK_SIZE,
+    insert_missing: bool = False,
+    fields: Dict[str, str] = RATING_FIELDS,
+    progress: Optional[Callable[[Dict], None]] = None,
+) -> Dict:
+    """
+    Apply rating records with INSERT ... ON CONFLICT (restaurant_name) DO UPDATE, one per
+    chunk and set of columns present.
+
+    `records` may be any iterable, so large feeds can be streamed. Each chunk is one
+    transaction. Keys missing from a record (or set to None) keep the stored value
+    on update and get the column default on insert, and records for the same
+    restaurant within a chunk are merged. Records without a restaurant_name,
+    merged into another record, or for unknown restaurants when `insert_missing` is
+    False are counted as skipped. `fields` maps record keys to the columns to write,
+    and `progress` is called with the running counts after every chunk.
+    """
+    try:
+        start_time = time.time()
+        stats = {"received": 0, "inserted": 0, "updated": 0, "skipped": 0, "chunks": 0}
+        iterator = iter(records)
+        with SessionLocal() as db:
+            while True:
+                chunk = list(islice(iterator, chunk_size))
+                if not chunk:
+                    break
+                rows = _rating_rows(chunk, fields)
+                results = _upsert_chunk(db, rows, fields, insert_missing)
+                publish_restaurant_changes(db, [r.id for r in results])
+                db.commit()
+                inserted = sum(1 for r in results if r.inserted)
+                stats["received"] += len(chunk)
+                stats["inserted"] += inserted
+                stats["updated"] += len(results) - inserted
+                stats["skipped"] += len(chunk) - len(results)
+                stats["chunks"] += 1
+                notify_restaurant_updated([r.id for r in results])
+                elapsed_time = time.time() - start_time
+                stats["elapsed_time"] = elapsed_time
+                stats["rows_per_second"] = stats["received"] / elapsed_time if elapsed_time else 0.0
+                if progress is not None:
+                    progress(stats)
+        elapsed_time = time.time() - start_time
+        stats["elapsed_time"] = elapsed_time
+        stats["rows_per_second"] = stats["received"] / elapsed_time if elapsed_time else 0.0
+        logger.info(f"Bulk restaurant upsert: {stats}")
+        return stats
+    except Exception as exc:
+        logger.error(f"Error in bulk_upsert_restaurants: {str(exc)}", exc_info=True)
+        raise Exception("Failed to bulk upsert restaurant data.")
+
+
+def _running_average(average, count, value):
+    """SQL for the average after one more value; `count` is the number of values already in it."""
+    count = func.coalesce(count, 0)
+    return (func.coalesce(average, 0) * count + value) / (count + 1)
+
+
+def _aggregate_updates(event: Dict) -> Dict:
+    stars = int(event["stars"])
+    star_column = getattr(Restaurant, STAR_COLUMNS[stars])
+    values = {
+        "overall_rating": _running_average(Restaurant.overall_rating, Restaurant.total_review_counts, stars),
+        "total_review_counts": func.coalesce(Restaurant.total_review_counts, 0) + 1,
+        STAR_COLUMNS[stars]: func.coalesce(star_column, 0) + 1,
+        "row_version": Restaurant.row_version + 1,
+    }
+    for rating, count_column in SUB_RATING_COUNTS.items():
+        if event.get(rating) is not None:
+            count = getattr(Restaurant, count_column)
+            values[rating] = _running_average(getattr(Restaurant, rating), count, float(event[rating]))
+            values[count_column] = func.coalesce(count, 0) + 1
+    return values
+
+
+def record_review_events(events: Iterable[Dict]) -> Dict:
+    """
+    Fold review events into the restaurants' rating aggregates.
+
+    Each event costs one insert into review_events and one in-place UPDATE of its
+    restaurant's counts and running averages, so nothing is recomputed over past
+    reviews. An event whose idempotency_key was already recorded is ignored, and
+    one for an unknown restaurant is rolled back, so replaying a feed is safe. The
+    batch is committed as one transaction.
+    """
+    try:
+        stats = {"applied": 0, "duplicates": 0, "unknown_restaurant": 0}
+        updated_ids = set()
+        with SessionLocal() as db:
+            for event in events:
+                with db.begin_nested() as savepoint:
+                    recorded = db.execute(
+                        insert(ReviewEvent)
+                        .values(
+                            idempotency_key=event["idempotency_key"],
+                            restaurant_id=event["restaurant_id"],
+                            stars=event["stars"],
+                            food_rating=event.get("food_rating"),
+                            service_rating=event.get("service_rating"),
+                            ambience_rating=event.get("ambience_rating"),
+                        )
+                        .on_conflict_do_nothing(index_elements=[ReviewEvent.idempotency_key])
+                        .returning(ReviewEvent.idempotency_key)
+                    ).scalar()
+                    if recorded is None:
+                        stats["duplicates"] += 1
+                        continue
+                    result = db.execute(
+                        update(Restaurant)
+                        .where(Restaurant.id == event["restaurant_id"])
+                        .values(**_aggregate_updates(event))
+                    )
+                    if result.rowcount == 0:
+                        logger.warning(f"Review event {event['idempotency_key']} for unknown restaurant {event['restaurant_id']}")
+                        savepoint.rollback()
+                        stats["unknown_restaurant"] += 1
+                        continue
+                stats["applied"] += 1
+                updated_ids.add(event["restaurant_id"])
+            publish_restaurant_changes(db, list(updated_ids))
+            db.commit()
+        notify_restaurant_updated(list(updated_ids))
+        return stats
+    except Exception as exc:
+        logger.error(f"Error in record_review_events: {str(exc)}", exc_info=True)
+        raise Exception("Failed to record review events.")
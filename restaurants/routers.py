@@ -1,10 +1,15 @@
 import logging
+from typing import List, Optional
 
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, Header, HTTPException, Query, Response
+from sqlalchemy.ext.asyncio import AsyncSession
 
-from restaurants import services
-from users.model import User
-from users.utils import get_current_user
+from database import get_async_session
+from restaurants import repository, services
+from restaurants.cache import restaurant_labels, restaurant_names
+from restaurants.schema import ReviewEventRequest, ReviewEventsResponse, RestaurantSearchResponse
+from users.identity import UserSnapshot
+from users.utils import aget_current_user
 
 logger = logging.getLogger(__name__)
 
@@ -12,18 +17,91 @@ router = APIRouter()
 
 
 @router.get("/get_all_restaurants_name")
-def get_all_restaurants_name():
+async def get_all_restaurants_name(
+    prefix: Optional[str] = Query(None, description="Only names starting with this text (case-insensitive)."),
+    limit: Optional[int] = Query(None, ge=1, le=1000),
+    offset: int = Query(0, ge=0),
+    if_none_match: Optional[str] = Header(None),
+    db: AsyncSession = Depends(get_async_session),
+):
+    """Sorted restaurant ids and names; the total match count is in X-Total-Count."""
     try:
-        return services.get_restaurant_name()
+        await restaurant_names.ensure_fresh(lambda: repository.aget_restaurant_names(db))
+        headers = {"ETag": restaurant_names.etag, "Cache-Control": "no-cache"}
+        if restaurant_names.matches(if_none_match):
+            return Response(status_code=304, headers=headers)
+        page = restaurant_names.page(prefix, limit, offset)
+        headers["ETag"] = page.etag
+        headers["X-Total-Count"] = str(page.total)
+        return Response(content=page.body, media_type="application/json", headers=headers)
     except Exception as exc:
         logger.error(f"Error fetching restaurant names: {str(exc)}", exc_info=True)
         raise HTTPException(status_code=500, detail="Failed to fetch restaurant names.")
 
 
 @router.get("/get_restaurant_data")
-def get_restaurant(current_user: User = Depends(get_current_user)):
+async def get_restaurant(
+    current_user: UserSnapshot = Depends(aget_current_user),
+    db: AsyncSession = Depends(get_async_session),
+):
     try:
-        return services.get_restaurant(current_user.restaurant_id)
+        return await services.aget_restaurant(db, current_user.restaurant_id)
     except Exception as exc:
         logger.error(f"Error fetching restaurant data: {str(exc)}", exc_info=True)
         raise HTTPException(status_code=500, detail="Failed to fetch restaurant data.")
+
+
+@router.get("/restaurants/search", response_model=RestaurantSearchResponse)
+async def search_restaurants(
+    q: Optional[str] = Query(None, description="Text contained in the restaurant name."),
+    neighbourhood: Optional[str] = None,
+    cuisine: Optional[str] = None,
+    tag: Optional[str] = None,
+    price: Optional[str] = Query(None, description="Exact average price band."),
+    min_rating: Optional[float] = Query(None, ge=0, le=5),
+    order_by: str = Query("rating", pattern="^(rating|reviews|name)$"),
+    limit: int = Query(20, ge=1, le=100),
+    cursor: Optional[str] = Query(None, description="next_cursor from the previous page."),
+    current_user: UserSnapshot = Depends(aget_current_user),
+    db: AsyncSession = Depends(get_async_session),
+):
+    return await services.asearch_restaurants(
+        db,
+        limit=limit,
+        cursor=cursor,
+        query=q,
+        neighbourhood=neighbourhood,
+        cuisine=cuisine,
+        tag=tag,
+        price=price,
+        min_rating=min_rating,
+        order_by=order_by,
+    )
+
+
+@router.get("/restaurants/labels")
+async def get_restaurant_labels(
+    current_user: UserSnapshot = Depends(aget_current_user),
+    db: AsyncSession = Depends(get_async_session),
+):
+    """Number of restaurants per cuisine and per tag."""
+    try:
+        await restaurant_labels.ensure_fresh(lambda ids: repository.aget_restaurant_labels(db, ids))
+        return restaurant_labels.counts()
+    except Exception as exc:
+        logger.error(f"Error fetching restaurant labels: {str(exc)}", exc_info=True)
+        raise HTTPException(status_code=500, detail="Failed to fetch restaurant labels.")
+
+
+@router.post("/review_events", response_model=ReviewEventsResponse)
+async def record_review_events(
+    events: List[ReviewEventRequest],
+    current_user: UserSnapshot = Depends(aget_current_user),
+):
+    if not current_user.is_admin:
+        raise HTTPException(status_code=403, detail="Only admins can submit review events.")
+    try:
+        return await services.record_review_events(events)
+    except Exception as exc:
+        logger.error(f"Error recording review events: {str(exc)}", exc_info=True)
+        raise HTTPException(status_code=500, detail="Failed to record review events.")
@@ -1,4 +1,5 @@
 from pydantic import BaseModel, Field
+from typing import List, Optional
 from uuid import UUID
 
 
@@ -15,6 +16,37 @@ class RestaurantResponse(BaseModel):
     one_stars: int = Field(..., description="Number of 1-star reviews.")
     cuisine: str = Field(..., description="Cuisine type of the restaurant.")
 
+class ReviewEventRequest(BaseModel):
+    """A single review to fold into a restaurant's rating aggregates."""
+    idempotency_key: str = Field(..., description="Unique key for this review; repeated keys are ignored.")
+    restaurant_id: UUID = Field(..., description="Restaurant the review is for.")
+    stars: int = Field(..., ge=1, le=5, description="Star rating from 1 to 5.")
+    food_rating: Optional[float] = Field(None, ge=0, le=5, description="Food score, if given.")
+    service_rating: Optional[float] = Field(None, ge=0, le=5, description="Service score, if given.")
+    ambience_rating: Optional[float] = Field(None, ge=0, le=5, description="Ambience score, if given.")
+
+class ReviewEventsResponse(BaseModel):
+    """Outcome of a batch of review events."""
+    applied: int = Field(..., description="Events folded into the aggregates.")
+    duplicates: int = Field(..., description="Events ignored because their key was already recorded.")
+    unknown_restaurant: int = Field(..., description="Events for restaurants that do not exist.")
+
+class RestaurantSearchItem(BaseModel):
+    """A restaurant in search results."""
+    restaurant_id: UUID = Field(..., description="Unique identifier for the restaurant.")
+    restaurant_name: str = Field(..., description="Name of the restaurant.")
+    neighbourhood: Optional[str] = Field(None, description="Neighbourhood of the restaurant.")
+    cuisine: Optional[str] = Field(None, description="Cuisines served.")
+    tags: Optional[str] = Field(None, description="Descriptive tags.")
+    average_price: Optional[str] = Field(None, description="Average price band.")
+    overall_rating: Optional[float] = Field(None, description="Overall rating of the restaurant.")
+    total_review_counts: Optional[int] = Field(None, description="Total number of reviews.")
+
+class RestaurantSearchResponse(BaseModel):
+    """A page of restaurant search results."""
+    items: List[RestaurantSearchItem] = Field(..., description="Matching restaurants in the requested order.")
+    next_cursor: Optional[str] = Field(None, description="Pass as `cursor` to fetch the next page; null on the last page.")
+
 class ErrorResponse(BaseModel):
     """Standard error response model for API errors."""
     error: str = Field(..., description="Error message.")
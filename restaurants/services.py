@@ -1,67 +1,241 @@
+import asyncio
+import base64
+import json
+from typing import List, Optional
+from uuid import UUID
 from fastapi import HTTPException
+from sqlalchemy.ext.asyncio import AsyncSession
+from database import AsyncSessionLocal
 from restaurants import repository
-from restaurants.schema import RestaurantResponse
+from restaurants.cache import RestaurantProfile, restaurant_labels, restaurant_profiles
+from restaurants.schema import (
+    RestaurantResponse,
+    RestaurantSearchItem,
+    RestaurantSearchResponse,
+    ReviewEventsResponse,
+)
 import logging
 
 logger = logging.getLogger(__name__)
 
 
-def get_restaurant_name():
+def primary_cuisine(data) -> Optional[str]:
+    """The first cuisine as entered, for display and review metadata; the cuisines array is lowercased for filtering."""
+    return (data.cuisine.split(",")[0].strip() or None) if data.cuisine else None
+
+def to_restaurant_response(data) -> RestaurantResponse:
+    return RestaurantResponse(
+        restaurant_id=data.id,
+        restaurant_name=data.restaurant_name,
+        cuisine=primary_cuisine(data),
+        overall_rating=data.overall_rating,
+        total_review_counts=data.total_review_counts,
+        five_stars=data.five_stars,
+        four_stars=data.four_stars,
+        three_stars=data.three_stars,
+        two_stars=data.two_stars,
+        one_stars=data.one_stars,
+    )
+
+def format_restaurant_context(data) -> str:
+    return (
+        f"Restaurant Name: {data.restaurant_name}\n"
+        f"Location: {data.restaurant_location}\n"
+        f"Cuisine: {data.cuisine}\n"
+        f"Rating: {data.overall_rating} stars\n"
+        f"Neighbourhood: {data.neighbourhood}\n"
+        f"Average Price: {data.average_price}"
+    )
+
+# Restaurant columns the assistant can answer from directly
+PROFILE_FACTS = (
+    "restaurant_name", "restaurant_location", "neighbourhood", "cuisine", "tags", "average_price",
+    "hours_of_operation", "overall_rating", "total_review_counts", "food_rating", "service_rating",
+    "ambience_rating", "five_stars", "four_stars", "three_stars", "two_stars", "one_stars",
+)
+
+def build_restaurant_profile(data) -> RestaurantProfile:
+    return RestaurantProfile(
+        version=data.row_version,
+        response=to_restaurant_response(data),
+        context=format_restaurant_context(data),
+        scope={
+            "restaurant_name": data.restaurant_name,
+            "neighbourhood": data.neighbourhood,
+            "cuisine": primary_cuisine(data),
+        },
+        facts={column: getattr(data, column) for column in PROFILE_FACTS},
+    )
+
+def get_restaurant_profile(restaurant_id) -> Optional[RestaurantProfile]:
     """
-    Get the restaurant name from the database.
+    The restaurant's cached profile; an expired one is kept if its row_version is unchanged.
     """
-    try:
-        data = repository.get_restaurant_names()
-        if not data:
-            logger.warning("No restaurants found in database.")
-            raise HTTPException(status_code=404, detail="Restaurant not found.")
-        return data
-    except Exception as exc:
-        logger.error(f"Error in get_restaurant_name: {str(exc)}", exc_info=True)
-        raise HTTPException(status_code=500, detail="Failed to fetch restaurant names.")
+    profile = restaurant_profiles.get(restaurant_id)
+    if profile is not None:
+        return profile
+    generation = restaurant_profiles.generation(restaurant_id)
+    stale = restaurant_profiles.peek(restaurant_id)
+    if stale is not None and repository.get_restaurant_version(restaurant_id) == stale.version:
+        return restaurant_profiles.put(restaurant_id, stale, generation, revalidated=True)
+    data = repository.get_restaurant_data(restaurant_id)
+    if not data:
+        return None
+    return restaurant_profiles.put(restaurant_id, build_restaurant_profile(data), generation)
+
+async def aget_restaurant_profile(db: AsyncSession, restaurant_id) -> Optional[RestaurantProfile]:
+    """
+    get_restaurant_profile using the request's async session.
+    """
+    profile = restaurant_profiles.get(restaurant_id)
+    if profile is not None:
+        return profile
+    generation = restaurant_profiles.generation(restaurant_id)
+    stale = restaurant_profiles.peek(restaurant_id)
+    if stale is not None and await repository.aget_restaurant_version(db, restaurant_id) == stale.version:
+        return restaurant_profiles.put(restaurant_id, stale, generation, revalidated=True)
+    data = await repository.aget_restaurant_data(db, restaurant_id)
+    if not data:
+        return None
+    return restaurant_profiles.put(restaurant_id, build_restaurant_profile(data), generation)
 
-def get_restaurant(restaurant_id):
+async def aget_restaurant(db: AsyncSession, restaurant_id):
     """
-    Get the restaurant data from the database.
+    Get the restaurant data with the request's async session.
     """
     try:
-        data = repository.get_restaurant_data(restaurant_id)
-        if not data:
+        profile = await aget_restaurant_profile(db, restaurant_id)
+        if not profile:
             logger.warning(f"Restaurant with id {restaurant_id} not found.")
             raise HTTPException(status_code=404, detail="Restaurant not found.")
-        return RestaurantResponse(
-            restaurant_id=data.id,
-            restaurant_name=data.restaurant_name,
-            cuisine=data.cuisine.split(",")[0] if data.cuisine else None,
-            overall_rating=data.overall_rating,
-            total_review_counts=data.total_review_counts,
-            five_stars=data.five_stars,
-            four_stars=data.four_stars,
-            three_stars=data.three_stars,
-            two_stars=data.two_stars,
-            one_stars=data.one_stars,
-        )
+        return profile.response
     except Exception as exc:
-        logger.error(f"Error in get_restaurant: {str(exc)}", exc_info=True)
+        logger.error(f"Error in aget_restaurant: {str(exc)}", exc_info=True)
         raise HTTPException(status_code=500, detail="Failed to fetch restaurant data.")
 
+def encode_cursor(sort_value, restaurant_id) -> str:
+    return base64.urlsafe_b64encode(json.dumps([sort_value, str(restaurant_id)]).encode("utf-8")).decode("ascii")
+
+def decode_cursor(cursor: Optional[str]) -> Optional[tuple]:
+    if not cursor:
+        return None
+    try:
+        sort_value, restaurant_id = json.loads(base64.urlsafe_b64decode(cursor.encode("ascii")))
+        return sort_value, UUID(restaurant_id)
+    except Exception:
+        raise HTTPException(status_code=400, detail="Invalid cursor.")
+
+def to_search_response(rows, limit: int) -> RestaurantSearchResponse:
+    page = rows[:limit]
+    items = [
+        RestaurantSearchItem(
+            restaurant_id=restaurant.id,
+            restaurant_name=restaurant.restaurant_name,
+            neighbourhood=restaurant.neighbourhood,
+            cuisine=restaurant.cuisine,
+            tags=restaurant.tags,
+            average_price=restaurant.average_price,
+            overall_rating=restaurant.overall_rating,
+            total_review_counts=restaurant.total_review_counts,
+        )
+        for restaurant, _ in page
+    ]
+    next_cursor = encode_cursor(page[-1][1], page[-1][0].id) if len(rows) > limit else None
+    return RestaurantSearchResponse(items=items, next_cursor=next_cursor)
+
+async def asearch_restaurant_rows(db: AsyncSession, cuisine: Optional[str] = None, tag: Optional[str] = None, **filters) -> List[tuple]:
+    """
+    repository.asearch_restaurants with the cuisine and tag filters answered by the
+    in-memory label index, so the query only narrows to the matching ids.
+    """
+    if cuisine or tag:
+        await restaurant_labels.ensure_fresh(lambda ids: repository.aget_restaurant_labels(db, ids))
+        restaurant_ids = restaurant_labels.restaurant_ids(cuisine, [tag] if tag else None)
+        if not restaurant_ids:
+            return []
+        filters["restaurant_ids"] = [UUID(restaurant_id) for restaurant_id in restaurant_ids]
+    return await repository.asearch_restaurants(db, **filters)
+
+async def asearch_restaurants(db: AsyncSession, limit: int = 20, cursor: Optional[str] = None, **filters) -> RestaurantSearchResponse:
+    """
+    Search restaurants with filters, ordering and keyset pagination.
+    """
+    after = decode_cursor(cursor)
+    try:
+        rows = await asearch_restaurant_rows(db, limit=limit + 1, after=after, **filters)
+        return to_search_response(rows, limit)
+    except Exception as exc:
+        logger.error(f"Error in asearch_restaurants: {str(exc)}", exc_info=True)
+        raise HTTPException(status_code=500, detail="Failed to search restaurants.")
+
+def format_search_results(items: List[RestaurantSearchItem]) -> str:
+    """Compact ranking text for the assistant."""
+    if not items:
+        return "No matching restaurants found."
+    lines = []
+    for rank, item in enumerate(items, 1):
+        rating = f"{item.overall_rating:.1f}/5" if item.overall_rating is not None else "unrated"
+        details = ", ".join(filter(None, [item.cuisine, item.neighbourhood, item.average_price]))
+        lines.append(f"{rank}. {item.restaurant_name}: {rating} from {item.total_review_counts or 0} reviews ({details})")
+    return "\n".join(lines)
+
+async def record_review_events(events) -> ReviewEventsResponse:
+    """
+    Apply review events to the rating aggregates without blocking the event loop.
+    """
+    try:
+        stats = await asyncio.to_thread(repository.record_review_events, [event.model_dump() for event in events])
+        return ReviewEventsResponse(**stats)
+    except Exception as exc:
+        logger.error(f"Error in record_review_events: {str(exc)}", exc_info=True)
+        raise HTTPException(status_code=500, detail="Failed to record review events.")
+
+NO_RESTAURANT_CONTEXT = "No specific restaurant context available."
+
 def fetch_restaurant_context(restaurant_id: str) -> str:
     try:
-        restaurant = repository.get_restaurant_data(restaurant_id)
-        if not restaurant:
+        profile = get_restaurant_profile(restaurant_id)
+        if not profile:
             logger.warning(f"No context found for restaurant id {restaurant_id}.")
-            return "No specific restaurant context available."
-        return (
-            f"Restaurant Name: {restaurant.restaurant_name}\n"
-            f"Location: {restaurant.restaurant_location}\n"
-            f"Cuisine: {restaurant.cuisine}\n"
-            f"Rating: {restaurant.overall_rating} stars\n"
-            f"Neighbourhood: {restaurant.neighbourhood}\n"
-            f"Average Price: {restaurant.average_price}"
-        )
+            return NO_RESTAURANT_CONTEXT
+        return profile.context
     except Exception as exc:
         logger.error(f"Error in fetch_restaurant_context: {str(exc)}", exc_info=True)
-        return "No specific restaurant context available."
+        return NO_RESTAURANT_CONTEXT
 
+def fetch_restaurant_scope(restaurant_id: str) -> dict:
+    """
+    Metadata used to scope review retrieval to a restaurant and its neighbourhood.
+    """
+    try:
+        profile = get_restaurant_profile(restaurant_id)
+        if not profile:
+            logger.warning(f"No retrieval scope found for restaurant id {restaurant_id}.")
+            return {}
+        return dict(profile.scope)
+    except Exception as exc:
+        logger.error(f"Error in fetch_restaurant_scope: {str(exc)}", exc_info=True)
+        return {}
 
+async def afetch_restaurant_profile(restaurant_id: str) -> tuple:
+    """
+    The (context, scope) pair for an assistant from one profile lookup, without blocking the event loop.
+    """
+    try:
+        async with AsyncSessionLocal() as db:
+            profile = await aget_restaurant_profile(db, restaurant_id)
+        if not profile:
+            logger.warning(f"No context found for restaurant id {restaurant_id}.")
+            return NO_RESTAURANT_CONTEXT, {}
+        return profile.context, dict(profile.scope)
+    except Exception as exc:
+        logger.error(f"Error in afetch_restaurant_profile: {str(exc)}", exc_info=True)
+        return NO_RESTAURANT_CONTEXT, {}
 
+async def afetch_restaurant_facts(restaurant_id: str) -> dict:
+    """
+    The restaurant's current column values for direct answers, from the profile cache.
+    """
+    async with AsyncSessionLocal() as db:
+        profile = await aget_restaurant_profile(db, restaurant_id)
+    return dict(profile.facts) if profile else {}
@@ -0,0 +1,50 @@
+import asyncio
+
+import pytest
+
+import ai_assistants.restaurant_reviews as restaurant_reviews
+from ai_assistants.load_test import FakeAssistantResources
+from ai_assistants.restaurant_reviews import AssistantSession, RestaurantAssistant
+from restaurants import services
+
+FACTS = {"restaurant_name": "Load Test Kitchen", "overall_rating": 4.5, "total_review_counts": 12}
+
+
+@pytest.fixture
+def assistant(monkeypatch):
+    async def afetch_restaurant_facts(restaurant_id):
+        return FACTS
+
+    monkeypatch.setattr(services, "afetch_restaurant_facts", afetch_restaurant_facts)
+    monkeypatch.setattr(restaurant_reviews, "response_cache", None)
+    assistant = RestaurantAssistant(
+        restaurant_id="load-test-restaurant",
+        resources=FakeAssistantResources(latency=0.0, documents=40),
+        restaurant_context="Restaurant Name: Load Test Kitchen",
+        restaurant_scope={"restaurant_name": "Load Test Kitchen", "neighbourhood": "Soho"},
+    )
+    assistant.agent.verbose = False
+    return assistant
+
+
+async def both_paths(assistant, query):
+    result = await AssistantSession(assistant).get_response(query)
+    events = [event async for event in AssistantSession(assistant).astream_response(query)]
+    return result, events
+
+
+@pytest.mark.parametrize("query, route", [
+    ("What is our overall rating?", "profile"),
+    ("How do we compare to nearby restaurants?", "unified"),
+])
+def test_get_response_and_astream_response_route_the_same_way(assistant, query, route):
+    result, events = asyncio.run(both_paths(assistant, query))
+
+    assert result["agent_used"] == route
+    assert events[-1]["type"] == "end"
+    assert events[-1]["response"] == result["response"]
+
+
+def test_sync_and_async_vector_queries_return_the_same_reviews(assistant):
+    query = "What do customers say about the food?"
+    assert assistant.query_vectorstore(query) == asyncio.run(assistant.aquery_vectorstore(query))
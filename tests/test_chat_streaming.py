@@ -0,0 +1,183 @@
+import asyncio
+import json
+import time
+
+import pytest
+from fastapi import HTTPException
+from fastapi.testclient import TestClient
+from starlette.websockets import WebSocketDisconnect
+
+import app as chat_app
+from ai_assistants.streaming import buffered_stream
+from users.identity import UserSnapshot
+
+USER = UserSnapshot(id="user-1", restaurant_id="restaurant-1", is_deleted=False)
+
+
+class FakeAssistantSession:
+    """Streams "<message>0 <message>1 ..." one token at a time; "slow" takes long enough to cancel."""
+
+    def __init__(self, session_id, log):
+        self.session_id = session_id
+        self.log = log
+
+    async def astream_response(self, message):
+        self.log.append(("start", self.session_id, message))
+        try:
+            if message == "fail":
+                raise RuntimeError("model unavailable")
+            for i in range(3):
+                await asyncio.sleep(1.0 if message == "slow" else 0.01)
+                yield {"type": "token", "content": f"{message}{i} "}
+            yield {"type": "end", "response": message, "elapsed_time": 0.0}
+        finally:
+            self.log.append(("closed", self.session_id, message))
+
+
+@pytest.fixture
+def chat(monkeypatch):
+    log, saved = [], []
+
+    async def aget_user_for_token(token):
+        if token != "valid":
+            raise HTTPException(status_code=401, detail="Could not validate credentials")
+        return USER
+
+    async def open_assistant_session(current_user, session_id):
+        if session_id == "broken":
+            raise RuntimeError("registry unavailable")
+        return FakeAssistantSession(session_id, log)
+
+    async def save_exchange(current_user, session_id, message, response):
+        saved.append((session_id, message, response))
+
+    async def current_user():
+        return USER
+
+    monkeypatch.setattr(chat_app, "aget_user_for_token", aget_user_for_token)
+    monkeypatch.setattr(chat_app, "open_assistant_session", open_assistant_session)
+    monkeypatch.setattr(chat_app, "save_exchange", save_exchange)
+    monkeypatch.setitem(chat_app.app.dependency_overrides, chat_app.aget_current_user, current_user)
+    # Not used as a context manager, so startup workers and warm-up do not run
+    client = TestClient(chat_app.app)
+    client.log, client.saved = log, saved
+    return client
+
+
+def receive_until(ws, event_type):
+    events = []
+    while not events or events[-1]["type"] != event_type:
+        events.append(ws.receive_json())
+    return events
+
+
+def text(events):
+    return "".join(event["content"] for event in events if event["type"] == "token")
+
+
+def wait_for(condition, timeout=2.0):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, "timed out"
+        time.sleep(0.01)
+
+
+def test_websocket_rejects_an_invalid_token(chat):
+    with pytest.raises(WebSocketDisconnect) as exc_info:
+        with chat.websocket_connect("/chat/ws?token=expired") as ws:
+            ws.receive_json()
+    assert exc_info.value.code == 1008
+
+
+def test_websocket_answers_queued_messages_in_order(chat):
+    with chat.websocket_connect("/chat/ws?token=valid&session_id=default-session") as ws:
+        ws.send_json({"message": "first"})
+        ws.send_json({"message": "second", "session_id": "other-session"})
+        first = receive_until(ws, "end")
+        second = receive_until(ws, "end")
+
+    assert text(first) == "first0 first1 first2 "
+    assert first[-1]["response"] == "first"
+    assert text(second) == "second0 second1 second2 "
+    assert chat.saved == [
+        ("default-session", "first", "first"),
+        ("other-session", "second", "second"),
+    ]
+
+
+def test_websocket_reports_malformed_messages_and_keeps_serving(chat):
+    with chat.websocket_connect("/chat/ws?token=valid") as ws:
+        ws.send_text("not json")
+        assert ws.receive_json()["type"] == "error"
+        ws.send_json({"type": "message"})
+        assert ws.receive_json() == {"type": "error", "detail": "A message is required."}
+        ws.send_json({"message": "hello"})
+        assert receive_until(ws, "end")[-1]["response"] == "hello"
+
+
+def test_websocket_cancel_stops_the_reply_and_drops_queued_messages(chat):
+    with chat.websocket_connect("/chat/ws?token=valid") as ws:
+        ws.send_json({"type": "cancel"})
+        ws.send_json({"message": "slow"})
+        ws.send_json({"message": "queued"})
+        wait_for(lambda: ("start", "default", "slow") in chat.log)
+        ws.send_json({"type": "cancel"})
+        assert ws.receive_json() == {"type": "cancelled"}
+        ws.send_json({"message": "after"})
+        events = receive_until(ws, "end")
+
+    assert text(events) == "after0 after1 after2 "
+    assert ("closed", "default", "slow") in chat.log
+    assert all(message != "queued" for _, _, message in chat.log)
+    assert chat.saved == [("default", "after", "after")]
+
+
+def test_websocket_survives_a_failed_turn(chat):
+    with chat.websocket_connect("/chat/ws?token=valid") as ws:
+        ws.send_json({"message": "hello", "session_id": "broken"})
+        assert ws.receive_json() == {"type": "error", "detail": "An error occurred while processing your message."}
+        ws.send_json({"message": "fail"})
+        assert receive_until(ws, "error")[-1]["detail"] == "An error occurred while processing your message."
+        ws.send_json({"message": "hello"})
+        assert receive_until(ws, "end")[-1]["response"] == "hello"
+
+
+def test_websocket_disconnect_cancels_the_reply(chat):
+    with chat.websocket_connect("/chat/ws?token=valid") as ws:
+        ws.send_json({"message": "slow"})
+        wait_for(lambda: ("start", "default", "slow") in chat.log)
+    wait_for(lambda: ("closed", "default", "slow") in chat.log)
+    assert chat.saved == []
+
+
+def test_sse_stream_sends_events_in_order_and_saves_the_exchange(chat):
+    response = chat.post("/chat/stream", json={"message": "hi", "session_id": "sse"})
+
+    assert response.headers["content-type"].startswith("text/event-stream")
+    frames = [frame for frame in response.text.split("\n\n") if frame]
+    events = [json.loads(frame.split("data: ", 1)[1]) for frame in frames]
+    assert [frame.split("\n", 1)[0] for frame in frames][-1] == "event: end"
+    assert text(events) == "hi0 hi1 hi2 "
+    assert chat.saved == [("sse", "hi", "hi")]
+
+
+def test_buffered_stream_cancels_generation_when_the_reader_stalls():
+    closed = []
+
+    async def events():
+        try:
+            for i in range(10):
+                yield {"type": "end" if i == 9 else "tool_start", "i": i}
+        finally:
+            closed.append(True)
+
+    async def read():
+        stream = buffered_stream(events(), max_buffered=2, stall_timeout=0.05)
+        first = await stream.__anext__()
+        await asyncio.sleep(0.2)
+        return [first] + [event async for event in stream]
+
+    received = asyncio.run(read())
+    assert received[-1] == {"type": "error", "detail": "Client too slow, generation cancelled."}
+    assert len(received) < 10
+    assert closed == [True]
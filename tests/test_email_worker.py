@@ -0,0 +1,137 @@
+import smtplib
+from datetime import datetime
+
+import pytest
+
+from emails import repository
+from emails.worker import OutboxWorker, SMTPConnectionPool
+
+
+class FakeSMTP:
+    """Accepts every message except those to addresses listed in `reject` (code, message)."""
+
+    def __init__(self, reject=None, disconnect=()):
+        self.reject = reject or {}
+        self.disconnect = set(disconnect)
+        self.delivered = []
+        self.resets = 0
+
+    def sendmail(self, sender, recipients, message):
+        recipient = recipients[0]
+        if recipient in self.disconnect:
+            raise smtplib.SMTPServerDisconnected("connection dropped")
+        if recipient in self.reject:
+            code, text = self.reject[recipient]
+            raise smtplib.SMTPRecipientsRefused({recipient: (code, text)})
+        self.delivered.append(recipient)
+
+    def rset(self):
+        self.resets += 1
+
+    def noop(self):
+        return (250, b"OK")
+
+    def quit(self):
+        pass
+
+
+@pytest.fixture
+def outbox(monkeypatch):
+    """An in-memory outbox: queue emails with outbox.add and inspect outbox.sent / outbox.failed."""
+
+    class Outbox:
+        def __init__(self):
+            self.emails = []
+            self.sent = []
+            self.failed = {}
+
+        def add(self, recipient, attempts=1, html_body="<p>Hi</p>"):
+            email = {
+                "id": len(self.emails) + 1,
+                "recipient": recipient,
+                "subject": "Hello",
+                "html_body": html_body,
+                "text_body": "Hi",
+                "attempts": attempts,
+            }
+            self.emails.append(email)
+            return email["id"]
+
+    box = Outbox()
+    monkeypatch.setattr(repository, "claim_emails", lambda limit, lease_seconds: box.emails[:limit])
+    monkeypatch.setattr(repository, "mark_sent", lambda ids: box.sent.extend(ids))
+    monkeypatch.setattr(repository, "mark_failed", lambda email_id, error, retry_at: box.failed.__setitem__(email_id, (error, retry_at)))
+    return box
+
+
+def make_worker(server, size=1, **kwargs):
+    return OutboxWorker(pool=SMTPConnectionPool(size=size, connect=lambda: server), **kwargs)
+
+
+def test_transient_failures_are_retried_and_the_rest_are_sent(outbox):
+    server = FakeSMTP(reject={"busy@example.com": (450, b"mailbox busy")})
+    ok = outbox.add("ok@example.com")
+    busy = outbox.add("busy@example.com")
+    after = outbox.add("after@example.com")
+    worker = make_worker(server)
+
+    assert worker.run_once() == 3
+
+    assert outbox.sent == [ok, after]
+    error, retry_at = outbox.failed[busy]
+    assert "SMTPRecipientsRefused" in error and retry_at is not None
+    assert server.resets == 1
+    assert worker.stats()["retried"] == 1 and worker.stats()["dead"] == 0
+
+
+def test_permanent_failures_and_the_last_attempt_are_dead_lettered(outbox):
+    server = FakeSMTP(reject={"gone@example.com": (550, b"no such user"), "busy@example.com": (450, b"busy")})
+    gone = outbox.add("gone@example.com")
+    exhausted = outbox.add("busy@example.com", attempts=3)
+    worker = make_worker(server, max_attempts=3)
+
+    worker.run_once()
+
+    assert outbox.failed[gone][1] is None
+    assert outbox.failed[exhausted][1] is None
+    assert worker.stats()["dead"] == 2
+
+
+def test_a_dropped_connection_defers_the_rest_of_the_share(outbox):
+    server = FakeSMTP(disconnect={"drop@example.com"})
+    first = outbox.add("first@example.com")
+    drop = outbox.add("drop@example.com")
+    later = outbox.add("later@example.com")
+    worker = make_worker(server)
+
+    worker.run_once()
+
+    assert outbox.sent == [first]
+    assert outbox.failed[drop][1] is not None
+    assert "SMTPServerDisconnected" in outbox.failed[later][0]
+    assert worker.pool.stats()["discarded"] == 1
+
+
+def test_a_message_that_cannot_be_rendered_is_dead_lettered_without_failing_the_batch(outbox):
+    server = FakeSMTP()
+    first = outbox.add("first@example.com")
+    broken = outbox.add("broken@example.com", html_body=None)
+    others = [outbox.add(f"user{i}@example.com") for i in range(4)]
+    worker = make_worker(server, size=2)
+
+    assert worker.run_once() == 6
+
+    assert sorted(outbox.sent) == sorted([first] + others)
+    assert outbox.failed[broken][1] is None
+    assert worker.pool.stats()["discarded"] == 0
+
+
+def test_retry_delay_backs_off_exponentially_up_to_the_cap():
+    worker = make_worker(FakeSMTP(), retry_base=10, retry_max=100)
+
+    def delay(attempts):
+        return (worker.retry_at(attempts) - datetime.utcnow()).total_seconds()
+
+    assert 7 <= delay(1) <= 12.5
+    assert 15 <= delay(2) <= 24.5
+    assert 79 <= delay(10) <= 120.5
@@ -0,0 +1,65 @@
+import asyncio
+
+import pytest
+from passlib.context import CryptContext
+
+import users.hashing as hashing
+import users.services as user_services
+from users.hashing import PasswordHasher
+from users.model import User
+from users.utils import decode_token
+
+
+@pytest.fixture
+def hasher(monkeypatch):
+    monkeypatch.setattr(hashing, "pwd_context", CryptContext(schemes=["bcrypt"], deprecated="auto", bcrypt__rounds=4))
+    return PasswordHasher(workers=0, max_concurrency=2)
+
+
+def test_hash_and_verify_in_the_pool(hasher):
+    async def run():
+        hashed = await hasher.ahash("secret")
+        return hashed, await asyncio.gather(hasher.averify("secret", hashed), hasher.averify("wrong", hashed))
+
+    hashed, results = asyncio.run(run())
+
+    assert hashed.startswith("$2b$04$")
+    assert results == [True, False]
+    stats = hasher.stats()
+    assert (stats["completed"], stats["errors"], stats["in_flight"], stats["queue_depth"]) == (3, 0, 0, 0)
+
+
+def test_outdated_cost_is_rehashed(hasher, monkeypatch):
+    old_hash = asyncio.run(hasher.ahash("secret"))
+    monkeypatch.setattr(hashing, "pwd_context", CryptContext(schemes=["bcrypt"], deprecated="auto", bcrypt__rounds=5))
+
+    verified, new_hash = asyncio.run(hasher.averify_and_update("secret", old_hash))
+
+    assert verified
+    assert new_hash.startswith("$2b$05$")
+    assert asyncio.run(hasher.averify_and_update("secret", new_hash)) == (True, None)
+    assert asyncio.run(hasher.averify_and_update("wrong", old_hash)) == (False, None)
+    assert hasher.stats()["rehashes"] == 1
+
+
+def test_failed_calls_are_not_counted_as_completed(hasher):
+    with pytest.raises(ValueError):
+        asyncio.run(hasher.averify("secret", "not-a-bcrypt-hash"))
+
+    stats = hasher.stats()
+    assert (stats["completed"], stats["errors"], stats["avg_run_time"]) == (0, 1, 0.0)
+
+
+def test_login_stores_the_upgraded_hash(hasher, monkeypatch):
+    old_hash = asyncio.run(hasher.ahash("secret"))
+    user = User(email="a@example.com", password=old_hash, is_deleted=False)
+    saved = []
+    monkeypatch.setattr(hashing, "pwd_context", CryptContext(schemes=["bcrypt"], deprecated="auto", bcrypt__rounds=5))
+    monkeypatch.setattr(user_services, "password_hasher", hasher)
+    monkeypatch.setattr(user_services.repository, "get_user_by_email", lambda email: user)
+    monkeypatch.setattr(user_services.repository, "update_password", lambda record, password: saved.append(password))
+
+    token = asyncio.run(user_services.login("a@example.com", "secret"))
+
+    assert decode_token(token)["sub"] == "a@example.com"
+    assert len(saved) == 1 and saved[0].startswith("$2b$05$")
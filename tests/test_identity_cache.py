@@ -0,0 +1,109 @@
+import asyncio
+import time
+import uuid
+
+import pytest
+from fastapi import HTTPException
+
+import users.utils as user_utils
+from users.identity import IdentityCache, UserSnapshot
+from users.model import User
+
+
+def snapshot(email, **values):
+    return UserSnapshot(id=uuid.uuid4(), email=email, is_deleted=False, **values)
+
+
+def test_entries_expire_with_the_token_before_the_ttl():
+    cache = IdentityCache(max_size=10, ttl=300)
+    cache.put("live", snapshot("a@example.com"))
+    cache.put("expiring", snapshot("a@example.com"), token_expires_at=time.time() - 1)
+
+    assert cache.get("live").email == "a@example.com"
+    assert cache.get("expiring") is None
+    assert cache.stats()["size"] == 1
+
+
+def test_least_recently_used_token_is_evicted():
+    cache = IdentityCache(max_size=2, ttl=300)
+    cache.put("t1", snapshot("a@example.com"))
+    cache.put("t2", snapshot("b@example.com"))
+    cache.get("t1")
+    cache.put("t3", snapshot("c@example.com"))
+
+    assert cache.get("t2") is None
+    assert cache.get("t1") is not None
+    assert cache.get("t3") is not None
+    assert cache.stats()["evictions"] == 1
+
+
+def test_invalidate_drops_every_token_for_the_email():
+    cache = IdentityCache(max_size=10, ttl=300)
+    cache.put("phone", snapshot("a@example.com"))
+    cache.put("laptop", snapshot("a@example.com"))
+    cache.put("other", snapshot("b@example.com"))
+
+    cache.invalidate("a@example.com")
+
+    assert cache.get("phone") is None
+    assert cache.get("laptop") is None
+    assert cache.get("other") is not None
+    assert cache.stats()["invalidations"] == 1
+
+
+def test_snapshot_is_read_only_and_has_no_password():
+    user = UserSnapshot.from_model(User(id=uuid.uuid4(), email="a@example.com", password="hash", is_deleted=False))
+
+    assert not hasattr(user, "password")
+    with pytest.raises(AttributeError):
+        user.is_admin = True
+
+
+class FakeSessionFactory:
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        return False
+
+
+@pytest.fixture
+def lookups(monkeypatch):
+    records = {}
+    calls = []
+
+    async def aget_user_by_email(db, email):
+        calls.append(email)
+        return records.get(email)
+
+    monkeypatch.setattr(user_utils, "identity_cache", IdentityCache(max_size=10, ttl=300))
+    monkeypatch.setattr(user_utils, "AsyncSessionLocal", FakeSessionFactory)
+    monkeypatch.setattr(user_utils, "aget_user_by_email", aget_user_by_email)
+    return records, calls
+
+
+def test_a_cached_token_skips_the_database(lookups):
+    records, calls = lookups
+    records["a@example.com"] = User(id=uuid.uuid4(), email="a@example.com", is_deleted=False)
+    token = user_utils.create_access_token({"sub": "a@example.com"})
+
+    first = asyncio.run(user_utils.aget_user_for_token(token))
+    second = asyncio.run(user_utils.aget_user_for_token(token))
+
+    assert first is second
+    assert calls == ["a@example.com"]
+    assert user_utils.identity_cache.stats()["db_lookups_avoided"] == 1
+
+
+def test_unknown_and_deleted_users_are_rejected(lookups):
+    records, _ = lookups
+    records["gone@example.com"] = User(id=uuid.uuid4(), email="gone@example.com", is_deleted=True)
+
+    with pytest.raises(HTTPException) as unknown:
+        asyncio.run(user_utils.aget_user_for_token(user_utils.create_access_token({"sub": "new@example.com"})))
+    with pytest.raises(HTTPException) as deleted:
+        asyncio.run(user_utils.aget_user_for_token(user_utils.create_access_token({"sub": "gone@example.com"})))
+    with pytest.raises(HTTPException) as invalid:
+        asyncio.run(user_utils.aget_user_for_token("not-a-token"))
+
+    assert (unknown.value.status_code, deleted.value.status_code, invalid.value.status_code) == (401, 400, 401)
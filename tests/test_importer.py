@@ -0,0 +1,77 @@
+from types import SimpleNamespace
+from uuid import uuid4
+
+from sqlalchemy.dialects import postgresql
+
+from restaurants import repository
+from restaurants.importer import import_restaurants
+
+
+class FakeSession:
+    """Records the statements the upsert executes and reports every row as inserted."""
+
+    def __init__(self):
+        self.statements = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        return False
+
+    def execute(self, statement, *args):
+        self.statements.append(statement)
+        rows = statement.compile(dialect=postgresql.dialect()).params
+        count = sum(1 for key in rows if key.startswith("restaurant_name_m"))
+        return SimpleNamespace(all=lambda: [SimpleNamespace(id=uuid4(), inserted=True) for _ in range(count)])
+
+    def commit(self):
+        pass
+
+
+def inserted_rows(statement):
+    """VALUES rows of a multi-row insert, as column -> value dicts."""
+    rows = {}
+    for key, value in statement.compile(dialect=postgresql.dialect()).params.items():
+        column, _, index = key.rpartition("_m")
+        if column and index.isdigit():
+            rows.setdefault(int(index), {})[column] = value
+    return [rows[index] for index in sorted(rows)]
+
+
+def test_inserted_rows_get_column_defaults(tmp_path, monkeypatch):
+    session = FakeSession()
+    monkeypatch.setattr(repository, "SessionLocal", lambda: session)
+    path = tmp_path / "restaurants.csv"
+    path.write_text(
+        "restaurant_name,overall_rating,five_stars,is_active\n"
+        "Dishoom,4.5,,\n"
+        "Hawksmoor,,12,false\n"
+    )
+
+    stats = import_restaurants(str(path))
+
+    assert stats["inserted"] == 2
+    rows = {row["restaurant_name"]: row for statement in session.statements for row in inserted_rows(statement)}
+    assert rows["Dishoom"]["overall_rating"] == 4.5
+    assert rows["Dishoom"]["five_stars"] == 0
+    assert rows["Dishoom"]["total_review_counts"] == 0
+    assert rows["Dishoom"]["is_active"] is True
+    assert rows["Hawksmoor"]["overall_rating"] == 0
+    assert rows["Hawksmoor"]["five_stars"] == 12
+    assert rows["Hawksmoor"]["is_active"] is False
+
+
+def test_missing_columns_keep_stored_values_on_update(tmp_path, monkeypatch):
+    session = FakeSession()
+    monkeypatch.setattr(repository, "SessionLocal", lambda: session)
+    path = tmp_path / "ratings.jsonl"
+    path.write_text('{"restaurant_name": "Dishoom", "overall_rating": 4.5}\n')
+
+    import_restaurants(str(path))
+
+    sql = str(session.statements[0].compile(dialect=postgresql.dialect()))
+    update = sql.split("DO UPDATE SET", 1)[1]
+    assert "overall_rating = excluded.overall_rating" in update
+    assert "five_stars" not in update
+    assert "is_active" not in update
@@ -0,0 +1,27 @@
+from langchain_core.tools import StructuredTool
+from pydantic import BaseModel, Field
+
+from ai_assistants.prompts import tool_schemas
+
+
+class LookupInput(BaseModel):
+    query: str = Field(..., description="What to look up.")
+
+
+def lookup(query: str) -> str:
+    return query
+
+
+def make_tool():
+    return StructuredTool.from_function(func=lookup, name="lookup", description="Look something up.", args_schema=LookupInput)
+
+
+def test_tool_schemas_are_shared_by_tool_set_but_not_mutable_across_callers():
+    first = tool_schemas([make_tool()])
+    first[0]["function"]["description"] = "changed"
+    first[0]["function"]["parameters"]["properties"].clear()
+
+    second = tool_schemas([make_tool()])
+
+    assert second[0]["function"]["description"] == "Look something up."
+    assert "query" in second[0]["function"]["parameters"]["properties"]
@@ -0,0 +1,99 @@
+import asyncio
+from typing import List
+
+import pytest
+from langchain_core.embeddings import Embeddings
+from langchain_core.messages import AIMessage, HumanMessage
+
+import ai_assistants.restaurant_reviews as restaurant_reviews
+from ai_assistants.load_test import FakeAssistantResources
+from ai_assistants.response_cache import SemanticResponseCache
+from ai_assistants.restaurant_reviews import AssistantSession, RestaurantAssistant
+
+VOCABULARY = ["open", "hours", "time", "parking", "vegan", "rating"]
+
+
+class KeywordEmbeddings(Embeddings):
+    """Bag-of-keywords vectors, so similar questions are similar by construction."""
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        return [self.embed_query(text) for text in texts]
+
+    def embed_query(self, text: str) -> List[float]:
+        words = text.split()
+        return [float(sum(word.startswith(keyword) for word in words)) for keyword in VOCABULARY] + [0.1]
+
+
+def ask(cache, restaurant_id, question):
+    return asyncio.run(cache.lookup(restaurant_id, question))
+
+
+def answer(cache, restaurant_id, question, response):
+    cache.store(restaurant_id, question, response, ask(cache, restaurant_id, question))
+
+
+@pytest.fixture
+def cache():
+    return SemanticResponseCache(KeywordEmbeddings(), threshold=0.9, ttl=60, max_size=3)
+
+
+def test_exact_and_similar_questions_hit_for_the_same_restaurant_only(cache):
+    answer(cache, "r1", "What time do you open?", "We open at 9.")
+
+    assert ask(cache, "r1", "what time do you OPEN").response == "We open at 9."
+    assert ask(cache, "r1", "When do you open, what time?").response == "We open at 9."
+    assert ask(cache, "r1", "Is there parking?").response is None
+    assert ask(cache, "r2", "What time do you open?").response is None
+    assert cache.stats()["exact_hits"] == 1 and cache.stats()["semantic_hits"] == 1
+
+
+def test_answers_expire_and_the_oldest_is_evicted(cache):
+    cache.ttl = 0
+    answer(cache, "r1", "Is there parking?", "Yes.")
+    assert ask(cache, "r1", "Is there parking?").response is None
+
+    cache.ttl = 60
+    for question in ["Is there parking?", "Any vegan options?", "What is your rating?", "What are your hours?"]:
+        answer(cache, "r1", question, question)
+    assert ask(cache, "r1", "Is there parking?").response is None
+    assert ask(cache, "r1", "What are your hours?").response == "What are your hours?"
+    assert cache.stats()["evictions"] == 1
+
+
+def test_an_answer_generated_across_an_invalidation_is_not_stored(cache):
+    answer(cache, "r1", "What is your rating?", "4.5")
+    lookup = ask(cache, "r1", "Any vegan options?")
+    cache.invalidate("r1")
+    cache.store("r1", "Any vegan options?", "Yes, several.", lookup)
+
+    assert ask(cache, "r1", "What is your rating?").response is None
+    assert ask(cache, "r1", "Any vegan options?").response is None
+
+    lookup = ask(cache, "r1", "Any vegan options?")
+    cache.invalidate()
+    cache.store("r1", "Any vegan options?", "Yes, several.", lookup)
+    assert cache.stats()["size"] == 0
+
+
+def test_assistant_only_uses_the_cache_for_opening_questions(monkeypatch):
+    cache = SemanticResponseCache(KeywordEmbeddings(), threshold=0.9)
+    monkeypatch.setattr(restaurant_reviews, "response_cache", cache)
+    assistant = RestaurantAssistant(
+        restaurant_id="r1",
+        resources=FakeAssistantResources(latency=0.0, documents=20),
+        restaurant_context="Restaurant Name: Load Test Kitchen",
+        restaurant_scope={"restaurant_name": "Load Test Kitchen", "neighbourhood": "Soho"},
+    )
+    assistant.agent.verbose = False
+    question = "How do we compare to nearby restaurants?"
+
+    first = asyncio.run(AssistantSession(assistant).get_response(question))
+    repeat = asyncio.run(AssistantSession(assistant).get_response(question))
+    follow_up = asyncio.run(AssistantSession(assistant, history=[
+        HumanMessage(content="Hi"), AIMessage(content="Hello!"),
+    ]).get_response(question))
+
+    assert first["agent_used"] == "unified"
+    assert repeat["agent_used"] == "cache" and repeat["response"] == first["response"]
+    assert follow_up["agent_used"] == "unified"
+    assert cache.stats()["lookups"] == 2
@@ -0,0 +1,95 @@
+import asyncio
+import json
+from uuid import uuid4
+
+import pytest
+from fastapi.testclient import TestClient
+
+import app as chat_app
+from database import get_async_session
+from restaurants import routers
+from restaurants.cache import RestaurantNameSnapshot
+
+RESTAURANTS = [{"id": uuid4(), "name": name} for name in ("dishoom", "Hawksmoor", "Dim Sum Palace", "Zia Lucia")]
+
+
+@pytest.fixture
+def names(monkeypatch):
+    snapshot = RestaurantNameSnapshot(ttl=60)
+    fetches = []
+
+    async def aget_restaurant_names(db):
+        fetches.append(db)
+        return RESTAURANTS
+
+    async def session():
+        yield None
+
+    monkeypatch.setattr(routers, "restaurant_names", snapshot)
+    monkeypatch.setattr(routers.repository, "aget_restaurant_names", aget_restaurant_names)
+    monkeypatch.setitem(chat_app.app.dependency_overrides, get_async_session, session)
+    return snapshot, fetches, TestClient(chat_app.app)
+
+
+def test_names_are_sorted_and_paged_by_prefix(names):
+    _, fetches, client = names
+
+    everything = client.get("/get_all_restaurants_name")
+    page = client.get("/get_all_restaurants_name", params={"prefix": "DI", "limit": 1, "offset": 1})
+
+    assert [item["name"] for item in everything.json()] == ["Dim Sum Palace", "dishoom", "Hawksmoor", "Zia Lucia"]
+    assert everything.headers["X-Total-Count"] == "4"
+    assert [item["name"] for item in page.json()] == ["dishoom"]
+    assert page.headers["X-Total-Count"] == "2"
+    assert page.headers["ETag"] == everything.headers["ETag"]
+    assert len(fetches) == 1
+
+
+def test_matching_etag_is_not_modified(names):
+    snapshot, _, client = names
+    etag = client.get("/get_all_restaurants_name").headers["ETag"]
+
+    revalidated = client.get("/get_all_restaurants_name", headers={"If-None-Match": f'"other", W/{etag}'})
+    changed = client.get("/get_all_restaurants_name", headers={"If-None-Match": '"other"'})
+
+    assert revalidated.status_code == 304
+    assert revalidated.content == b""
+    assert revalidated.headers["ETag"] == etag
+    assert changed.status_code == 200
+    assert snapshot.stats()["not_modified"] == 1
+
+
+def test_only_new_restaurants_trigger_a_reload(names):
+    snapshot, fetches, client = names
+    etag = client.get("/get_all_restaurants_name").headers["ETag"]
+
+    snapshot.invalidate(RESTAURANTS[0]["id"])
+    client.get("/get_all_restaurants_name")
+    RESTAURANTS.append({"id": uuid4(), "name": "Bao"})
+    try:
+        snapshot.invalidate(RESTAURANTS[-1]["id"])
+        reloaded = client.get("/get_all_restaurants_name")
+    finally:
+        RESTAURANTS.pop()
+
+    assert len(fetches) == 2
+    assert reloaded.headers["ETag"] != etag
+    assert json.loads(reloaded.content)[0]["name"] == "Bao"
+
+
+def test_concurrent_refreshes_load_once():
+    snapshot = RestaurantNameSnapshot(ttl=60)
+    fetches = []
+
+    async def fetch():
+        fetches.append(1)
+        await asyncio.sleep(0.01)
+        return RESTAURANTS
+
+    async def run():
+        await asyncio.gather(*(snapshot.ensure_fresh(fetch) for _ in range(5)))
+
+    asyncio.run(run())
+
+    assert len(fetches) == 1
+    assert snapshot.page().total == len(RESTAURANTS)
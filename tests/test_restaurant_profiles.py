@@ -0,0 +1,80 @@
+import asyncio
+
+import pytest
+
+from restaurants import services
+from restaurants.cache import RestaurantProfileCache
+
+
+@pytest.fixture
+def database(monkeypatch, make_restaurant):
+    """A one-row stand-in for the repository's version and row reads."""
+    restaurant = make_restaurant()
+    calls = []
+
+    async def aget_restaurant_version(db, restaurant_id):
+        calls.append("version")
+        return restaurant.row_version
+
+    async def aget_restaurant_data(db, restaurant_id):
+        calls.append("row")
+        return restaurant
+
+    monkeypatch.setattr(services, "restaurant_profiles", RestaurantProfileCache(max_size=10, ttl=60))
+    monkeypatch.setattr(services.repository, "aget_restaurant_version", aget_restaurant_version)
+    monkeypatch.setattr(services.repository, "aget_restaurant_data", aget_restaurant_data)
+    return restaurant, calls
+
+
+def profile(restaurant):
+    return asyncio.run(services.aget_restaurant_profile(None, restaurant.id))
+
+
+def test_live_profile_is_served_from_the_cache(database):
+    restaurant, calls = database
+
+    first = profile(restaurant)
+    second = profile(restaurant)
+
+    assert first is second
+    assert first.response.restaurant_name == "Trattoria Nova"
+    assert calls == ["row"]
+
+
+def test_expired_profile_with_the_same_version_is_revalidated(database):
+    restaurant, calls = database
+    services.restaurant_profiles.ttl = 0
+    first = profile(restaurant)
+
+    assert profile(restaurant) is first
+    assert calls == ["row", "version"]
+    assert services.restaurant_profiles.stats()["revalidations"] == 1
+
+
+def test_expired_profile_with_a_new_version_is_reloaded(database):
+    restaurant, calls = database
+    services.restaurant_profiles.ttl = 0
+    profile(restaurant)
+    restaurant.row_version = 2
+    restaurant.overall_rating = 4.5
+
+    reloaded = profile(restaurant)
+
+    assert reloaded.version == 2
+    assert reloaded.response.overall_rating == 4.5
+    assert calls == ["row", "version", "row"]
+
+
+def test_a_load_racing_with_an_update_is_not_stored(database, monkeypatch):
+    restaurant, calls = database
+
+    async def aget_restaurant_data(db, restaurant_id):
+        calls.append("row")
+        services.restaurant_profiles.invalidate(restaurant_id)
+        return restaurant
+
+    monkeypatch.setattr(services.repository, "aget_restaurant_data", aget_restaurant_data)
+
+    assert profile(restaurant) is not None
+    assert services.restaurant_profiles.peek(restaurant.id) is None
+    assert services.restaurant_profiles.stats()["loads"] == 0
@@ -0,0 +1,68 @@
+import asyncio
+from uuid import uuid4
+
+import pytest
+from sqlalchemy.dialects import postgresql
+
+from restaurants import repository, services
+from restaurants.cache import RestaurantLabelIndex
+
+ITALIAN, THAI, PIZZA_BAR = uuid4(), uuid4(), uuid4()
+LABELS = [
+    (ITALIAN, ["italian", "pizza"], ["family friendly"]),
+    (THAI, ["thai"], ["late night"]),
+    (PIZZA_BAR, ["pizza"], ["late night"]),
+]
+
+
+@pytest.fixture
+def search(monkeypatch):
+    """Runs services.asearch_restaurant_rows against a fresh label index; returns the filters the query got."""
+    labels = RestaurantLabelIndex()
+    monkeypatch.setattr(services, "restaurant_labels", labels)
+    queries = []
+
+    async def aget_restaurant_labels(db, restaurant_ids=None):
+        return [row for row in LABELS if restaurant_ids is None or str(row[0]) in map(str, restaurant_ids)]
+
+    async def asearch_restaurants(db, **filters):
+        queries.append(filters)
+        return []
+
+    monkeypatch.setattr(repository, "aget_restaurant_labels", aget_restaurant_labels)
+    monkeypatch.setattr(repository, "asearch_restaurants", asearch_restaurants)
+
+    def run(**filters):
+        asyncio.run(services.asearch_restaurant_rows(None, **filters))
+        return queries[-1] if queries else None
+
+    run.labels = labels
+    run.queries = queries
+    return run
+
+
+def test_cuisine_and_tag_filters_become_id_lookups(search):
+    filters = search(cuisine="Pizza", tag="Late Night", neighbourhood="Soho")
+    assert filters["restaurant_ids"] == [PIZZA_BAR]
+    assert "cuisine" not in filters and "tag" not in filters
+    assert filters["neighbourhood"] == "Soho"
+
+
+def test_unknown_label_skips_the_query(search):
+    assert search(cuisine="Peruvian") is None
+
+
+def test_updated_restaurants_are_reindexed(search):
+    search(cuisine="thai")
+    LABELS.append((uuid4(), ["thai"], []))
+    try:
+        search.labels.invalidate(LABELS[-1][0])
+        assert len(search(cuisine="thai")["restaurant_ids"]) == 2
+    finally:
+        LABELS.pop()
+    assert search.labels.stats()["patches"] == 1
+
+
+def test_search_statement_filters_on_restaurant_ids():
+    sql = str(repository._search_statement(restaurant_ids=[ITALIAN]).compile(dialect=postgresql.dialect()))
+    assert "restaurants.id IN" in sql
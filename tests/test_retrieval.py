@@ -0,0 +1,45 @@
+import asyncio
+
+from ai_assistants.load_test import FakeAssistantResources
+from ai_assistants.restaurant_reviews import RestaurantAssistant
+from restaurants.services import build_restaurant_profile
+
+
+def assistant_with_reviews(profile, texts, metadatas):
+    resources = FakeAssistantResources(latency=0.0, documents=0)
+    resources.vectorstore.add_texts(texts, metadatas=metadatas)
+    assistant = RestaurantAssistant(
+        restaurant_id="trattoria-nova",
+        resources=resources,
+        restaurant_context=profile.context,
+        restaurant_scope=dict(profile.scope),
+    )
+    assistant.agent.verbose = False
+    return assistant
+
+
+def test_profile_keeps_the_cuisine_as_entered(make_restaurant):
+    profile = build_restaurant_profile(make_restaurant(cuisine=" Italian, Pizza"))
+    assert profile.response.cuisine == "Italian"
+    assert profile.scope["cuisine"] == "Italian"
+
+
+def test_same_cuisine_stage_finds_reviews_of_other_restaurants(make_restaurant):
+    assistant = assistant_with_reviews(
+        build_restaurant_profile(make_restaurant()),
+        ["The carbonara was silky.", "Great wood-fired pizza.", "Tasty dumplings."],
+        [
+            {"restaurant_name": "Pasta Bar", "cuisine": "Italian", "neighbourhood": "Soho"},
+            {"restaurant_name": "Forno", "cuisine": ["Italian", "Pizza"], "neighbourhood": "Soho"},
+            {"restaurant_name": "Dumpling House", "cuisine": "Chinese", "neighbourhood": "Soho"},
+        ],
+    )
+    plan = assistant.retrieval_plan("What do people think of the food?")
+    assert [stage for stage, _, _ in plan] == ["restaurant", "cuisine", "all"]
+
+    reviews = asyncio.run(assistant.aquery_vectorstore("What do people think of the food?"))
+
+    assert "Reviews of other Italian restaurants in Soho:" in reviews
+    assert "Pasta Bar: The carbonara was silky." in reviews
+    assert "Forno: Great wood-fired pizza." in reviews
+    assert "Dumpling House" not in reviews.split("Reviews of other restaurants:")[0]
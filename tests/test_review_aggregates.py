@@ -0,0 +1,115 @@
+from uuid import uuid4
+
+import pytest
+from sqlalchemy import Column, Float, Integer, MetaData, String, Table, Uuid, create_engine, event, select
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.orm import Session
+from sqlalchemy.sql.dml import Insert
+
+from restaurants import repository
+
+metadata = MetaData()
+restaurants = Table(
+    "restaurants", metadata,
+    Column("id", Uuid, primary_key=True),
+    *[Column(name, Float) for name in ("overall_rating", "food_rating", "service_rating", "ambience_rating")],
+    *[Column(name, Integer) for name in (
+        "total_review_counts", "food_rating_count", "service_rating_count", "ambience_rating_count",
+        *repository.STAR_COLUMNS.values(),
+    )],
+    Column("row_version", Integer, nullable=False),
+)
+review_events = Table(
+    "review_events", metadata,
+    Column("idempotency_key", String, primary_key=True),
+    Column("restaurant_id", Uuid),
+    Column("stars", Integer),
+    *[Column(name, Float) for name in ("food_rating", "service_rating", "ambience_rating")],
+)
+
+
+class SQLiteSession(Session):
+    """Runs the aggregate UPDATEs on SQLite; the Postgres-only event insert is replayed as its SQLite form."""
+
+    def execute(self, statement, *args, **kwargs):
+        if isinstance(statement, Insert):
+            values = {column.key: value.value for column, value in statement._values.items()}
+            statement = sqlite_insert(review_events).values(**values).on_conflict_do_nothing().returning(
+                review_events.c.idempotency_key
+            )
+        return super().execute(statement, *args, **kwargs)
+
+
+@pytest.fixture
+def engine(monkeypatch):
+    engine = create_engine("sqlite://")
+
+    # pysqlite leaves transactions to the driver by default, which breaks SAVEPOINT
+    @event.listens_for(engine, "connect")
+    def disable_driver_transactions(connection, record):
+        connection.isolation_level = None
+
+    @event.listens_for(engine, "begin")
+    def begin(connection):
+        connection.exec_driver_sql("BEGIN")
+
+    metadata.create_all(engine)
+    monkeypatch.setattr(repository, "SessionLocal", lambda: SQLiteSession(engine))
+    return engine
+
+
+def add_restaurant(engine, **columns):
+    restaurant_id = uuid4()
+    with engine.begin() as connection:
+        connection.execute(restaurants.insert().values(id=restaurant_id, row_version=1, **columns))
+    return restaurant_id
+
+
+def row(engine, restaurant_id):
+    with engine.connect() as connection:
+        return connection.execute(select(restaurants).where(restaurants.c.id == restaurant_id)).mappings().one()
+
+
+def review(restaurant_id, key, stars, **ratings):
+    return {"idempotency_key": key, "restaurant_id": restaurant_id, "stars": stars, **ratings}
+
+
+def test_events_update_counts_and_running_averages(engine):
+    restaurant_id = add_restaurant(
+        engine, overall_rating=4.0, total_review_counts=2, five_stars=1, three_stars=1,
+        food_rating=4.0, food_rating_count=2,
+    )
+
+    stats = repository.record_review_events([
+        review(restaurant_id, "r1", 5, food_rating=5.0),
+        review(restaurant_id, "r2", 1, service_rating=2.0),
+    ])
+
+    assert stats == {"applied": 2, "duplicates": 0, "unknown_restaurant": 0}
+    restaurant = row(engine, restaurant_id)
+    assert restaurant["overall_rating"] == pytest.approx(3.5)
+    assert restaurant["total_review_counts"] == 4
+    assert (restaurant["five_stars"], restaurant["one_stars"]) == (2, 1)
+    assert restaurant["food_rating"] == pytest.approx(13 / 3)
+    assert restaurant["food_rating_count"] == 3
+    assert (restaurant["service_rating"], restaurant["service_rating_count"]) == (2.0, 1)
+    assert restaurant["ambience_rating_count"] is None
+    assert restaurant["row_version"] == 3
+
+
+def test_replayed_and_unknown_events_are_not_applied(engine):
+    restaurant_id = add_restaurant(engine)
+    repository.record_review_events([review(restaurant_id, "r1", 4)])
+
+    stats = repository.record_review_events([
+        review(restaurant_id, "r1", 4),
+        review(uuid4(), "r2", 2),
+        review(restaurant_id, "r3", 2),
+    ])
+
+    assert stats == {"applied": 1, "duplicates": 1, "unknown_restaurant": 1}
+    restaurant = row(engine, restaurant_id)
+    assert restaurant["overall_rating"] == pytest.approx(3.0)
+    assert (restaurant["total_review_counts"], restaurant["four_stars"], restaurant["two_stars"]) == (2, 1, 1)
+    with engine.connect() as connection:
+        assert connection.scalars(select(review_events.c.idempotency_key)).all() == ["r1", "r3"]
@@ -0,0 +1,52 @@
+import pytest
+
+from ai_assistants.router import AGENT, PROFILE, RETRIEVAL, QueryRouter
+
+FACTS = {
+    "restaurant_name": "The Golden Fork",
+    "restaurant_location": "12 High Street",
+    "neighbourhood": "Soho",
+    "overall_rating": 4.2,
+    "total_review_counts": 310,
+}
+
+
+@pytest.fixture
+def router():
+    return QueryRouter(enabled=True)
+
+
+@pytest.mark.parametrize("query", [
+    "Where is Dishoom located?",
+    "What is the rating of Hawksmoor?",
+    "How many reviews does Nandos have?",
+    "What's the average price at Flat Iron?",
+    "What do customers say about Hawksmoor's steak?",
+])
+def test_questions_about_other_restaurants_go_to_the_agent(router, query):
+    assert router.classify(query, FACTS["restaurant_name"]) == AGENT
+
+
+@pytest.mark.parametrize("query", [
+    "What is our rating?",
+    "How many reviews do we have?",
+    "Where are we located?",
+    "What is the rating here?",
+    "What's the overall rating of The Golden Fork?",
+    "Where is Golden Fork located?",
+])
+def test_questions_about_the_own_restaurant_use_the_profile(router, query):
+    assert router.classify(query, FACTS["restaurant_name"]) == PROFILE
+    assert router.answer_profile(query, FACTS) is not None
+
+
+def test_profile_answer_uses_the_stored_facts(router):
+    assert router.answer_profile("How many reviews do we have?", FACTS) == "The Golden Fork has 310 reviews."
+
+
+def test_review_questions_about_the_own_restaurant_use_retrieval(router):
+    assert router.classify("What do customers say about our service?", FACTS["restaurant_name"]) == RETRIEVAL
+
+
+def test_comparisons_go_to_the_agent(router):
+    assert router.classify("How does our rating compare to nearby restaurants?", FACTS["restaurant_name"]) == AGENT
@@ -0,0 +1,148 @@
+"""
+Password hashing off the event loop.
+
+bcrypt is deliberately slow CPU work, so async callers hand it to a dedicated
+process pool (PASSWORD_HASH_WORKERS processes, or a thread when set to 0) and at
+most PASSWORD_HASH_CONCURRENCY calls are submitted at once; the rest wait their
+turn and are reported as queue depth. Workers are spawned rather than forked,
+since forking a process that already runs threads and has ML models loaded can
+deadlock the child.
+"""
+import asyncio
+import logging
+import multiprocessing
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, Optional, Tuple
+
+from passlib.context import CryptContext
+
+from config_project.config import settings
+
+logger = logging.getLogger(__name__)
+
+# Hashes made with a different cost are reported by verify_and_update and rehashed on login
+pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto", bcrypt__rounds=settings.PASSWORD_BCRYPT_ROUNDS)
+
+
+def hash_password(password: str) -> str:
+    return pwd_context.hash(password)
+
+
+def verify_password(password: str, hashed_password: str) -> bool:
+    return pwd_context.verify(password, hashed_password)
+
+
+def verify_and_update_password(password: str, hashed_password: str) -> Tuple[bool, Optional[str]]:
+    return pwd_context.verify_and_update(password, hashed_password)
+
+
+class PasswordHasher:
+    """Runs the functions above in a bounded worker pool and keeps queue metrics."""
+
+    def __init__(
+        self,
+        workers: int = settings.PASSWORD_HASH_WORKERS,
+        max_concurrency: int = settings.PASSWORD_HASH_CONCURRENCY,
+    ):
+        self.workers = workers
+        self.max_concurrency = max_concurrency
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._semaphore: Optional[asyncio.Semaphore] = None
+        self._lock = threading.Lock()
+        self.waiting = 0
+        self.max_waiting = 0
+        self.in_flight = 0
+        self.completed = 0
+        self.errors = 0
+        self.rehashes = 0
+        self.wait_time = 0.0
+        self.run_time = 0.0
+
+    def _get_executor(self) -> Optional[ProcessPoolExecutor]:
+        if self.workers <= 0:
+            return None
+        with self._lock:
+            if self._executor is None:
+                self._executor = ProcessPoolExecutor(
+                    max_workers=self.workers, mp_context=multiprocessing.get_context("spawn")
+                )
+            return self._executor
+
+    async def _run(self, func, *args):
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.max_concurrency)
+        queued_at = time.time()
+        with self._lock:
+            self.waiting += 1
+            self.max_waiting = max(self.max_waiting, self.waiting)
+        try:
+            await self._semaphore.acquire()
+        finally:
+            with self._lock:
+                self.waiting -= 1
+        started_at = time.time()
+        with self._lock:
+            self.in_flight += 1
+        succeeded = False
+        try:
+            executor = self._get_executor()
+            if executor is None:
+                result = await asyncio.to_thread(func, *args)
+            else:
+                result = await asyncio.get_running_loop().run_in_executor(executor, func, *args)
+            succeeded = True
+            return result
+        except Exception:
+            with self._lock:
+                self.errors += 1
+            raise
+        finally:
+            self._semaphore.release()
+            with self._lock:
+                self.in_flight -= 1
+                # Averages cover completed calls only; failures are counted in errors
+                if succeeded:
+                    self.completed += 1
+                    self.wait_time += started_at - queued_at
+                    self.run_time += time.time() - started_at
+
+    async def ahash(self, password: str) -> str:
+        return await self._run(hash_password, password)
+
+    async def averify(self, password: str, hashed_password: str) -> bool:
+        return await self._run(verify_password, password, hashed_password)
+
+    async def averify_and_update(self, password: str, hashed_password: str) -> Tuple[bool, Optional[str]]:
+        """Verify, and return a new hash when the stored one uses outdated cost parameters."""
+        verified, new_hash = await self._run(verify_and_update_password, password, hashed_password)
+        if new_hash is not None:
+            with self._lock:
+                self.rehashes += 1
+        return verified, new_hash
+
+    def shutdown(self):
+        with self._lock:
+            if self._executor is not None:
+                self._executor.shutdown(wait=False, cancel_futures=True)
+                self._executor = None
+
+    def stats(self) -> Dict:
+        with self._lock:
+            return {
+                "workers": self.workers,
+                "max_concurrency": self.max_concurrency,
+                "bcrypt_rounds": settings.PASSWORD_BCRYPT_ROUNDS,
+                "queue_depth": self.waiting,
+                "max_queue_depth": self.max_waiting,
+                "in_flight": self.in_flight,
+                "completed": self.completed,
+                "errors": self.errors,
+                "rehashes": self.rehashes,
+                "avg_wait_time": self.wait_time / self.completed if self.completed else 0.0,
+                "avg_run_time": self.run_time / self.completed if self.completed else 0.0,
+            }
+
+
+password_hasher = PasswordHasher()
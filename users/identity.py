@@ -0,0 +1,123 @@
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, Optional, Set, Tuple
+
+from config_project.config import settings
+from users.model import User
+
+
+class UserSnapshot:
+    """
+    Read-only view of a user for request handling.
+
+    Holds the columns authenticated endpoints read, but not the password hash, and
+    cannot be modified or attached to a session. Code that needs to change a user
+    goes through users.repository.
+    """
+
+    __slots__ = (
+        "id", "email", "phone_number", "name", "is_verified", "is_deleted",
+        "is_active", "is_admin", "tier", "restaurant_id",
+    )
+
+    def __init__(self, **values):
+        for name in self.__slots__:
+            object.__setattr__(self, name, values.get(name))
+
+    @classmethod
+    def from_model(cls, user: User) -> "UserSnapshot":
+        return cls(**{name: getattr(user, name) for name in cls.__slots__})
+
+    def __setattr__(self, name, value):
+        raise AttributeError(f"UserSnapshot is read-only, cannot set {name}")
+
+    def __delattr__(self, name):
+        raise AttributeError(f"UserSnapshot is read-only, cannot delete {name}")
+
+    def __repr__(self):
+        return f"UserSnapshot(id={self.id!r}, email={self.email!r})"
+
+
+class IdentityCache:
+    """
+    Verified access token -> UserSnapshot, bounded (LRU) and short-lived.
+
+    An entry lives for `ttl` seconds or until the token expires, whichever is
+    first, so a token is never accepted past its `exp`. Entries are dropped by email
+    when the user's password, verification or deletion state changes. Other workers
+    keep their own copy until the TTL runs out.
+    """
+
+    def __init__(self, max_size: int = settings.AUTH_CACHE_SIZE, ttl: float = settings.AUTH_CACHE_TTL_SECONDS):
+        self.max_size = max_size
+        self.ttl = ttl
+        self._entries: "OrderedDict[str, Tuple[UserSnapshot, float]]" = OrderedDict()
+        # email -> tokens cached for it
+        self._by_email: Dict[str, Set[str]] = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.db_lookups = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    def _drop(self, token: str):
+        entry = self._entries.pop(token, None)
+        if entry is None:
+            return
+        tokens = self._by_email.get(entry[0].email)
+        if tokens is not None:
+            tokens.discard(token)
+            if not tokens:
+                del self._by_email[entry[0].email]
+
+    def get(self, token: str) -> Optional[UserSnapshot]:
+        with self._lock:
+            entry = self._entries.get(token)
+            if entry is not None and entry[1] > time.time():
+                self._entries.move_to_end(token)
+                self.hits += 1
+                return entry[0]
+            if entry is not None:
+                self._drop(token)
+            self.misses += 1
+            return None
+
+    def put(self, token: str, user: UserSnapshot, token_expires_at: Optional[float] = None):
+        expires_at = time.time() + self.ttl
+        if token_expires_at is not None:
+            expires_at = min(expires_at, token_expires_at)
+        with self._lock:
+            self.db_lookups += 1
+            self._drop(token)
+            self._entries[token] = (user, expires_at)
+            self._by_email.setdefault(user.email, set()).add(token)
+            while len(self._entries) > self.max_size:
+                self._drop(next(iter(self._entries)))
+                self.evictions += 1
+
+    def invalidate(self, email: str):
+        with self._lock:
+            for token in list(self._by_email.get(email, ())):
+                self._drop(token)
+            self.invalidations += 1
+
+    def stats(self) -> Dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "size": len(self._entries),
+                "max_size": self.max_size,
+                "ttl": self.ttl,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "db_lookups": self.db_lookups,
+                "db_lookups_avoided": self.hits,
+                "evictions": self.evictions,
+                "invalidations": self.invalidations,
+            }
+
+
+identity_cache = IdentityCache()
@@ -1,5 +1,8 @@
 import logging
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from database import SessionLocal
+from users.identity import identity_cache
 from users.model import User
 
 logger = logging.getLogger(__name__)
@@ -16,6 +19,16 @@ def get_user_by_email(email: str):
         raise Exception("Failed to fetch user by email from the database.")
 
 
+async def aget_user_by_email(db: AsyncSession, email: str):
+    """Get a user by email using the request's async session."""
+    try:
+        result = await db.execute(select(User).where(User.email == email))
+        return result.scalars().first()
+    except Exception as exc:
+        logger.error(f"Error in aget_user_by_email: {str(exc)}", exc_info=True)
+        raise Exception("Failed to fetch user by email from the database.")
+
+
 def get_user_by_phone_number(phone_number: str):
     """Get a user by phone number from the database."""
     try:
@@ -45,10 +58,16 @@ def verify_user(user) -> User:
     """Verify a user in the database."""
     try:
         with SessionLocal() as db:
-            db.add(user)
+            res = db.query(User).filter(User.email == user.email).first()
+            if not res:
+                logger.warning(f"User not found for verification: {user.email}")
+                raise ValueError("User not found")
+            res.is_verified = True
+            res.is_active = True
             db.commit()
-            db.refresh(user)
-        return user
+            db.refresh(res)
+        identity_cache.invalidate(user.email)
+        return res
     except Exception as exc:
         logger.error(f"Error in verify_user: {str(exc)}", exc_info=True)
         raise Exception("Failed to verify user in the database.")
@@ -63,6 +82,7 @@ def update_password(user, password) -> User:
                 res.password = password  
                 db.commit()
                 db.refresh(res)
+                identity_cache.invalidate(user.email)
                 return res
             else:
                 logger.warning(f"User not found for password update: {user.email}")
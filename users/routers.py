@@ -2,9 +2,9 @@ import logging
 from fastapi import APIRouter, Depends, HTTPException
 
 from users import services
-from users.model import User
+from users.identity import UserSnapshot
 from users.schema import SignupRequest, LoginRequest, ResetPasswordRequest, ChangePasswordRequest, UserResponse
-from users.utils import get_current_user
+from users.utils import aget_current_user
 
 
 logger = logging.getLogger(__name__)
@@ -13,9 +13,9 @@ router = APIRouter()
 
 
 @router.post("/signup/")
-def signup(user_data: SignupRequest):
+async def signup(user_data: SignupRequest):
     try:
-        access_token = services.signup_user(user_data)
+        access_token = await services.signup_user(user_data)
         return {"access_token": access_token, "token_type": "bearer"}
     except Exception as exc:
         logger.error(f"Error during signup: {str(exc)}", exc_info=True)
@@ -34,9 +34,9 @@ def verify_email(token: str):
 
 
 @router.post("/login")
-def login(request: LoginRequest) -> dict:
+async def login(request: LoginRequest) -> dict:
     try:
-        access_token = services.login(request.email, request.password)
+        access_token = await services.login(request.email, request.password)
         return {"access_token": access_token, "token_type": "bearer"}
     except Exception as exc:
         logger.error(f"Error during login: {str(exc)}", exc_info=True)
@@ -44,7 +44,7 @@ def login(request: LoginRequest) -> dict:
 
 
 @router.get("/protected/")
-def protected(current_user: User = Depends(get_current_user)):
+def protected(current_user: UserSnapshot = Depends(aget_current_user)):
     try:
         return UserResponse(
             id=current_user.id,
@@ -68,21 +68,21 @@ def forget_password(email: str):
 
 
 @router.post("/reset_password/{token}")
-def reset_password(request: ResetPasswordRequest, token: str):
+async def reset_password(request: ResetPasswordRequest, token: str):
     try:
-        return services.reset_password(token, request.password)
+        return await services.reset_password(token, request.password)
     except Exception as exc:
         logger.error(f"Error during password reset: {str(exc)}", exc_info=True)
         raise HTTPException(status_code=500, detail="Password reset failed.")
 
 
 @router.post("/change-password")
-def change_password(request: ChangePasswordRequest, current_user: User = Depends(get_current_user)):
+async def change_password(request: ChangePasswordRequest, current_user: UserSnapshot = Depends(aget_current_user)):
     """
     Change the password for the authenticated user
     """
     try:
-        return services.change_password(current_user, request.old_password, request.new_password)
+        return await services.change_password(current_user, request.old_password, request.new_password)
     except Exception as exc:
         logger.error(f"Error during password change: {str(exc)}", exc_info=True)
         raise HTTPException(status_code=500, detail="Password change failed.")
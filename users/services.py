@@ -1,36 +1,36 @@
+import asyncio
 import logging
 from users.schema import SignupRequest
 from fastapi import HTTPException
 from users import repository
 from users.utils import (
-    get_password_hash,
     create_access_token,
     get_current_user,
-    verify_password,
     send_reset_password_email,
 )
+from users.hashing import password_hasher
 from users.model import User
 
 logger = logging.getLogger(__name__)
 
 
-def signup_user(user_data: SignupRequest) -> User:
+async def signup_user(user_data: SignupRequest) -> User:
     """
     Register a new user and return an access token.
     """
     try:
-        existing_user = repository.get_user_by_email(user_data.email)
+        existing_user = await asyncio.to_thread(repository.get_user_by_email, user_data.email)
         if existing_user:
             logger.warning(f"User with email {user_data.email} already exists.")
             raise HTTPException(status_code=400, detail="User already exists")
-        existing_phone = repository.get_user_by_phone_number(user_data.phone_number)
+        existing_phone = await asyncio.to_thread(repository.get_user_by_phone_number, user_data.phone_number)
         if existing_phone:
             logger.warning(f"Duplicate phone number: {user_data.phone_number}")
             raise HTTPException(status_code=400, detail="Duplicate phone number")
-        password = get_password_hash(user_data.password)
+        password = await password_hasher.ahash(user_data.password)
         user_payload = user_data.dict()
         user_payload["password"] = password
-        user = repository.create_user(user_payload)
+        user = await asyncio.to_thread(repository.create_user, user_payload)
         access_token = create_access_token(data={"sub": user.email})
         return access_token
     except Exception as exc:
@@ -40,36 +40,41 @@ def signup_user(user_data: SignupRequest) -> User:
 
 def verify_user(token: str):
     try:
-        user = get_current_user(token)
+        user = get_current_user(token, is_token=True)
         if not user:
             logger.warning("User does not exist for verification.")
             raise HTTPException(status_code=404, detail="User does not exist")
         if user.is_verified:
             logger.info(f"User {user.email} already verified.")
             raise HTTPException(status_code=400, detail="User already verified")
-        user.is_verified = True
-        user.is_active = True
         return repository.verify_user(user)
     except Exception as exc:
         logger.error(f"Error in verify_user: {str(exc)}", exc_info=True)
         raise HTTPException(status_code=500, detail="Email verification failed.")
 
 
-def login(email, password) -> str:
+async def login(email, password) -> str:
+    """
+    Check the credentials and return an access token, upgrading the stored hash if its cost is outdated.
+    """
     try:
-        user = repository.get_user_by_email(email)
+        user = await asyncio.to_thread(repository.get_user_by_email, email)
         if not user:
             logger.warning(f"Login failed: user {email} not found.")
             raise HTTPException(status_code=400, detail="User not found.")
         if user.is_deleted:
             logger.warning(f"Login failed: user {email} is deleted.")
             raise HTTPException(status_code=400, detail="This user account is deleted.")
-        if not verify_password(password, user.password):
+        verified, new_hash = await password_hasher.averify_and_update(password, user.password)
+        if not verified:
             logger.warning(f"Login failed: incorrect password for user {email}.")
             raise HTTPException(
                 status_code=403,
                 detail="Incorrect password",
             )
+        if new_hash is not None:
+            logger.info(f"Rehashing password for user {email} with current cost parameters.")
+            await asyncio.to_thread(repository.update_password, user, new_hash)
         access_token = create_access_token(
             data={"sub": user.email}
         )
@@ -93,35 +98,37 @@ def forget_password(email):
         raise HTTPException(status_code=500, detail="Password reset request failed.")
 
 
-def reset_password(token, password):
+async def reset_password(token, password):
     try:
-        user = get_current_user(token, is_token=True)
+        user = await asyncio.to_thread(get_current_user, token, True)
         if not user:
             logger.warning("Password reset: user does not exist.")
             raise HTTPException(status_code=404, detail="User does not exist")
-        if verify_password(password, user.password):
+        record = await asyncio.to_thread(repository.get_user_by_email, user.email)
+        if await password_hasher.averify(password, record.password):
             logger.warning("Password reset: new password same as old password.")
             raise HTTPException(
                 status_code=403,
                 detail="New password cannot be the same as the old password",
             )
-        hashed_password = get_password_hash(password)
-        return repository.update_password(user, hashed_password)
+        hashed_password = await password_hasher.ahash(password)
+        return await asyncio.to_thread(repository.update_password, user, hashed_password)
     except Exception as exc:
         logger.error(f"Error in reset_password: {str(exc)}", exc_info=True)
         raise HTTPException(status_code=500, detail="Password reset failed.")
 
 
-def change_password(user, old_password, new_password):
+async def change_password(user, old_password, new_password):
     """
     Change a user's password after verifying the old password
     """
     try:
-        if not verify_password(old_password, user.password):
+        record = await asyncio.to_thread(repository.get_user_by_email, user.email)
+        if not await password_hasher.averify(old_password, record.password):
             logger.warning(f"Change password failed: incorrect old password for user {user.email}.")
             raise HTTPException(status_code=400, detail="Current password is incorrect")
-        hashed_password = get_password_hash(new_password)
-        return repository.update_password(user, hashed_password)
+        hashed_password = await password_hasher.ahash(new_password)
+        return await asyncio.to_thread(repository.update_password, user, hashed_password)
     except Exception as exc:
         logger.error(f"Error in change_password: {str(exc)}", exc_info=True)
         raise HTTPException(status_code=500, detail="Password change failed.")
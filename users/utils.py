@@ -1,14 +1,17 @@
-
+import logging
 from fastapi import Depends, HTTPException
 from fastapi.security import HTTPBearer
-from passlib.context import CryptContext
 import jwt
 from datetime import datetime, timedelta
 from config_project.config import settings
-from users.repository import get_user_by_email
-from config_project.information_gathering.utils import send_email
+from database import AsyncSessionLocal
+from users.identity import UserSnapshot, identity_cache
+from users.repository import aget_user_by_email, get_user_by_email
+from emails.templates import render_email
+from emails.worker import enqueue_email
+
+logger = logging.getLogger(__name__)
 
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 SECRET_KEY = settings.JWT_SECRET_KEY
 ALGORITHM = settings.JWT_ALGORITHM
 ACCESS_TOKEN_EXPIRE_MINUTES = settings.ACCESS_TOKEN_EXPIRE_MINUTES
@@ -22,24 +25,13 @@ def create_access_token(data: dict):
     return jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
 
 
-def verify_password(plain_password, hashed_password):
-    return pwd_context.verify(plain_password, hashed_password)
-
-
-def get_password_hash(password):
-    return pwd_context.hash(password)
-
-
-def get_current_user(token: str = Depends(bearer_schema), is_token: bool = False):
+def decode_token(token: str) -> dict:
     try:
-        if is_token:
-            payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
-        else:
-            payload = jwt.decode(token.credentials, SECRET_KEY, algorithms=[ALGORITHM])
-        email: str = payload.get("sub")
-        if email is None:
+        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
+        if payload.get("sub") is None:
             logger.error("Invalid token")
             raise HTTPException(status_code=401, detail="Invalid token")
+        return payload
     except:
         raise HTTPException(
             status_code=401,
@@ -47,47 +39,59 @@ def get_current_user(token: str = Depends(bearer_schema), is_token: bool = False
             headers={"WWW-Authenticate": "Bearer"},
         )
 
-    user = get_user_by_email(email)
 
-    if not user:
+def cache_user(token: str, record, payload: dict) -> UserSnapshot:
+    if not record:
         raise HTTPException(status_code=401, detail="User not found")
+    user = UserSnapshot.from_model(record)
+    identity_cache.put(token, user, payload.get("exp"))
+    return user
+
+
+def check_user(user: UserSnapshot) -> UserSnapshot:
     if user.is_deleted:
         raise HTTPException(status_code=400, detail="This user account is deleted.")
-
     return user
 
 
-def send_verification_email(receiver_email, name, access_token):
-    verification_link = f"{settings.BASE_URL}/verify-email?token={access_token}"
+def get_current_user(token: str = Depends(bearer_schema), is_token: bool = False) -> UserSnapshot:
+    token = token if is_token else token.credentials
+    user = identity_cache.get(token)
+    if user is None:
+        payload = decode_token(token)
+        user = cache_user(token, get_user_by_email(payload["sub"]), payload)
+    return check_user(user)
+
 
-    subject = "Verify Email"
-    message = f"""
-    <html>
-      <body>
-        <p>Dear {name},</p>
-        <p>Click the link to verify your email: {verification_link}</p>
-        <p>For security reasons, please change your password after logging in.</p>
-        <p>If you did not request this, please contact support immediately.</p>
-        <p>Best regards,</p>
-      </body>
-    </html>
+async def aget_current_user(token=Depends(bearer_schema)) -> UserSnapshot:
     """
-    send_email(receiver_email, subject, message)
+    Async variant of get_current_user for async routes.
+    """
+    return await aget_user_for_token(token.credentials)
 
 
-def send_reset_password_email(receiver_email, name, access_token):
-    verification_link = f"{settings.BASE_URL}/reset_password?token={access_token}"
+async def aget_user_for_token(token: str) -> UserSnapshot:
+    """
+    The user a raw bearer token belongs to, e.g. one passed as a WebSocket query parameter.
 
-    subject = "Reset Password"
-    message = f"""
-    <html>
-      <body>
-        <p>Dear {name},</p>
-        <p>Click the link to reset the password: {verification_link}</p>
-        <p>For security reasons, please change your password after logging in.</p>
-        <p>If you did not request this, please contact support immediately.</p>
-        <p>Best regards,</p>
-      </body>
-    </html>
+    A cache miss uses its own short-lived session rather than the request-scoped
+    one, so chat routes do not hold a pooled connection for the whole model call.
     """
-    send_email(receiver_email, subject, message)
+    user = identity_cache.get(token)
+    if user is None:
+        payload = decode_token(token)
+        async with AsyncSessionLocal() as db:
+            user = cache_user(token, await aget_user_by_email(db, payload["sub"]), payload)
+    return check_user(user)
+
+
+def send_verification_email(receiver_email, name, access_token):
+    verification_link = f"{settings.BASE_URL}/verify-email?token={access_token}"
+    email = render_email("verify_email", receiver_email, name=name, link=verification_link)
+    enqueue_email(email.recipient, email.subject, email.html_body, email.text_body)
+
+
+def send_reset_password_email(receiver_email, name, access_token):
+    verification_link = f"{settings.BASE_URL}/reset_password?token={access_token}"
+    email = render_email("reset_password", receiver_email, name=name, link=verification_link)
+    enqueue_email(email.recipient, email.subject, email.html_body, email.text_body)